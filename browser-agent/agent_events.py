@@ -0,0 +1,70 @@
+"""
+Machine-readable event stream from the agents to the orchestrator.
+
+Agents emit typed events (JSON objects with a "type"):
+  tool_start  {name, id}
+  tool_end    {name, id, ok, duration}
+  status      {message}
+  result      {...agent-specific result...}
+  error       {message}
+
+In-process, events go to the callback passed to the agent's entry point. When
+the agent runs as a subprocess they are written as JSON lines to the file
+descriptor named by AGENT_EVENTS_FD — a pipe the orchestrator reads
+incrementally, separate from the human-readable logs on stdout/stderr. With
+neither, emit() is a no-op.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("agent_events")
+
+EVENTS_FD_ENV = "AGENT_EVENTS_FD"
+
+_fd_stream = None
+_fd_lock = threading.Lock()
+
+
+def _events_stream():
+    """The AGENT_EVENTS_FD pipe, opened once per process (None if not set)."""
+    global _fd_stream
+    with _fd_lock:
+        if _fd_stream is None and os.getenv(EVENTS_FD_ENV):
+            _fd_stream = os.fdopen(int(os.environ[EVENTS_FD_ENV]), "w", buffering=1)
+        return _fd_stream
+
+
+class EventSink:
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._stream = None if callback else _events_stream()
+
+    def emit(self, type: str, **fields):
+        event = {"type": type, "ts": time.time(), **fields}
+        if self._callback:
+            try:
+                self._callback(event)
+            except Exception as e:
+                logger.warning(f"Event callback failed for {type}: {e}")
+        elif self._stream:
+            line = json.dumps(event, default=str) + "\n"
+            with _fd_lock:
+                try:
+                    self._stream.write(line)
+                except (BrokenPipeError, ValueError):
+                    self._stream = None
+
+
+def read_events(stream, on_event):
+    """Consume a JSON-lines event stream until EOF, calling on_event(event) for each."""
+    for line in stream:
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Malformed agent event: {line[:200]!r}")
+            continue
+        on_event(event)
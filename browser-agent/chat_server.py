@@ -5,7 +5,6 @@ Thin FastAPI wrapper around Claude API + WebFlor tools.
 Run: cd browser-agent && uv run uvicorn chat_server:app --port 8000 --reload
 """
 
-import csv
 import json
 import logging
 import os
@@ -24,143 +23,67 @@ load_dotenv()
 
 # Make webflor_auth importable
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from webflor_auth import ensure_session, webflor_fetch
+from webflor_auth import cache_stats, ensure_session, limiter_stats, pool_stats, prewarm_connections, webflor_fetch
+
+import reference_data
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-DATA_DIR = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-
 
 # ─── Local data helpers ──────────────────────────────────────────────────
 
 def load_cached_json(filename: str) -> list[dict]:
-    filepath = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(filepath):
-        return []
-    with open(filepath, "r") as f:
-        data = json.load(f)
-        return data if isinstance(data, list) else [data]
+    return reference_data.load_records(filename)
 
 
 def search_cached(filename: str, field: str, query: str, max_results: int = 20) -> list[dict]:
-    data = load_cached_json(filename)
-    q = query.lower()
-    return [item for item in data if q in str(item.get(field, "")).lower()][:max_results]
+    return reference_data.search(filename, field, query, max_results)
 
 
 def search_clients_csv(query: str) -> list[dict]:
-    filepath = os.path.join(DATA_DIR, "clientes.csv")
-    if not os.path.exists(filepath):
+    if not reference_data.exists(reference_data.CLIENTES_FILE):
         return []
-    q = query.strip().lower()
-    results = []
-    with open(filepath, "r", encoding="utf-8-sig") as f:
-        for row in csv.DictReader(f):
-            searchable = " ".join(str(v) for v in row.values()).lower()
-            if q in searchable:
-                results.append({
-                    "Codigo": row.get("Codigo", ""),
-                    "IdCliente": row.get("IdCliente", ""),
-                    "NomCliente": row.get("NomCliente", ""),
-                    "Estado": row.get("Estado", ""),
-                })
-                if len(results) >= 30:
-                    break
-    return results
+    return [
+        {k: row.get(k, "") for k in ("Codigo", "IdCliente", "NomCliente", "Estado", "_match")}
+        for row in reference_data.search_customers(query, 30)
+    ]
 
 
 def search_empaques_csv(query: str) -> list[dict]:
-    filepath = os.path.join(DATA_DIR, "packaging_webflor_items_list.csv")
-    if not os.path.exists(filepath):
-        return []
-    keywords = query.lower().split()
-    results = []
-    with open(filepath, "r") as f:
-        # Skip to header
-        while True:
-            pos = f.tell()
-            line = f.readline()
-            if not line:
-                return []
-            if line.startswith("IdEmpaque"):
-                f.seek(pos)
-                break
-        for row in csv.DictReader(f):
-            nom = (row.get("NomEmpaque") or "").lower()
-            if all(kw in nom for kw in keywords):
-                results.append({
-                    "IdEmpaque": row.get("IdEmpaque"),
-                    "NomEmpaque": row.get("NomEmpaque"),
-                    "IdProducto": row.get("IdProducto"),
-                    "NomProducto": row.get("NomProducto"),
-                    "NomColor": row.get("NomColor"),
-                    "NomVariedad": row.get("NomVariedad"),
-                })
-                if len(results) >= 20:
-                    break
-    return results
+    return [
+        {
+            "IdEmpaque": row.get("IdEmpaque"),
+            "NomEmpaque": row.get("NomEmpaque"),
+            "IdProducto": row.get("IdProducto"),
+            "NomProducto": row.get("NomProducto"),
+            "NomColor": row.get("NomColor"),
+            "NomVariedad": row.get("NomVariedad"),
+        }
+        for row in reference_data.search_empaques(query)
+    ]
 
 
 def search_customer_notes_csv(customer_code: str) -> list[dict]:
-    filepath = os.path.join(DATA_DIR, "customer_notes.csv")
-    if not os.path.exists(filepath):
-        return []
-    results = []
-    with open(filepath, "r", encoding="utf-8-sig") as f:
-        for row in csv.DictReader(f):
-            if row.get("customer_code", "").strip() == customer_code.strip():
-                results.append(row)
-    return results
+    return [
+        row for row in reference_data.load_csv_rows("customer_notes.csv")
+        if row.get("customer_code", "").strip() == customer_code.strip()
+    ]
 
 
 def lookup_item_mappings_csv(item_code: str) -> list[dict]:
-    filepath = os.path.join(DATA_DIR, "item_mappings.csv")
-    if not os.path.exists(filepath):
-        return []
-    results = []
-    with open(filepath, newline="", encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            if row.get("item_code", "").strip().upper() == item_code.strip().upper():
-                results.append(row)
-    return results
+    return [
+        row for row in reference_data.load_csv_rows("item_mappings.csv")
+        if row.get("item_code", "").strip().upper() == item_code.strip().upper()
+    ]
 
 
 def search_picklists_data(query: str, category: str = "") -> list[dict]:
-    filepath = os.path.join(DATA_DIR, "picklists.json")
-    if not os.path.exists(filepath):
-        return []
-    with open(filepath, "r") as f:
-        data = json.load(f)
-    q = query.lower()
-    results = []
-    categories = [category] if category and category in data else list(data.keys())
-    for cat in categories:
-        for item in data.get(cat, []):
-            val = str(item.get("NomPickList", "") or item.get("Nombre", "")).lower()
-            if q in val:
-                item_copy = {k: v for k, v in item.items() if k != "$id"}
-                item_copy["_category"] = cat
-                results.append(item_copy)
-                if len(results) >= 20:
-                    break
-        if len(results) >= 20:
-            break
-    return results
+    return reference_data.search_picklists(query, category)
 
 
-_SEMANAS_CACHE: list[dict] | None = None
-
 def load_semanas() -> list[dict]:
-    global _SEMANAS_CACHE
-    if _SEMANAS_CACHE is None:
-        path = os.path.join(DATA_DIR, "semanas_2026.json")
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                _SEMANAS_CACHE = json.load(f)
-        else:
-            _SEMANAS_CACHE = []
-    return _SEMANAS_CACHE
+    return reference_data.load_records("semanas_2026.json")
 
 
 # ─── App setup ───────────────────────────────────────────────────────────
@@ -467,24 +390,22 @@ async def execute_tool(name: str, args: dict) -> str:
             return json.dumps(search_cached("fincas.json", "NomFinca", args.get("query", "")), default=str)
 
         elif name == "search_active_varieties":
-            filepath = os.path.join(DATA_DIR, "current_active_varieties.csv")
-            if not os.path.exists(filepath):
+            if not reference_data.exists("current_active_varieties.csv"):
                 return json.dumps({"error": "current_active_varieties.csv not found"})
             q = args.get("query", "").lower()
             product_filter = args.get("product", "").lower()
             color_filter = args.get("color", "").lower()
             results = []
-            with open(filepath, "r", encoding="utf-8-sig") as f:
-                for row in csv.DictReader(f):
-                    if q and q not in (row.get("VARIEDAD", "")).lower():
-                        continue
-                    if product_filter and product_filter not in (row.get("PRODUCTO", "")).lower():
-                        continue
-                    if color_filter and color_filter not in (row.get("COLOR", "")).lower():
-                        continue
-                    results.append(row)
-                    if len(results) >= 30:
-                        break
+            for row in reference_data.load_csv_rows("current_active_varieties.csv"):
+                if q and q not in (row.get("VARIEDAD", "")).lower():
+                    continue
+                if product_filter and product_filter not in (row.get("PRODUCTO", "")).lower():
+                    continue
+                if color_filter and color_filter not in (row.get("COLOR", "")).lower():
+                    continue
+                results.append(row)
+                if len(results) >= 30:
+                    break
             return json.dumps(results, default=str)
 
         elif name == "search_compositions":
@@ -619,9 +540,22 @@ async def chat(req: ChatRequest):
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+@app.on_event("startup")
+async def startup():
+    reference_data.preload()
+    reference_data.start_watcher()
+    await prewarm_connections()
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "reference_data_generation": reference_data.generation(),
+        "webflor_pool": pool_stats(),
+        "webflor_cache": cache_stats(),
+        "webflor_limiter": limiter_stats(),
+    }
 
 
 # ─── REST endpoints for CopilotKit actions (frontend calls these) ────────
@@ -7,6 +7,11 @@ WebFlor via the MCP server's API functions.
 Usage:
     cd browser-agent
     uv run deterministic_enter_agent.py --order orders/instructions/POFrootfulTest-01.md
+    uv run deterministic_enter_agent.py --batch orders/instructions/ --concurrency 6
+    uv run deterministic_enter_agent.py --proposals <proposal_id> <proposal_id> ...
+    uv run deterministic_enter_agent.py --order ... --audit   # verify with a full re-read of the order
+
+In-process: `await run_enter(order_path)` returns the created order's ID/link.
 """
 
 import argparse
@@ -16,11 +21,14 @@ import os
 import sys
 import time
 from datetime import datetime
+from typing import Any
 
 import mistune
 
 from dotenv import load_dotenv
 
+from run_logging import RunLogHandler, close_run_log, open_run_log
+
 load_dotenv()
 
 # ─── Logging ──────────────────────────────────────────────────────────────
@@ -42,23 +50,24 @@ _auth_logger.propagate = False
 _auth_logger.addHandler(_console)
 
 
-def _setup_file_logging(run_name: str) -> str:
+def _setup_file_logging(run_name: str) -> tuple[str, RunLogHandler]:
+    # Per-run handler: concurrent in-process runs don't write into each other's logs
     log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_path = os.path.join(log_dir, f"enter_det_{run_name}_{timestamp}.log")
-    fh = logging.FileHandler(log_path, encoding="utf-8")
-    fh.setLevel(logging.DEBUG)
-    fh.setFormatter(logging.Formatter("%(asctime)s %(levelname)-5s %(message)s"))
-    logger.addHandler(fh)
-    _auth_logger.addHandler(fh)
-    return log_path
+    return log_path, open_run_log(log_path, [logger, _auth_logger])
+
+
+def _remove_file_logging(fh: RunLogHandler):
+    close_run_log(fh)
 
 
 # ─── WebFlor API ─────────────────────────────────────────────────────────
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from webflor_auth import ensure_session, webflor_fetch, _order_link
+from webflor_auth import ensure_session, limiter_stats, run_loop, webflor_fetch, _order_link
+from agent_events import EventSink
 
 
 # ─── Parse .md order file ─────────────────────────────────────────────────
@@ -130,6 +139,23 @@ _FIELD_MAP = {
 }
 
 
+def _order_details(table: list[dict]) -> dict:
+    """Order Details rows (2-column: Field | Value) → {internal key: raw value}."""
+    details = {}
+    for row in table:
+        field = row.get("Field", "").strip().lower()
+        value = row.get("Value", "").strip()
+        if field in _FIELD_MAP and value:
+            details[_FIELD_MAP[field]] = value
+    return details
+
+
+def parse_order_details(text: str) -> dict:
+    """Just the Order Details table of a V2 .md order (raw string values, no validation)."""
+    tables = _parse_md_tables(text)
+    return _order_details(tables[0]) if tables else {}
+
+
 def parse_order_file(path: str) -> dict:
     """Parse a V2 .md order instruction file into structured data."""
     with open(path, "r") as f:
@@ -139,14 +165,8 @@ def parse_order_file(path: str) -> dict:
     if len(tables) < 2:
         raise ValueError(f"Expected at least 2 tables (Order Details + Items), found {len(tables)}")
 
-    order = {}
-
-    # First table: Order Details (2-column: Field | Value)
-    for row in tables[0]:
-        field = row.get("Field", "").strip().lower()
-        value = row.get("Value", "").strip()
-        if field in _FIELD_MAP and value:
-            order[_FIELD_MAP[field]] = value
+    # First table: Order Details
+    order = _order_details(tables[0])
 
     # Convert types
     if "client_erp_id" in order:
@@ -234,6 +254,14 @@ async def api_get_order_items(order_id: int) -> list[dict]:
     return data if isinstance(data, list) else []
 
 
+async def api_get_order_item(item_id: int) -> Any:
+    """Get a single order item's detail row."""
+    return await webflor_fetch(
+        "/WebFlorVenta/API/listarItemDetalleOrdenByIdPedidoItem",
+        params={"iIdPedidoItem": str(item_id)},
+    )
+
+
 async def api_update_order_item(body: dict) -> dict:
     """Update an order item via editarOrdenIt."""
     # Auto-inject write field names
@@ -291,15 +319,134 @@ def _to_api_date(date_str: str) -> str:
     raise ValueError(f"Unrecognized date format: {date_str}")
 
 
+# ─── Step Graph ───────────────────────────────────────────────────────────
+
+class StepGraph:
+    """Tiny DAG executor: each step starts as soon as all of its dependencies finish.
+
+    A step is `async fn(results) -> value`, where `results` maps finished step
+    names to their values. Records each step's start/end so the critical path
+    (the dependency chain that determined total time) can be reported.
+    """
+
+    def __init__(self):
+        self._steps: dict[str, tuple] = {}
+        self.timings: dict[str, tuple[float, float]] = {}
+
+    def add(self, name: str, fn, deps: tuple[str, ...] = ()):
+        for dep in deps:
+            if dep not in self._steps:
+                raise ValueError(f"Step {name!r} depends on unknown step {dep!r}")
+        self._steps[name] = (fn, deps)
+
+    async def run(self) -> dict:
+        results: dict = {}
+        started = time.time()
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def _run_step(name: str):
+            fn, deps = self._steps[name]
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+            step_start = time.time()
+            results[name] = await fn(results)
+            self.timings[name] = (step_start - started, time.time() - started)
+
+        # Steps are added in dependency order, so every dep's task exists already
+        for name in self._steps:
+            tasks[name] = asyncio.create_task(_run_step(name))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return results
+
+    def critical_path(self) -> list[str]:
+        """Steps on the longest dependency chain, ending at the last step to finish."""
+        if not self.timings:
+            return []
+        name = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [name]
+        while self._steps[name][1]:
+            name = max(self._steps[name][1], key=lambda n: self.timings[n][1])
+            path.append(name)
+        return path[::-1]
+
+
 # ─── Main Flow ────────────────────────────────────────────────────────────
 
-async def enter_order(order_file: str) -> dict:
-    """Execute the full deterministic enter flow."""
-    run_start = time.time()
+# Verify by re-reading the whole order (header + all items) instead of from write responses
+VERIFY_FULL_READ = os.getenv("ENTER_VERIFY_FULL_READ", "") == "1"
+# More unconfirmed item writes than this → one full items GET instead of per-item GETs
+VERIFY_TARGETED_MAX = int(os.getenv("ENTER_VERIFY_TARGETED_MAX", "3"))
+
+# editarOrdenIt rejects these read-only / display fields
+_ITEM_READONLY_FIELDS = [
+    "$id", "NomEmpaque", "NomCaja", "NomMarca", "NombreDimension",
+    "NomTipoCorte", "NomFinca", "NomTipoOrden", "TipoEmpaque",
+    "EsNoMulti", "CajasFullesConfirmadas", "RecetaCantidadRamos",
+    "TipoPrecioReceta", "PickTipoEmpaque", "ValorPick",
+]
+
 
-    # 0. Ensure WebFlor session
-    logger.info("STEP 0: Authenticating to WebFlor...")
-    await ensure_session()
+def _same_value(current, target) -> bool:
+    # WebFlor returns ids as ints and blanks as null; the order file has strings
+    return str("" if current is None else current).strip() == str(target).strip()
+
+
+def _item_diff(ci: dict, target: dict) -> dict:
+    """Fields of a copied item that differ from the order file's target, as {field: (current, target)}."""
+    wanted = {"CantidadCaja": target["cajas"], "CajaConfirmada": target["cajas"]}
+    if target.get("caja_id"):
+        wanted["CajaId"] = target["caja_id"]
+    if ci.get("Receta", 0) in (0, 1) and target.get("pull_date"):
+        wanted["PullDate"] = target["pull_date"]
+    return {
+        field: (ci.get(field), value)
+        for field, value in wanted.items()
+        if not _same_value(ci.get(field), value)
+    }
+
+
+def _write_row(data: Any, key: str, value: int) -> dict | None:
+    """The written row, if a write/GET response carries it (matched on `key`)."""
+    row = data[0] if isinstance(data, list) and len(data) == 1 else data
+    if isinstance(row, dict) and str(row.get(key)) == str(value):
+        return row
+    return None
+
+
+def _write_acknowledged(data: Any) -> bool:
+    """A bare success answer (true / affected-row count) — the sent body was applied as-is."""
+    if isinstance(data, bool):
+        return data
+    return isinstance(data, int) and data > 0
+
+
+async def enter_order(order_file: str, events: EventSink | None = None,
+                      authenticate: bool = True, full_verify: bool | None = None) -> dict:
+    """Execute the full deterministic enter flow.
+
+    Steps run as a dependency graph: after the copy, the header GET+PUT overlaps
+    the items / datos adicionales fetches, and recipe containers are fetched and
+    updated in parallel across Receta=2 items. Items and recipe containers that
+    already match the order file (e.g. a copied standing order) are not written.
+
+    Verification rebuilds the final order from the copied state plus the write
+    responses. Rows whose write response doesn't echo the written row (a bare
+    true / row count, or anything ambiguous) are re-read one by one — the header
+    with its own GET, items with per-item GETs. full_verify (default
+    ENTER_VERIFY_FULL_READ) re-reads the whole order instead.
+
+        auth → copy ─┬─ get_header → update_header ────────────────────┬─ verify
+                     └─ get_items → plan → datos ─→ items ─→ recipes ──┘
+    """
+    run_start = time.time()
+    events = events or EventSink()
+    if full_verify is None:
+        full_verify = VERIFY_FULL_READ
 
     # 1. Parse the order file
     order = parse_order_file(order_file)
@@ -310,150 +457,292 @@ async def enter_order(order_file: str) -> dict:
 
     ref_id = order["reference_order_id"]
     items_table = {item["id_empaque"]: item for item in order["items"]}
-
-    # 2. Copy the reference order
-    logger.info(f"STEP 2: Copying reference order {ref_id}...")
-    new_order_id = await api_copy_order(ref_id)
-    logger.info(f"  → New order ID: {new_order_id}")
-
-    # 3. Update order header
-    logger.info("STEP 3: Updating order header...")
-
-    # Use individual fecha fields if present, fall back to consolidation_date
-    consol = order.get("consolidation_date", "")
-    fecha_orden = order.get("fecha_orden") or datetime.now().strftime("%m/%d/%Y")
-    fecha_elaboracion = order.get("fecha_elaboracion") or consol
-    fecha_entrega = order.get("fecha_entrega") or consol
-    fecha_llegada = order.get("fecha_llegada") or consol
-
-    # GET full order first, then merge updates (actualizarOrden requires full object)
-    full_order = await api_get_order(new_order_id)
-    full_order["PO"] = order["po"]
-    full_order["Comentario"] = order.get("comments", "Entered by Frootful")
-    full_order["FechaOrden"] = _to_api_date(fecha_orden)
-    full_order["FechaElaboracion"] = _to_api_date(fecha_elaboracion)
-    full_order["FechaEntrega"] = _to_api_date(fecha_entrega)
-    full_order["FechaLlegada"] = _to_api_date(fecha_llegada)
-    await api_update_order(new_order_id, full_order)
-    logger.info(f"  → Header updated: PO={order['po']}, Entrega={_to_api_date(fecha_entrega)}")
-
-    # 4. Update item quantities
-    logger.info(f"STEP 4: Updating items...")
-    copied_items = await api_get_order_items(new_order_id)
-    logger.info(f"  → {len(copied_items)} items in copied order")
-
-    # Fetch datos adicionales for Receta=1 items to preserve NombreUPC/NumeroUPC
-    # (editarOrdenIt wipes these fields if they're not included in the request body)
-    simple_items = [ci for ci in copied_items if ci.get("Receta", 0) in (0, 1)]
-    if simple_items:
+    skipped = {"item_updates": 0, "datos_fetches": 0, "recipe_updates": 0}
+
+    async def auth(r):
+        # 0. Ensure WebFlor session (batch mode validates once for all orders)
+        if authenticate:
+            logger.info("STEP 0: Authenticating to WebFlor...")
+            await ensure_session()
+
+    async def copy(r) -> int:
+        # 2. Copy the reference order
+        logger.info(f"STEP 2: Copying reference order {ref_id}...")
+        events.emit("status", message=f"Copying reference order {ref_id}...")
+        new_order_id = await api_copy_order(ref_id)
+        logger.info(f"  → New order ID: {new_order_id}")
+        # The order exists in WebFlor from here on — report it even if a later step fails
+        events.emit("status", message=f"Created order {new_order_id}", order_id=new_order_id)
+        return new_order_id
+
+    async def get_header(r) -> dict:
+        return await api_get_order(r["copy"])
+
+    async def update_header(r):
+        # 3. Update order header
+        logger.info("STEP 3: Updating order header...")
+        events.emit("status", message="Updating order header...")
+
+        # Use individual fecha fields if present, fall back to consolidation_date
+        consol = order.get("consolidation_date", "")
+        fecha_orden = order.get("fecha_orden") or datetime.now().strftime("%m/%d/%Y")
+        fecha_elaboracion = order.get("fecha_elaboracion") or consol
+        fecha_entrega = order.get("fecha_entrega") or consol
+        fecha_llegada = order.get("fecha_llegada") or consol
+
+        # actualizarOrden requires the full object — merge updates into the GET result
+        full_order = dict(r["get_header"])
+        full_order["PO"] = order["po"]
+        full_order["Comentario"] = order.get("comments", "Entered by Frootful")
+        full_order["FechaOrden"] = _to_api_date(fecha_orden)
+        full_order["FechaElaboracion"] = _to_api_date(fecha_elaboracion)
+        full_order["FechaEntrega"] = _to_api_date(fecha_entrega)
+        full_order["FechaLlegada"] = _to_api_date(fecha_llegada)
+        response = await api_update_order(r["copy"], full_order)
+        logger.info(f"  → Header updated: PO={order['po']}, Entrega={_to_api_date(fecha_entrega)}")
+        # actualizarOrden takes the full object, so a successful PUT leaves exactly full_order
+        row = _write_row(response, "IdPedido", r["copy"])
+        return {"order": {**full_order, **(row or {})}, "confirmed": row is not None}
+
+    async def get_items(r) -> list[dict]:
+        copied_items = await api_get_order_items(r["copy"])
+        logger.info(f"  → {len(copied_items)} items in copied order")
+        return copied_items
+
+    async def plan(r) -> dict:
+        # Diff each copied item against its target; only changed items get a PUT
+        changes = {}
+        for ci in r["get_items"]:
+            target = items_table.get(ci["IdEmpaque"])
+            if not target:
+                continue
+            diff = _item_diff(ci, target)
+            if diff:
+                changes[ci["IdPedidoItem"]] = diff
+            else:
+                skipped["item_updates"] += 1
+                if ci.get("Receta", 0) in (0, 1):
+                    skipped["datos_fetches"] += 1
+                logger.info(f"  → {ci['NomEmpaque']}: already matches — no update needed")
+        return changes
+
+    async def datos(r) -> dict:
+        # Fetch datos adicionales for Receta=1 items to preserve NombreUPC/NumeroUPC
+        # (editarOrdenIt wipes these fields if they're not included in the request body).
+        # Items that won't be updated keep theirs untouched, so they're not fetched.
+        simple_items = [
+            ci for ci in r["get_items"]
+            if ci.get("Receta", 0) in (0, 1) and ci["IdPedidoItem"] in r["plan"]
+        ]
+        if not simple_items:
+            return {}
         logger.info(f"  → Fetching datos adicionales for {len(simple_items)} simple items (UPC preservation)...")
         datos_results = await asyncio.gather(
             *[api_get_datos_adicionales(ci["IdPedidoItem"]) for ci in simple_items]
         )
-        datos_by_item = {ci["IdPedidoItem"]: datos for ci, datos in zip(simple_items, datos_results)}
-    else:
-        datos_by_item = {}
-
-    updates = []
-    deletes = []
-    recipe_items = []  # (item, pull_date) tuples for Receta=2
-
-    for ci in copied_items:
-        emp_id = ci["IdEmpaque"]
-        item_id = ci["IdPedidoItem"]
-
-        if emp_id in items_table:
-            target = items_table[emp_id]
-            # Build update — start with the complete copied item object
-            update_body = dict(ci)
-            # Remove read-only / display fields not accepted by editarOrdenIt
-            for key in ["$id", "NomEmpaque", "NomCaja", "NomMarca", "NombreDimension",
-                        "NomTipoCorte", "NomFinca", "NomTipoOrden", "TipoEmpaque",
-                        "EsNoMulti", "CajasFullesConfirmadas", "RecetaCantidadRamos",
-                        "TipoPrecioReceta", "PickTipoEmpaque", "ValorPick"]:
-                update_body.pop(key, None)
-
-            # Set target quantities
-            update_body["CantidadCaja"] = target["cajas"]
-            update_body["CajaConfirmada"] = target["cajas"]
-
-            # Set CajaId if specified
-            if target.get("caja_id"):
-                update_body["CajaId"] = target["caja_id"]
-
-            # PullDate for simple items (Receta=0 or 1)
-            receta = ci.get("Receta", 0)
-            if receta in (0, 1) and target.get("pull_date"):
-                update_body["PullDate"] = target["pull_date"]
-
-            # Keep UPC blank (P.O. Ítem field)
-            update_body["UPC"] = update_body.get("UPC") or ""
-
-            # Preserve NombreUPC/NumeroUPC for simple items (copied by copiarPedido_Ajustes
-            # but wiped by editarOrdenIt if not included in the body)
-            if receta in (0, 1) and item_id in datos_by_item:
-                datos = datos_by_item[item_id]
-                if datos.get("NombreUPC"):
-                    update_body["NombreUPC"] = datos["NombreUPC"]
-                if datos.get("NumeroUPC"):
-                    update_body["NumeroUPC"] = datos["NumeroUPC"]
-
-            updates.append((item_id, update_body, ci["NomEmpaque"]))
-
-            # Track Receta=2 items for PullDate update in step 5
-            if receta == 2 and target.get("pull_date"):
-                recipe_items.append((item_id, target["pull_date"], ci["NomEmpaque"]))
-        else:
-            deletes.append((item_id, ci["NomEmpaque"]))
-
-    # Fire all updates and deletes in parallel
-    logger.info(f"  → {len(updates)} updates, {len(deletes)} deletes")
-
-    tasks = []
-    for item_id, body, name in updates:
-        logger.info(f"    UPDATE {name}: {body['CantidadCaja']} boxes, PullDate={body.get('PullDate', 'n/a')}")
-        tasks.append(api_update_order_item(body))
-    for item_id, name in deletes:
-        logger.info(f"    DELETE {name}")
-        tasks.append(api_delete_order_item(item_id, new_order_id))
-
-    if tasks:
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        errors = [r for r in results if isinstance(r, Exception)]
-        if errors:
-            for e in errors:
-                logger.error(f"  → Error: {e}")
-            raise RuntimeError(f"{len(errors)} item update(s) failed")
-        logger.info(f"  → All {len(tasks)} item operations completed")
-
-    # 5. Update PullDate for recipe items (Receta=2)
-    if recipe_items:
+        return {ci["IdPedidoItem"]: d for ci, d in zip(simple_items, datos_results)}
+
+    async def update_items(r) -> dict:
+        # 4. Update item quantities
+        logger.info(f"STEP 4: Updating items...")
+        events.emit("status", message="Updating items...")
+        new_order_id = r["copy"]
+        changes = r["plan"]
+        datos_by_item = r["datos"]
+
+        updates = []
+        deletes = []
+        recipe_items = []  # (item_id, pull_date, name) tuples for Receta=2
+
+        for ci in r["get_items"]:
+            emp_id = ci["IdEmpaque"]
+            item_id = ci["IdPedidoItem"]
+
+            if emp_id in items_table:
+                target = items_table[emp_id]
+                receta = ci.get("Receta", 0)
+
+                # Track Receta=2 items for PullDate update in step 5
+                if receta == 2 and target.get("pull_date"):
+                    recipe_items.append((item_id, target["pull_date"], ci["NomEmpaque"]))
+
+                if item_id not in changes:
+                    continue
+
+                # Build update — start with the complete copied item object
+                update_body = dict(ci)
+                for key in _ITEM_READONLY_FIELDS:
+                    update_body.pop(key, None)
+
+                # Set target quantities
+                update_body["CantidadCaja"] = target["cajas"]
+                update_body["CajaConfirmada"] = target["cajas"]
+
+                # Set CajaId if specified
+                if target.get("caja_id"):
+                    update_body["CajaId"] = target["caja_id"]
+
+                # PullDate for simple items (Receta=0 or 1)
+                if receta in (0, 1) and target.get("pull_date"):
+                    update_body["PullDate"] = target["pull_date"]
+
+                # Keep UPC blank (P.O. Ítem field)
+                update_body["UPC"] = update_body.get("UPC") or ""
+
+                # Preserve NombreUPC/NumeroUPC for simple items (copied by copiarPedido_Ajustes
+                # but wiped by editarOrdenIt if not included in the body)
+                if receta in (0, 1) and item_id in datos_by_item:
+                    d = datos_by_item[item_id]
+                    if d.get("NombreUPC"):
+                        update_body["NombreUPC"] = d["NombreUPC"]
+                    if d.get("NumeroUPC"):
+                        update_body["NumeroUPC"] = d["NumeroUPC"]
+
+                updates.append((item_id, update_body, ci["NomEmpaque"]))
+            else:
+                deletes.append((item_id, ci["NomEmpaque"]))
+
+        # Fire all updates and deletes in parallel
+        logger.info(f"  → {len(updates)} updates, {len(deletes)} deletes, {skipped['item_updates']} unchanged")
+
+        tasks = []
+        for item_id, body, name in updates:
+            diff = ", ".join(f"{f}: {old!r} → {new!r}" for f, (old, new) in changes[item_id].items())
+            logger.info(f"    UPDATE {name}: {diff}")
+            tasks.append(api_update_order_item(body))
+        for item_id, name in deletes:
+            logger.info(f"    DELETE {name}")
+            tasks.append(api_delete_order_item(item_id, new_order_id))
+
+        results = []
+        if tasks:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [e for e in results if isinstance(e, Exception)]
+            if errors:
+                for e in errors:
+                    logger.error(f"  → Error: {e}")
+                raise RuntimeError(f"{len(errors)} item update(s) failed")
+            logger.info(f"  → All {len(tasks)} item operations completed")
+
+        # Final item state: copied rows, overlaid with what each write says it did.
+        # Writes that didn't echo the row are applied as sent and re-read in verify.
+        final_items = {ci["IdPedidoItem"]: ci for ci in r["get_items"]}
+        unconfirmed = []
+        for (item_id, body, _), response in zip(updates, results):
+            row = _write_row(response, "IdPedidoItem", item_id)
+            if row is not None:
+                final_items[item_id] = {**final_items[item_id], **row}
+                continue
+            if _write_acknowledged(response):
+                final_items[item_id] = {**final_items[item_id], **body}
+            unconfirmed.append(item_id)
+        for (item_id, _), response in zip(deletes, results[len(updates):]):
+            if isinstance(response, dict) and response.get("_status", 200) >= 400:
+                logger.warning(f"  → Delete of item {item_id} failed: {response}")
+                continue
+            if _write_acknowledged(response):
+                del final_items[item_id]
+            unconfirmed.append(item_id)
+        return {"recipe_items": recipe_items, "final_items": final_items, "unconfirmed": unconfirmed}
+
+    async def recipes(r):
+        # 5. Update PullDate for recipe items (Receta=2). Containers are fetched after
+        # the item updates (editarOrdenIt can rewrite them), all items at once.
+        recipe_items = r["update_items"]["recipe_items"]
+        if not recipe_items:
+            logger.info("STEP 5: No recipe items — skipping PullDate recipe update")
+            return
         logger.info(f"STEP 5: Updating PullDate for {len(recipe_items)} recipe items...")
+        all_containers = await asyncio.gather(
+            *[api_get_order_item_recipes(item_id) for item_id, _, _ in recipe_items]
+        )
         recipe_tasks = []
-        for item_id, pull_date, name in recipe_items:
-            containers = await api_get_order_item_recipes(item_id)
+        for (item_id, pull_date, name), containers in zip(recipe_items, all_containers):
             logger.info(f"  → {name}: {len(containers)} recipe containers")
             for container in containers:
+                if _same_value(container.get("PullDate"), pull_date):
+                    skipped["recipe_updates"] += 1
+                    continue
                 container["PullDate"] = pull_date
                 logger.debug(f"    Container {container['IdPedidoItemReceta']} ({container.get('NombreReceta', '?')}): PullDate={pull_date}")
                 recipe_tasks.append(api_update_recipe_datos_adicionales(container))
 
         if recipe_tasks:
             results = await asyncio.gather(*recipe_tasks, return_exceptions=True)
-            errors = [r for r in results if isinstance(r, Exception)]
+            errors = [e for e in results if isinstance(e, Exception)]
             if errors:
                 for e in errors:
                     logger.error(f"  → Recipe error: {e}")
             logger.info(f"  → {len(recipe_tasks)} recipe PullDate updates completed ({len(errors)} errors)")
-    else:
-        logger.info("STEP 5: No recipe items — skipping PullDate recipe update")
-
-    # 6. Verify
-    logger.info(f"STEP 6: Verifying...")
-    final_order, final_items = await asyncio.gather(
-        api_get_order(new_order_id),
-        api_get_order_items(new_order_id),
-    )
+
+    async def verify(r) -> tuple[dict, list[dict], str]:
+        # 6. Verify — returns (order, items, how: "full" / "writes")
+        logger.info(f"STEP 6: Verifying...")
+        events.emit("status", message="Verifying...")
+        if full_verify:
+            logger.info("  → Full re-read of order header and items")
+            header, items = await asyncio.gather(
+                api_get_order(r["copy"]),
+                api_get_order_items(r["copy"]),
+            )
+            return header, items, "full"
+
+        # Header and items as the writes left them; re-read only the unconfirmed rows
+        header = r["update_header"]["order"]
+        final_items = dict(r["update_items"]["final_items"])
+        unconfirmed = r["update_items"]["unconfirmed"]
+        reread_header = not r["update_header"]["confirmed"]
+        reread_all_items = len(unconfirmed) > VERIFY_TARGETED_MAX
+        reads = [api_get_order(r["copy"])] if reread_header else []
+        if reread_all_items:
+            reads.append(api_get_order_items(r["copy"]))
+        else:
+            reads.extend(api_get_order_item(item_id) for item_id in unconfirmed)
+        if not reads:
+            logger.info("  → Verified from write responses (every write echoed its row)")
+            return header, list(final_items.values()), "writes"
+        logger.info(
+            f"  → Re-reading {'header + ' if reread_header else ''}"
+            + (f"all items ({len(unconfirmed)} unconfirmed writes)" if reread_all_items
+               else f"{len(unconfirmed)} items with unconfirmed writes")
+        )
+        rows = list(await asyncio.gather(*reads))
+
+        if reread_header:
+            data = rows.pop(0)
+            if isinstance(data, dict) and "_error" in data:
+                logger.warning(f"  ⚠ Couldn't re-read order header: {data['_error']}")
+            else:
+                header = data
+        if reread_all_items:
+            return header, rows[0], "writes"
+        for item_id, data in zip(unconfirmed, rows):
+            if isinstance(data, dict) and "_error" in data:
+                logger.warning(f"  ⚠ Couldn't re-read item {item_id}: {data['_error']}")
+                continue
+            row = _write_row(data, "IdPedidoItem", item_id)
+            if row is None:
+                final_items.pop(item_id, None)  # no longer in the order (deleted)
+            else:
+                final_items[item_id] = {**final_items.get(item_id, {}), **row}
+        return header, list(final_items.values()), "writes"
+
+    graph = StepGraph()
+    graph.add("auth", auth)
+    graph.add("copy", copy, ("auth",))
+    graph.add("get_header", get_header, ("copy",))
+    graph.add("update_header", update_header, ("get_header",))
+    graph.add("get_items", get_items, ("copy",))
+    graph.add("plan", plan, ("get_items",))
+    graph.add("datos", datos, ("plan",))
+    # Item writes wait for the header PUT so the two never race on the same order
+    graph.add("update_items", update_items, ("datos", "update_header"))
+    graph.add("recipes", recipes, ("update_items",))
+    graph.add("verify", verify, ("recipes", "update_header"))
+    results = await graph.run()
+
+    new_order_id = results["copy"]
+    final_order, final_items, verified_by = results["verify"]
 
     logger.info(f"  → Order {new_order_id}: PO={final_order.get('PO')}")
     logger.info(f"  → {len(final_items)} items:")
@@ -481,34 +770,195 @@ async def enter_order(order_file: str) -> dict:
     link = _order_link(new_order_id)
 
     # 7. Report
-    print(f"\n{'='*60}")
-    print(f"Order created: {new_order_id}")
-    print(f"PO: {order['po']}")
-    print(f"Link: {link}")
-    print(f"Items: {len(final_items)}")
-    print(f"Duration: {elapsed:.1f}s")
-    if extra:
-        print(f"WARNING: Extra items not deleted: {extra}")
-    if missing:
-        print(f"WARNING: Missing items: {missing}")
-    print(f"{'='*60}")
-
     logger.info(f"DONE — Order {new_order_id} created in {elapsed:.1f}s")
     logger.info(f"Link: {link}")
+    critical_path = graph.critical_path()
+    step_times = {name: round(end - start, 3) for name, (start, end) in graph.timings.items()}
+    logger.info(f"Critical path: {' → '.join(f'{n} ({step_times[n]:.2f}s)' for n in critical_path)}")
+    logger.info(
+        f"Skipped {sum(skipped.values())} no-op calls: {skipped['item_updates']} item updates, "
+        f"{skipped['datos_fetches']} datos fetches, {skipped['recipe_updates']} recipe updates"
+    )
+    stats = limiter_stats()
+    logger.info(f"WebFlor calls (concurrency limit {stats['limit']}, {stats['decreases']} backoffs):")
+    for site, m in stats["sites"].items():
+        logger.info(f"  {site}: {m['calls']} calls, {m['retries']} retries, {m['errors']} errors, avg {m['latency_avg']:.2f}s, max {m['latency_max']:.2f}s")
 
     return {
         "order_id": new_order_id,
+        "po": order["po"],
         "link": link,
         "items": len(final_items),
+        "extra": sorted(extra),
+        "missing": sorted(missing),
         "duration": elapsed,
+        "critical_path": critical_path,
+        "step_times": step_times,
+        "skipped_calls": skipped,
+        "verify": verified_by,
+    }
+
+
+async def run_enter(order_path: str, on_event=None, full_verify: bool | None = None,
+                    authenticate: bool = True) -> dict:
+    """In-process entry point: enter_order() with a per-run log file.
+
+    Progress/result go out as agent_events (to `on_event`, or the AGENT_EVENTS_FD
+    pipe when run as a subprocess).
+    """
+    events = EventSink(on_event)
+    run_name = os.path.splitext(os.path.basename(order_path))[0]
+    log_path, fh = _setup_file_logging(run_name)
+    try:
+        result = await enter_order(order_path, events, authenticate=authenticate, full_verify=full_verify)
+    except Exception as e:
+        events.emit("error", message=str(e))
+        raise
+    finally:
+        _remove_file_logging(fh)
+    result["log_path"] = log_path
+    events.emit("result", **result)
+    return result
+
+
+def run_enter_sync(order_path: str) -> dict:
+    """run_enter() for process-pool workers."""
+    return run_loop(run_enter(order_path))
+
+
+# ─── Batch Mode ───────────────────────────────────────────────────────────
+
+BATCH_CONCURRENCY = int(os.getenv("ENTER_BATCH_CONCURRENCY", "4"))
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _collect_order_files(paths: list[str]) -> list[str]:
+    """Expand directories (their *.md files, sorted) and resolve paths relative to this folder."""
+    files = []
+    for path in paths:
+        if not os.path.isabs(path):
+            path = os.path.join(_AGENT_DIR, path)
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith(".md"))
+        else:
+            files.append(path)
+    return files
+
+
+def _load_proposal_orders(proposal_ids: list[str]) -> list[str]:
+    """Write each proposal's webflor_order_md to tmp/ and return the file paths."""
+    from supabase_config import create_supabase_client
+    sb = create_supabase_client()
+    rows = sb.table("order_change_proposals").select("id, metadata").in_("id", proposal_ids).execute().data or []
+    md_by_id = {row["id"]: (row.get("metadata") or {}).get("webflor_order_md") for row in rows}
+
+    tmp_dir = os.path.join(_AGENT_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    files = []
+    for proposal_id in proposal_ids:
+        if not md_by_id.get(proposal_id):
+            logger.error(f"Proposal {proposal_id} not found or has no webflor_order_md — skipping")
+            continue
+        path = os.path.join(tmp_dir, f"proposal_{proposal_id}.md")
+        with open(path, "w") as f:
+            f.write(md_by_id[proposal_id])
+        files.append(path)
+    return files
+
+
+async def enter_orders(order_paths: list[str], concurrency: int = BATCH_CONCURRENCY,
+                       on_event=None, full_verify: bool | None = None) -> dict:
+    """Enter several .md orders concurrently in this process (one session, one HTTP pool).
+
+    At most `concurrency` orders are in flight; a failing order doesn't affect
+    the others. Returns {"results": [...per order...], "succeeded", "failed", "duration"}.
+    """
+    events = EventSink(on_event)
+    batch_start = time.time()
+    log_path, fh = _setup_file_logging(f"batch_{len(order_paths)}")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _enter_one(path: str) -> dict:
+        name = os.path.basename(path)
+        created: dict = {}
+
+        def _on_order_event(event: dict):
+            if event.get("order_id"):
+                created["order_id"] = event["order_id"]
+            events.emit(event.pop("type"), order_file=name, **{k: v for k, v in event.items() if k != "ts"})
+
+        async with semaphore:
+            try:
+                result = await enter_order(path, EventSink(_on_order_event), authenticate=False,
+                                           full_verify=full_verify)
+                return {"file": name, "ok": True, **result}
+            except Exception as e:
+                logger.error(f"[{name}] Failed: {e}", exc_info=True)
+                return {"file": name, "ok": False, "error": str(e), "order_id": created.get("order_id")}
+
+    try:
+        # One login up front; every order reuses the session and connection pool
+        await ensure_session()
+        results = await asyncio.gather(*(_enter_one(path) for path in order_paths))
+    finally:
+        _remove_file_logging(fh)
+
+    summary = {
+        "results": results,
+        "succeeded": sum(r["ok"] for r in results),
+        "failed": sum(not r["ok"] for r in results),
+        "duration": time.time() - batch_start,
+        "log_path": log_path,
     }
+    events.emit("result", **summary)
+    return summary
+
+
+def _print_batch_summary(summary: dict):
+    print(f"\n{'='*60}")
+    print(f"Batch: {summary['succeeded']} entered, {summary['failed']} failed in {summary['duration']:.1f}s")
+    skipped = sum(sum(r["skipped_calls"].values()) for r in summary["results"] if r["ok"])
+    print(f"Skipped no-op calls: {skipped}")
+    for r in summary["results"]:
+        if r["ok"]:
+            warn = " (extra/missing items)" if r["extra"] or r["missing"] else ""
+            print(f"  OK    {r['file']}: order {r['order_id']} PO={r['po']} {r['items']} items "
+                  f"{r['duration']:.1f}s{warn}")
+        else:
+            created = f" — order {r['order_id']} was created" if r.get("order_id") else ""
+            print(f"  FAIL  {r['file']}: {r['error'][:120]}{created}")
+    print(f"Log: {summary['log_path']}")
+    print(f"{'='*60}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Deterministic Enter Agent (no LLM)")
-    parser.add_argument("--order", "-o", required=True, help="Path to the .md order instruction file")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--order", "-o", help="Path to the .md order instruction file")
+    group.add_argument("--batch", nargs="+", metavar="PATH",
+                       help="Enter several orders concurrently: .md files and/or directories of .md files")
+    group.add_argument("--proposals", nargs="+", metavar="ID",
+                       help="Enter the .md of several order_change_proposals concurrently")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help=f"Max orders in flight in batch mode (default {BATCH_CONCURRENCY})")
+    parser.add_argument("--audit", action="store_true",
+                        help="Verify by re-reading the whole order instead of from write responses")
     args = parser.parse_args()
 
+    if args.batch or args.proposals:
+        try:
+            paths = _collect_order_files(args.batch) if args.batch else _load_proposal_orders(args.proposals)
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        missing_files = [p for p in paths if not os.path.exists(p)]
+        if missing_files or not paths:
+            print(f"File(s) not found: {missing_files}" if missing_files else "No .md orders to enter")
+            sys.exit(1)
+        summary = run_loop(enter_orders(paths, concurrency=args.concurrency, full_verify=args.audit or None))
+        _print_batch_summary(summary)
+        sys.exit(1 if summary["failed"] else 0)
+
     order_path = args.order
     if not os.path.isabs(order_path):
         order_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), order_path)
@@ -517,11 +967,22 @@ def main():
         print(f"File not found: {order_path}")
         sys.exit(1)
 
-    run_name = os.path.splitext(os.path.basename(order_path))[0]
-    log_path = _setup_file_logging(run_name)
-    print(f"Log: {log_path}")
+    result = run_loop(run_enter(order_path, full_verify=args.audit or None))
 
-    asyncio.run(enter_order(order_path))
+    print(f"\n{'='*60}")
+    print(f"Order created: {result['order_id']}")
+    print(f"PO: {result['po']}")
+    print(f"Link: {result['link']}")
+    print(f"Items: {result['items']}")
+    print(f"Duration: {result['duration']:.1f}s")
+    print(f"Skipped no-op calls: {sum(result['skipped_calls'].values())} {result['skipped_calls']}")
+    print(f"Verified: {result['verify']}")
+    if result["extra"]:
+        print(f"WARNING: Extra items not deleted: {set(result['extra'])}")
+    if result["missing"]:
+        print(f"WARNING: Missing items: {set(result['missing'])}")
+    print(f"Log: {result['log_path']}")
+    print(f"{'='*60}")
 
 
 if __name__ == "__main__":
@@ -40,21 +40,9 @@ session_cookies: str = os.getenv("WEBFLOR_COOKIES", "")
 async def ensure_session() -> str:
     global session_cookies
     if not session_cookies:
-        import subprocess
-        login_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "login.py")
-        if os.path.exists(login_script):
-            logger.info("No cookies — running login.py...")
-            result = subprocess.run(
-                [sys.executable, login_script],
-                capture_output=True, text=True, timeout=120,
-                cwd=os.path.dirname(login_script),
-            )
-            for line in result.stdout.splitlines():
-                if "ASP.NET_SessionId" in line:
-                    session_cookies = line.strip()
-                    return session_cookies
-            load_dotenv(override=True)
-            session_cookies = os.getenv("WEBFLOR_COOKIES", "")
+        from login import request_login
+        logger.info("No cookies — logging in...")
+        session_cookies = await request_login()
     return session_cookies
 
 
@@ -0,0 +1,185 @@
+"""
+Deterministic entry benchmark against a recorded WebFlor stand-in.
+
+Runs enter_order() over a corpus of .md orders with every WebFlor request served
+by webflor_replay.FakeWebFlor, so nothing is created in the real ERP. Reports
+per-order wall time, WebFlor calls and critical path, plus throughput.
+
+Record real traffic once (enters the orders for real):
+    WEBFLOR_RECORD_PATH=tmp/webflor-recording.jsonl uv run deterministic_enter_agent.py --batch orders/instructions/
+
+Then benchmark as often as needed:
+    uv run enter_benchmark.py --recording tmp/webflor-recording.jsonl orders/instructions/
+    uv run enter_benchmark.py --recording ... orders/instructions/ --concurrency 4 --repeat 5 --latency 0.3 --jitter 0.2
+    uv run enter_benchmark.py --recording ... order.md --plan   # dry run: print the writes each order would make
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+import deterministic_enter_agent as enter_agent
+import webflor_auth
+from webflor_replay import FakeWebFlor, call_label
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_benchmark(order_paths: list[str], fake: FakeWebFlor, concurrency: int = 1,
+                        repeat: int = 1, full_verify: bool | None = None) -> dict:
+    """Enter every order `repeat` times against `fake`, at most `concurrency` at once."""
+    webflor_auth.set_transport(fake)
+    webflor_auth.set_session_cookies("replay=1")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run_one(label: str, path: str) -> dict:
+        async with semaphore:
+            call_label.set(label)
+            started = time.monotonic()
+            try:
+                result = await enter_agent.enter_order(path, authenticate=False, full_verify=full_verify)
+            except Exception as e:
+                return {"label": label, "ok": False, "error": str(e),
+                        "wall": time.monotonic() - started, "calls": sum(fake.calls[label].values())}
+            return {
+                "label": label,
+                "ok": True,
+                "wall": time.monotonic() - started,
+                "calls": sum(fake.calls[label].values()),
+                "calls_by_site": dict(fake.calls[label]),
+                "writes": fake.writes[label],
+                "critical_path": result["critical_path"],
+                "step_times": result["step_times"],
+                "skipped_calls": sum(result["skipped_calls"].values()),
+                "verify": result["verify"],
+                "extra": result["extra"],
+                "missing": result["missing"],
+            }
+
+    # Label each run by file name, numbered when a name occurs more than once
+    runs = [path for _ in range(repeat) for path in order_paths]
+    name_counts, seen = Counter(os.path.basename(p) for p in runs), Counter()
+    labels = []
+    for path in runs:
+        name = os.path.basename(path)
+        seen[name] += 1
+        labels.append(f"{name}#{seen[name]}" if name_counts[name] > 1 else name)
+
+    bench_start = time.monotonic()
+    try:
+        results = await asyncio.gather(*(_run_one(label, path) for label, path in zip(labels, runs)))
+    finally:
+        webflor_auth.set_transport(None)
+    total = time.monotonic() - bench_start
+
+    ok = [r for r in results if r["ok"]]
+    walls = [r["wall"] for r in ok]
+    paths = Counter(tuple(r["critical_path"]) for r in ok)
+    summary = {
+        "orders": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "concurrency": concurrency,
+        "total_seconds": total,
+        "orders_per_minute": len(ok) / total * 60 if total else 0.0,
+        "results": results,
+    }
+    if ok:
+        common_path = paths.most_common(1)[0][0]
+        summary.update({
+            "wall_mean": statistics.mean(walls),
+            "wall_p50": _percentile(walls, 50),
+            "wall_p95": _percentile(walls, 95),
+            "wall_max": max(walls),
+            "calls_per_order": statistics.mean(r["calls"] for r in ok),
+            "critical_path": list(common_path),
+            "critical_path_share": paths[common_path] / len(ok),
+            "critical_path_step_means": {
+                step: statistics.mean(r["step_times"][step] for r in ok) for step in common_path
+            },
+        })
+    summary["limiter"] = webflor_auth.limiter_stats()
+    return summary
+
+
+def _print_summary(summary: dict, show_writes: bool):
+    print(f"\n{'='*60}")
+    for r in summary["results"]:
+        if not r["ok"]:
+            print(f"  FAIL  {r['label']}: {r['error'][:120]} ({r['wall']:.2f}s, {r['calls']} calls)")
+            continue
+        warn = " (extra/missing items)" if r["extra"] or r["missing"] else ""
+        print(f"  OK    {r['label']}: {r['wall']:.2f}s, {r['calls']} calls, "
+              f"{r['skipped_calls']} skipped, verify {r['verify']}, path {' → '.join(r['critical_path'])}{warn}")
+        if show_writes:
+            for w in r["writes"]:
+                keys = ", ".join(sorted((w["body"] or {}).keys())[:8])
+                print(f"          {w['method']:6} {w['endpoint']} {w['params'] or ''} {{{keys}}}")
+
+    print(f"\nOrders: {summary['succeeded']} ok, {summary['failed']} failed "
+          f"(concurrency {summary['concurrency']}) in {summary['total_seconds']:.2f}s "
+          f"— {summary['orders_per_minute']:.1f} orders/min")
+    if summary["succeeded"]:
+        print(f"Wall time: mean {summary['wall_mean']:.2f}s, p50 {summary['wall_p50']:.2f}s, "
+              f"p95 {summary['wall_p95']:.2f}s, max {summary['wall_max']:.2f}s")
+        print(f"WebFlor calls per order: {summary['calls_per_order']:.1f}")
+        steps = summary["critical_path_step_means"]
+        print(f"Critical path ({summary['critical_path_share']:.0%} of orders): "
+              + " → ".join(f"{s} ({steps[s]:.2f}s)" for s in summary["critical_path"]))
+    limiter = summary["limiter"]
+    print(f"Limiter: limit {limiter['limit']}, {limiter['decreases']} backoffs")
+    print(f"{'='*60}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deterministic entry against recorded WebFlor traffic")
+    parser.add_argument("orders", nargs="+", help=".md order files and/or directories of them")
+    parser.add_argument("--recording", required=True, help="JSON-lines file written with WEBFLOR_RECORD_PATH")
+    parser.add_argument("--latency", default="recorded",
+                        help="Per-call latency in seconds, or 'recorded' to sample the recorded latencies (default)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls answered with a 503")
+    parser.add_argument("--concurrency", type=int, default=1, help="Orders in flight at once (default 1)")
+    parser.add_argument("--repeat", type=int, default=1, help="Enter each order this many times")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for latency/error injection")
+    parser.add_argument("--cache", action="store_true", help="Enable the webflor_auth response cache")
+    parser.add_argument("--audit", action="store_true", help="Verify each order with a full re-read")
+    parser.add_argument("--plan", action="store_true", help="Print the writes each order makes (dry run)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the full results as JSON")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the enter agent's step logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        enter_agent._console.setLevel(logging.WARNING)
+    if args.cache:
+        webflor_auth.enable_response_cache()
+
+    order_paths = enter_agent._collect_order_files(args.orders)
+    missing_files = [p for p in order_paths if not os.path.exists(p)]
+    if missing_files or not order_paths:
+        print(f"File(s) not found: {missing_files}" if missing_files else "No .md orders to benchmark")
+        sys.exit(1)
+
+    latency = args.latency if args.latency == "recorded" else float(args.latency)
+    fake = FakeWebFlor.from_file(
+        args.recording, latency=latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+    )
+    summary = webflor_auth.run_loop(run_benchmark(order_paths, fake, args.concurrency, args.repeat, args.audit or None))
+    _print_summary(summary, args.plan)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2, default=str)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
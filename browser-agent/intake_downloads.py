@@ -0,0 +1,163 @@
+"""
+Intake file downloads from Supabase Storage.
+
+Files are streamed to disk in chunks (never held in memory), several at a time
+under a concurrency limit, and verified against the expected size and the
+storage object's MD5 ETag. Verified files are kept in a local cache keyed by
+storage path — intake uploads are immutable — so a retried extraction of the
+same intake event links them from the cache instead of downloading again.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+from pathlib import Path
+from urllib.parse import quote
+
+import httpx
+
+logger = logging.getLogger("intake_downloads")
+
+DOWNLOAD_CONCURRENCY = int(os.getenv("INTAKE_DOWNLOAD_CONCURRENCY", "4"))
+CACHE_MAX_BYTES = int(os.getenv("INTAKE_CACHE_MAX_BYTES", str(500 * 1024 * 1024)))
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_ATTEMPTS = 3
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+
+class DownloadError(RuntimeError):
+    """A file couldn't be downloaded or failed verification."""
+
+
+def _get_client() -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    # Bound to the running loop, like the WebFlor client in webflor_auth
+    global _client, _client_loop, _semaphore
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0), follow_redirects=True)
+        _semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        _client_loop = loop
+    return _client, _semaphore
+
+
+class IntakeDownloader:
+    def __init__(self, supabase_url: str, service_key: str, bucket: str, cache_dir: Path):
+        self.base_url = f"{supabase_url.rstrip('/')}/storage/v1/object/{bucket}"
+        self.headers = {"Authorization": f"Bearer {service_key}", "apikey": service_key}
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ─── Cache ───
+
+    def _cache_paths(self, storage_path: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(storage_path.encode()).hexdigest()
+        return self.cache_dir / key, self.cache_dir / f"{key}.json"
+
+    def _cached(self, storage_path: str, expected_size: int | None) -> Path | None:
+        data_path, meta_path = self._cache_paths(storage_path)
+        try:
+            meta = json.loads(meta_path.read_text())
+            size = data_path.stat().st_size
+        except (OSError, ValueError):
+            return None
+        if meta.get("storage_path") != storage_path or size != meta.get("size") or (
+            expected_size and size != expected_size
+        ):
+            return None
+        os.utime(data_path)  # LRU
+        return data_path
+
+    def _prune(self):
+        """Evict least-recently-used cache entries beyond CACHE_MAX_BYTES."""
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.suffix:  # .json metadata / .part in-progress downloads
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= CACHE_MAX_BYTES:
+                break
+            for p in (path, path.with_name(f"{path.name}.json")):
+                p.unlink(missing_ok=True)
+            total -= size
+
+    # ─── Download ───
+
+    async def _download(self, storage_path: str, expected_size: int | None) -> Path:
+        data_path, meta_path = self._cache_paths(storage_path)
+        part_path = data_path.with_name(f"{data_path.name}.{os.getpid()}-{random.getrandbits(32):08x}.part")
+        url = f"{self.base_url}/{quote(storage_path)}"
+        client, semaphore = _get_client()
+
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                async with semaphore:
+                    md5, sha256, size = hashlib.md5(), hashlib.sha256(), 0
+                    async with client.stream("GET", url, headers=self.headers) as resp:
+                        if resp.status_code >= 400:
+                            await resp.aread()
+                            raise DownloadError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+                        content_length = resp.headers.get("content-length")
+                        etag = (resp.headers.get("etag") or "").strip('"').removeprefix("W/").strip('"')
+                        with open(part_path, "wb") as out:
+                            async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                                out.write(chunk)
+                                md5.update(chunk)
+                                sha256.update(chunk)
+                                size += len(chunk)
+
+                if content_length and size != int(content_length):
+                    raise DownloadError(f"truncated: got {size} of {content_length} bytes")
+                if expected_size and size != expected_size:
+                    raise DownloadError(f"size mismatch: got {size}, expected {expected_size}")
+                # Single-part uploads have the object's MD5 as ETag; multipart ETags aren't comparable
+                if len(etag) == 32 and "-" not in etag and etag != md5.hexdigest():
+                    raise DownloadError(f"checksum mismatch: md5 {md5.hexdigest()} != ETag {etag}")
+
+                os.replace(part_path, data_path)
+                meta_path.write_text(json.dumps({
+                    "storage_path": storage_path, "size": size, "sha256": sha256.hexdigest(),
+                }))
+                return data_path
+            except (httpx.TransportError, DownloadError) as e:
+                part_path.unlink(missing_ok=True)
+                if attempt == DOWNLOAD_ATTEMPTS:
+                    raise DownloadError(f"{storage_path}: {e}") from e
+                delay = random.uniform(0, 2 ** attempt)
+                logger.warning(f"Download of {storage_path} failed ({e}) — retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def fetch(self, storage_path: str, dest: Path, expected_size: int | None = None) -> bool:
+        """Place the object at `dest`. Returns True on a cache hit (no download)."""
+        while True:
+            cached = self._cached(storage_path, expected_size)
+            hit = cached is not None
+            if not hit:
+                cached = await self._download(storage_path, expected_size)
+            dest.unlink(missing_ok=True)
+            try:
+                os.link(cached, dest)
+            except FileNotFoundError:
+                continue  # evicted by a concurrent prune — fetch again
+            except OSError:
+                shutil.copyfile(cached, dest)
+            return hit
+
+    async def fetch_all(self, files: list[tuple[str, Path, int | None]]) -> list[bool]:
+        """Fetch (storage_path, dest, expected_size) entries concurrently; raises on the first failure."""
+        try:
+            return await asyncio.gather(*(self.fetch(*f) for f in files))
+        finally:
+            await asyncio.to_thread(self._prune)
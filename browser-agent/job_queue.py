@@ -0,0 +1,205 @@
+"""
+Durable job queue for the orchestrator.
+
+Jobs live in a local SQLite database (stand-in for a Supabase table), so work
+accepted by /extract and /enter survives a process restart. Each job belongs to
+a stage ("extract", "enter"); workers claim the highest-priority runnable job
+of their stage. An active (queued or running) job is unique per (stage, key),
+so a re-sent webhook for the same intake_event_id/proposal_id is deduplicated.
+
+Failed jobs are re-queued with exponential backoff until max_attempts is used up.
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger("job_queue")
+
+RETRY_BASE_DELAY = 30.0
+RETRY_MAX_DELAY = 600.0
+# Rolling window for wait/run time stats
+STATS_WINDOW = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    stage        TEXT NOT NULL,
+    key          TEXT NOT NULL,
+    payload      TEXT NOT NULL,
+    priority     INTEGER NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL DEFAULT 'queued',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 1,
+    run_after    REAL NOT NULL,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    error        TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_key
+    ON jobs (stage, key) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_runnable
+    ON jobs (stage, status, priority DESC, run_after);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    stage: str
+    key: str
+    payload: dict
+    priority: int
+    attempts: int
+    max_attempts: int
+    created_at: float
+
+    @property
+    def final_attempt(self) -> bool:
+        return self.attempts >= self.max_attempts
+
+
+def _job_from_row(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"], stage=row["stage"], key=row["key"], payload=json.loads(row["payload"]),
+        priority=row["priority"], attempts=row["attempts"],
+        max_attempts=row["max_attempts"], created_at=row["created_at"],
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given attempt number (1-based)."""
+    cap = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0))
+    return random.uniform(cap / 2, cap)
+
+
+class JobQueue:
+    """SQLite-backed job queue. All methods are blocking and thread-safe."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, stage: str, key: str, payload: dict, priority: int = 0,
+                max_attempts: int = 1) -> tuple[int, bool]:
+        """Add a job. Returns (job_id, created); created=False if an active job already has this key."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE stage = ? AND key = ? AND status IN ('queued', 'running')",
+                (stage, key),
+            ).fetchone()
+            if row:
+                return row["id"], False
+            cur = self._conn.execute(
+                "INSERT INTO jobs (stage, key, payload, priority, max_attempts, run_after, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (stage, key, json.dumps(payload), priority, max_attempts, now, now),
+            )
+            return cur.lastrowid, True
+
+    def claim(self, stage: str) -> Job | None:
+        """Mark the next runnable job of a stage as running and return it."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE stage = ? AND status = 'queued' AND run_after <= ? "
+                "ORDER BY priority DESC, run_after, id LIMIT 1",
+                (stage, now),
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+        job = _job_from_row(row)
+        job.attempts += 1
+        return job
+
+    def complete(self, job_id: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, error = NULL WHERE id = ?",
+                (time.time(), job_id),
+            )
+
+    def fail(self, job: Job, error: str) -> bool:
+        """Record a failed attempt. Returns True if the job was re-queued for retry."""
+        now = time.time()
+        with self._lock:
+            if job.final_attempt:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                    (now, error[:1000], job.id),
+                )
+                return False
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ?, error = ? WHERE id = ?",
+                (now + retry_delay(job.attempts), error[:1000], job.id),
+            )
+            return True
+
+    def recover(self) -> list[Job]:
+        """Re-queue jobs that were running when the process died.
+
+        A job with no attempts left is failed instead — for entry jobs a blind
+        re-run could create a duplicate order in the ERP. Returns the failed jobs.
+        """
+        now = time.time()
+        with self._lock:
+            lost = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND attempts >= max_attempts"
+            ).fetchall()
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', run_after = ?, error = 'interrupted by restart' "
+                "WHERE status = 'running' AND attempts < max_attempts",
+                (now,),
+            ).rowcount
+            failed = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = 'interrupted by restart' "
+                "WHERE status = 'running'",
+                (now,),
+            ).rowcount
+        if requeued or failed:
+            logger.warning(f"Recovered jobs after restart: {requeued} re-queued, {failed} failed")
+        return [_job_from_row(row) for row in lost]
+
+    def stats(self) -> dict:
+        """Per-stage queue depth plus wait/run times over the last STATS_WINDOW seconds."""
+        now = time.time()
+        with self._lock:
+            counts = self._conn.execute(
+                "SELECT stage, status, COUNT(*) AS n, MIN(created_at) AS oldest "
+                "FROM jobs WHERE status IN ('queued', 'running') OR finished_at >= ? "
+                "GROUP BY stage, status",
+                (now - STATS_WINDOW,),
+            ).fetchall()
+            timings = self._conn.execute(
+                "SELECT stage, COUNT(*) AS n, AVG(started_at - created_at) AS wait, "
+                "MAX(started_at - created_at) AS max_wait, AVG(finished_at - started_at) AS run "
+                "FROM jobs WHERE status = 'done' AND finished_at >= ? GROUP BY stage",
+                (now - STATS_WINDOW,),
+            ).fetchall()
+
+        stages: dict[str, dict] = {}
+        for row in counts:
+            s = stages.setdefault(row["stage"], {"queued": 0, "running": 0, "done": 0, "failed": 0})
+            s[row["status"]] = row["n"]
+            if row["status"] == "queued":
+                s["oldest_queued_seconds"] = round(now - row["oldest"], 1)
+        for row in timings:
+            s = stages.setdefault(row["stage"], {"queued": 0, "running": 0, "done": 0, "failed": 0})
+            s["avg_wait_seconds"] = round(row["wait"], 1)
+            s["max_wait_seconds"] = round(row["max_wait"], 1)
+            s["avg_run_seconds"] = round(row["run"], 1)
+        return stages
@@ -6,6 +6,11 @@ Playwright, extracts cookies, and stores them in:
   1. Local .env file (WEBFLOR_COOKIES) for local dev
   2. Supabase user_tokens table (provider='webflor') for Cloud Run
 
+Importable as a login service: the browser stays warm on a dedicated
+background event loop, so a re-login costs one page load plus the server's
+ValidarUsuario/IniciarSesion round-trips. Async callers use request_login(),
+sync callers (orchestrator threads) use login_sync().
+
 Usage:
     cd browser-agent
     source .venv/bin/activate
@@ -16,9 +21,12 @@ Usage:
 
 import asyncio
 import argparse
+import logging
 import os
 import re
 import sys
+import threading
+import time
 from datetime import datetime, timezone
 
 from dotenv import load_dotenv
@@ -26,21 +34,21 @@ from playwright.async_api import async_playwright
 
 load_dotenv()
 
+logger = logging.getLogger("login")
+
 WEBFLOR_APP_URL = os.getenv("WEBFLOR_BASE_URL", "http://190.146.143.55:5522/WebflorExt")
 WEBFLOR_USER = os.getenv("WEBFLOR_USER", "")
 WEBFLOR_PASS = os.getenv("WEBFLOR_PASS", "")
 
-# Use prod Supabase when APP_ENV=production (same logic as orchestrator)
-_env = os.getenv("APP_ENV", "staging")
-if _env == "production":
-    SUPABASE_URL = "https://zkglvdfppodwlgzhfgqs.supabase.co"
-    SUPABASE_SECRET_KEY = os.getenv("SUPABASE_PROD_SECRET_KEY", "")
-else:
-    SUPABASE_URL = "https://laxhubapvubwwoafrewk.supabase.co"
-    SUPABASE_SECRET_KEY = os.getenv("SUPABASE_SECRET_KEY", "")
+# Use prod Supabase when APP_ENV=production (same as the orchestrator)
+from supabase_config import SUPABASE_SECRET_KEY, SUPABASE_URL
 ORGANIZATION_ID = os.getenv("ORGANIZATION_ID", "81cf0716-45ee-4fe8-895f-d9af962f5fab")
 
 
+class LoginError(RuntimeError):
+    """WebFlor rejected the credentials or the login flow didn't complete."""
+
+
 def update_env_file(cookie_str: str):
     """Write WEBFLOR_COOKIES into the .env file."""
     env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
@@ -64,7 +72,16 @@ def update_env_file(cookie_str: str):
     with open(env_path, "w") as f:
         f.write(content)
 
-    print(f"Saved cookies to {env_path}")
+    logger.info(f"Saved cookies to {env_path}")
+
+
+def cookie_expiry(cookies: list[dict]) -> float | None:
+    """Latest explicit cookie expiry as a Unix timestamp (None for session-only cookies)."""
+    max_expires = max(
+        (c.get("expires", -1) for c in cookies if c.get("expires", -1) > 0),
+        default=-1,
+    )
+    return max_expires if max_expires > 0 else None
 
 
 def save_cookies_to_supabase(cookie_str: str, cookies: list[dict]):
@@ -74,22 +91,19 @@ def save_cookies_to_supabase(cookie_str: str, cookies: list[dict]):
     field is a Unix timestamp, -1 means session cookie with no explicit expiry).
     """
     if not SUPABASE_URL or not SUPABASE_SECRET_KEY:
-        print("WARNING: SUPABASE_URL/SUPABASE_SECRET_KEY not set, skipping Supabase save")
+        logger.warning("SUPABASE_URL/SUPABASE_SECRET_KEY not set, skipping Supabase save")
         return
 
     from supabase import create_client
 
     # Find the latest real expiry from the cookies (skip session cookies with expires=-1)
-    max_expires = max(
-        (c.get("expires", -1) for c in cookies if c.get("expires", -1) > 0),
-        default=-1,
-    )
+    max_expires = cookie_expiry(cookies)
     expires_at = None
-    if max_expires > 0:
+    if max_expires:
         expires_at = datetime.fromtimestamp(max_expires, tz=timezone.utc).isoformat()
-        print(f"Cookie expiry from session: {expires_at}")
+        logger.info(f"Cookie expiry from session: {expires_at}")
     else:
-        print("Session cookies (no explicit expiry)")
+        logger.info("Session cookies (no explicit expiry)")
 
     sb = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
 
@@ -104,48 +118,83 @@ def save_cookies_to_supabase(cookie_str: str, cookies: list[dict]):
 
     sb.table("user_tokens").upsert(row, on_conflict="provider,organization_id").execute()
 
-    print(f"Saved cookies to Supabase (user_tokens, provider=webflor)")
+    logger.info("Saved cookies to Supabase (user_tokens, provider=webflor)")
 
 
-async def login(headless: bool = True, debug: bool = False):
-    if not WEBFLOR_USER or not WEBFLOR_PASS:
-        print("ERROR: Set WEBFLOR_USER and WEBFLOR_PASS in .env")
-        sys.exit(1)
+def save_cookies(cookie_str: str, cookies: list[dict]):
+    """Persist cookies to .env (local dev) and Supabase (Cloud Run / shared state)."""
+    for save in (update_env_file, lambda s: save_cookies_to_supabase(s, cookies)):
+        try:
+            save(cookie_str)
+        except Exception as e:
+            logger.warning(f"Failed to save cookies: {e}")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        context = await browser.new_context()
-        page = await context.new_page()
 
-        print(f"Navigating to {WEBFLOR_APP_URL} ...")
-        await page.goto(WEBFLOR_APP_URL, wait_until="networkidle", timeout=60000)
+# ─── Login Service ───────────────────────────────────────────────────────
 
-        if debug:
-            html = await page.content()
-            debug_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "login_page.html")
-            with open(debug_path, "w") as f:
-                f.write(html)
-            print(f"Login page HTML saved to {debug_path}")
-            print(f"Current URL: {page.url}")
-            await browser.close()
+class LoginService:
+    """Keeps Playwright + Chromium running; each login gets a fresh browser context."""
+
+    def __init__(self, headless: bool = True):
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        if self._browser is not None and self._browser.is_connected():
             return
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch(headless=self.headless)
+        logger.info("Login browser started")
+
+    async def close(self):
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def login(self) -> tuple[str, list[dict]]:
+        """Log in and return (cookie header string, raw Playwright cookies)."""
+        if not WEBFLOR_USER or not WEBFLOR_PASS:
+            raise LoginError("Set WEBFLOR_USER and WEBFLOR_PASS in .env")
+        async with self._lock:
+            await self.start()
+            context = await self._browser.new_context()
+            try:
+                cookies = await self._login_flow(await context.new_page())
+            finally:
+                await context.close()
+        if not cookies:
+            raise LoginError("No cookies captured")
+        cookie_str = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+        logger.info(f"Got {len(cookies)} cookies")
+        return cookie_str, cookies
+
+    async def _login_flow(self, page) -> list[dict]:
+        logger.info(f"Navigating to {WEBFLOR_APP_URL} ...")
+        await page.goto(WEBFLOR_APP_URL, wait_until="domcontentloaded", timeout=60000)
 
         # Wait for the login form to be visible (page uses a loading spinner)
         await page.wait_for_selector("#myDiv", state="visible", timeout=15000)
         await page.wait_for_selector("#txtusername", state="visible", timeout=10000)
 
-        print("Filling credentials ...")
+        logger.info("Filling credentials ...")
 
         # Fill username — use click + type to trigger Kendo validation events
         await page.click("#txtusername")
         await page.fill("#txtusername", WEBFLOR_USER)
         # Tab out of username to trigger the Kendo validator (customRule1 calls
-        # ValidarUsuario via AJAX which populates hidden fields + shows company/farm)
-        await page.press("#txtusername", "Tab")
-
-        # Wait for the AJAX ValidarUsuario call to complete
-        # It sets hidden fields and may show the company/farm dropdowns
-        await asyncio.sleep(3)
+        # ValidarUsuario via AJAX which populates hidden fields + shows company/farm).
+        # Wait for that response instead of a fixed sleep.
+        try:
+            async with page.expect_response(lambda r: "ValidarUsuario" in r.url, timeout=15000):
+                await page.press("#txtusername", "Tab")
+        except Exception:
+            logger.warning("No ValidarUsuario response seen — continuing with login")
 
         # Fill password
         await page.click("#txtpassword")
@@ -153,17 +202,18 @@ async def login(headless: bool = True, debug: bool = False):
 
         # Click the login button (calls IniciarSesion which does AJAX validation
         # then submits the form via $(control).closest('form').submit())
-        print("Clicking login ...")
+        logger.info("Clicking login ...")
         await page.click("#btnLogin")
 
         # Wait for navigation away from login — the form POSTs to /WebflorExt/
-        # and should redirect to the main app page
+        # and should redirect to the main app page. The session cookie is set by
+        # that response, so it's in the context as soon as the URL changes.
         try:
             await page.wait_for_url(
                 lambda url: "/Index/Index" not in url and "login" not in url.lower(),
                 timeout=30000,
             )
-            print(f"Redirected to: {page.url}")
+            logger.info(f"Redirected to: {page.url}")
         except Exception:
             # Sometimes the URL stays the same but the page content changes
             # Check if we're past the login form
@@ -174,33 +224,96 @@ async def login(headless: bool = True, debug: bool = False):
                 if error_el:
                     error_text = await error_el.inner_text()
                     if error_text.strip():
-                        print(f"LOGIN ERROR: {error_text}")
-                        await browser.close()
-                        sys.exit(1)
+                        raise LoginError(f"LOGIN ERROR: {error_text.strip()}")
+                raise LoginError(
+                    f"May still be on login page. URL: {page.url} — "
+                    "check credentials or run login.py --visible to watch."
+                )
+
+        # Extract cookies (including HttpOnly ones)
+        return await page.context.cookies()
 
-                print(f"WARNING: May still be on login page. URL: {page.url}")
-                print("Check credentials or run with --visible to watch.")
-                await browser.close()
-                sys.exit(1)
 
-        await asyncio.sleep(2)  # let cookies settle
+# The service lives on its own event loop thread: Playwright objects are bound
+# to the loop that created them, and callers run on many loops (MCP server,
+# enter agent, orchestrator worker threads).
+_service: LoginService | None = None
+_service_loop: asyncio.AbstractEventLoop | None = None
+_service_lock = threading.Lock()
+# Most recent login through the service: {"cookies", "expires_at" (Unix ts or None), "at"}
+last_login: dict = {}
 
-        # Extract cookies (including HttpOnly ones)
-        cookies = await context.cookies()
-        await browser.close()
 
-    if not cookies:
-        print("ERROR: No cookies captured.")
-        sys.exit(1)
+def _get_service_loop() -> asyncio.AbstractEventLoop:
+    global _service, _service_loop
+    with _service_lock:
+        if _service_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="webflor-login", daemon=True).start()
+            _service_loop = loop
+            _service = LoginService()
+    return _service_loop
+
+
+async def _login_and_save(save: bool) -> str:
+    cookie_str, cookies = await _service.login()
+    last_login.update(cookies=cookie_str, expires_at=cookie_expiry(cookies), at=time.time())
+    if save:
+        # Persisting doesn't hold up the caller — it already has the cookies
+        asyncio.get_running_loop().run_in_executor(None, save_cookies, cookie_str, cookies)
+    return cookie_str
+
+
+async def request_login(save: bool = True) -> str:
+    """Log in via the warm login service and return the cookie string (from any event loop)."""
+    future = asyncio.run_coroutine_threadsafe(_login_and_save(save), _get_service_loop())
+    return await asyncio.wrap_future(future)
+
+
+def login_sync(save: bool = True, timeout: float = 120) -> str:
+    """Blocking request_login() for threaded callers."""
+    future = asyncio.run_coroutine_threadsafe(_login_and_save(save), _get_service_loop())
+    return future.result(timeout)
+
+
+def warm_up():
+    """Launch the login browser in the background so the first login skips Chromium startup."""
+    asyncio.run_coroutine_threadsafe(_service_start(), _get_service_loop())
+
 
-    cookie_str = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
-    print(f"Got {len(cookies)} cookies")
+async def _service_start():
+    try:
+        await _service.start()
+    except Exception as e:
+        logger.warning(f"Login browser warm-up failed: {e}")
 
-    # Save to .env (local dev)
-    update_env_file(cookie_str)
 
-    # Save to Supabase (Cloud Run / shared state)
-    save_cookies_to_supabase(cookie_str, cookies)
+# ─── CLI ─────────────────────────────────────────────────────────────────
+
+async def login(headless: bool = True, debug: bool = False):
+    service = LoginService(headless=headless)
+    try:
+        if debug:
+            await service.start()
+            page = await service._browser.new_page()
+            await page.goto(WEBFLOR_APP_URL, wait_until="networkidle", timeout=60000)
+            html = await page.content()
+            debug_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "login_page.html")
+            with open(debug_path, "w") as f:
+                f.write(html)
+            print(f"Login page HTML saved to {debug_path}")
+            print(f"Current URL: {page.url}")
+            return
+
+        try:
+            cookie_str, cookies = await service.login()
+        except LoginError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+    finally:
+        await service.close()
+
+    save_cookies(cookie_str, cookies)
 
     # Also print so it can be piped/copied
     print(f"\nCookies:\n{cookie_str}")
@@ -212,6 +325,7 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Dump login page HTML and exit")
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(login(headless=not args.visible, debug=args.debug))
 
 
@@ -0,0 +1,56 @@
+"""
+MCP server config for the agents' "erp" server.
+
+By default each agent run spawns webflor_mcp_server.py over stdio, which pays
+for FastMCP/Supabase imports, reference data preload and ensure_session() on
+every run. When WEBFLOR_MCP_URL points at a long-lived server started with
+`webflor_mcp_server.py --sse` (caches and session already warm), agents attach
+to it instead. If that server isn't reachable, we fall back to stdio.
+
+    WEBFLOR_MCP_URL=http://127.0.0.1:8000/sse
+"""
+
+import logging
+import os
+import socket
+import sys
+from urllib.parse import urlparse
+
+logger = logging.getLogger("mcp_client_config")
+
+MCP_SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "webflor_mcp_server.py")
+# Env vars the stdio subprocess needs (it doesn't inherit the parent's environment)
+_STDIO_ENV_KEYS = [
+    "WEBFLOR_BASE_URL", "WEBFLOR_COOKIES", "SUPABASE_URL", "SUPABASE_SECRET_KEY",
+    "ORGANIZATION_ID", "DATA_DIR", "PATH",
+]
+
+
+def _reachable(url: str, timeout: float = 1.0) -> bool:
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        with socket.create_connection((parsed.hostname, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def erp_mcp_server_config() -> dict:
+    """The "erp" entry for ClaudeAgentOptions.mcp_servers."""
+    url = os.getenv("WEBFLOR_MCP_URL", "")
+    if url:
+        if _reachable(url):
+            # FastMCP serves SSE at /sse and streamable HTTP at /mcp
+            transport = "http" if urlparse(url).path.rstrip("/").endswith("/mcp") else "sse"
+            logger.info(f"MCP server: {url} ({transport})")
+            return {"type": transport, "url": url}
+        logger.warning(f"MCP server {url} not reachable — falling back to stdio")
+
+    logger.info(f"MCP server: {MCP_SERVER_SCRIPT} (stdio)")
+    return {
+        "type": "stdio",
+        "command": sys.executable,
+        "args": [MCP_SERVER_SCRIPT],
+        "env": {key: os.getenv(key, "") for key in _STDIO_ENV_KEYS},
+    }
@@ -5,7 +5,8 @@ Exposes two webhook endpoints for the La Gaitana order processing pipeline:
   POST /extract  — PO PDF → extraction agent → structured .md stored in proposal metadata
   POST /enter    — .md from proposal → entry agent → order created in WebFlor ERP
 
-Both endpoints return immediately and process in background tasks.
+Both endpoints persist a job and return immediately; a worker pool per stage
+processes the queue (GET /jobs shows depth and timings).
 Status updates are written to Supabase (proposal tags + ai_analysis_logs + order_events).
 
 Usage (local):
@@ -14,13 +15,16 @@ Usage (local):
 """
 
 import asyncio
+import functools
 import json
 import logging
+import multiprocessing
 import os
 import subprocess
 import sys
 import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -40,19 +44,12 @@ logger = logging.getLogger("orchestrator")
 
 # ─── Config ───────────────────────────────────────────────────────────────
 
-_env = os.getenv("APP_ENV", "staging")
-if _env == "production":
-    SUPABASE_URL = "https://zkglvdfppodwlgzhfgqs.supabase.co"
-    SUPABASE_SECRET_KEY = os.getenv("SUPABASE_PROD_SECRET_KEY", "")
-else:
-    SUPABASE_URL = "https://laxhubapvubwwoafrewk.supabase.co"
-    SUPABASE_SECRET_KEY = os.getenv("SUPABASE_SECRET_KEY", "")
+from supabase_config import SUPABASE_SECRET_KEY, SUPABASE_URL
 ORGANIZATION_ID = os.getenv("ORGANIZATION_ID", "81cf0716-45ee-4fe8-895f-d9af962f5fab")
 STORAGE_BUCKET = "intake-files"
 
 # Paths relative to this file
 AGENT_DIR = Path(__file__).parent.resolve()
-LOGIN_SCRIPT = AGENT_DIR / "login.py"
 EXTRACTION_SCRIPT = AGENT_DIR / "order_extraction_agent_v2.py"
 ENTRY_SCRIPT = AGENT_DIR / "deterministic_enter_agent.py"
 INSTRUCTIONS_DIR = AGENT_DIR / "orders" / "instructions"
@@ -63,6 +60,31 @@ from supabase import create_client
 
 supabase = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
 
+# The supabase client and the SQLite job queue are synchronous; every call from
+# async code goes through a bounded thread pool so a slow query never stalls the
+# event loop (/health, new requests, other pipelines).
+DB_THREADS = int(os.getenv("ORCHESTRATOR_DB_THREADS", "8"))
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="supabase")
+
+
+async def _db(fn, *args, **kwargs):
+    """Run a blocking Supabase or job-queue call (or helper that makes one) on the DB pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def _execute(query):
+    """Await a supabase query builder's .execute() without blocking the event loop."""
+    return await _db(query.execute)
+
+
+# Intake files are streamed from Storage to disk and cached by storage path
+from intake_downloads import IntakeDownloader
+
+_intake_downloader = IntakeDownloader(
+    SUPABASE_URL, SUPABASE_SECRET_KEY, STORAGE_BUCKET, AGENT_DIR / "tmp" / "intake-cache",
+)
+
 # ─── FastAPI App ──────────────────────────────────────────────────────────
 
 app = FastAPI(title="Frootful Orchestrator", version="0.1.0")
@@ -71,6 +93,9 @@ app = FastAPI(title="Frootful Orchestrator", version="0.1.0")
 
 import threading
 
+sys.path.insert(0, str(AGENT_DIR))
+import login as login_service
+
 LOGIN_REFRESH_INTERVAL = 600  # 10 minutes
 _last_login_at: float = 0.0  # timestamp of last successful login
 _login_lock = threading.Lock()
@@ -79,12 +104,105 @@ _login_lock = threading.Lock()
 class ExtractRequest(BaseModel):
     intake_event_id: str
     user_id: str = ""
+    priority: int = 0
 
 
 class EnterRequest(BaseModel):
     proposal_id: str
     order_id: str = ""
     user_id: str = ""
+    priority: int = 0
+
+
+# ─── Job Queue ────────────────────────────────────────────────────────────
+
+from agent_events import EVENTS_FD_ENV, read_events
+from job_queue import JobQueue
+import webflor_auth
+
+# Jobs are persisted before /extract and /enter return, and a fixed pool of
+# workers per stage drains them — bounded concurrency against WebFlor and the
+# LLM, and work accepted before a restart is picked up again on startup.
+JOBS_DB = os.getenv("ORCHESTRATOR_JOBS_DB", str(AGENT_DIR / "tmp" / "jobs.db"))
+STAGE_WORKERS = {
+    "extract": int(os.getenv("EXTRACT_WORKERS", "3")),
+    "enter": int(os.getenv("ENTER_WORKERS", "2")),
+}
+# Extraction is idempotent per intake event, so transient failures are retried.
+# Entry creates an ERP order — a retry after a partial run could duplicate it.
+STAGE_MAX_ATTEMPTS = {
+    "extract": int(os.getenv("EXTRACT_MAX_ATTEMPTS", "3")),
+    "enter": 1,
+}
+JOB_POLL_INTERVAL = 5.0
+
+_job_queue: JobQueue | None = None
+_job_wakeups: dict[str, asyncio.Event] = {}
+
+
+async def _enqueue_job(stage: str, key: str, payload: dict, priority: int = 0) -> tuple[int, bool]:
+    job_id, created = await _db(
+        _job_queue.enqueue, stage, key, payload, priority, STAGE_MAX_ATTEMPTS[stage],
+    )
+    if created:
+        _job_wakeups[stage].set()
+    return job_id, created
+
+
+async def _run_job(job):
+    p = job.payload
+    if job.stage == "extract":
+        await _run_extraction(p["intake_event_id"], p.get("user_id", ""), final_attempt=job.final_attempt)
+    elif job.stage == "enter":
+        await _run_entry(p["proposal_id"], p.get("user_id", ""), p.get("order_id", ""))
+    else:
+        raise ValueError(f"Unknown job stage: {job.stage}")
+
+
+async def _job_worker(stage: str, n: int):
+    wakeup = _job_wakeups[stage]
+    while True:
+        try:
+            job = await _db(_job_queue.claim, stage)
+        except Exception as e:
+            logger.error(f"[jobs] {stage}-{n} claim failed: {e}")
+            job = None
+        if job is None:
+            # Sleep until something is enqueued; the timeout picks up retries whose backoff expired
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        logger.info(f"[jobs] {stage}-{n} running job {job.id} ({job.key}, attempt {job.attempts}/{job.max_attempts})")
+        try:
+            await _run_job(job)
+        except Exception as e:
+            retrying = await _db(_job_queue.fail, job, str(e))
+            logger.warning(f"[jobs] Job {job.id} failed{' — will retry' if retrying else ''}: {e}")
+        else:
+            await _db(_job_queue.complete, job.id)
+
+
+def _start_job_workers() -> list[asyncio.Task]:
+    global _job_queue
+    _job_queue = JobQueue(JOBS_DB)
+    for job in _job_queue.recover():
+        # An entry that died mid-run may or may not have reached WebFlor — surface it instead of re-running
+        if job.stage == "enter":
+            _db_executor.submit(_update_proposal_tags, job.key, {
+                "erp_sync_status": "failed",
+                "erp_completed_at": _now_iso(),
+                "erp_error": "Interrupted by an orchestrator restart — check WebFlor before re-sending",
+            })
+    tasks = []
+    for stage, count in STAGE_WORKERS.items():
+        _job_wakeups[stage] = asyncio.Event()
+        tasks += [asyncio.create_task(_job_worker(stage, i)) for i in range(count)]
+    logger.info(f"Job workers started: {STAGE_WORKERS} (queue: {JOBS_DB})")
+    return tasks
 
 
 # ─── Health ───────────────────────────────────────────────────────────────
@@ -96,7 +214,9 @@ async def health():
         "status": "ok",
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "session_age_seconds": int(age) if age else None,
-        "session_fresh": age is not None and age < LOGIN_REFRESH_INTERVAL,
+        "session_fresh": _session_keeper.is_good(),
+        "session": _session_keeper.status(),
+        "mcp_service": _mcp_service_status(),
     }
 
 
@@ -104,92 +224,121 @@ async def health():
 
 @app.post("/login")
 async def login_endpoint(background_tasks: BackgroundTasks):
-    """Refresh WebFlor session. Called by Cloud Scheduler every 10 min."""
-    background_tasks.add_task(_run_login_cached, force=True)
-    return {"status": "queued", "message": "Login refresh queued"}
+    """Keep the WebFlor session alive. Called by Cloud Scheduler every 10 min.
+
+    Runs one session-keeper pass (keep-alive or re-login only when due), so the
+    scheduler ping also covers instances whose CPU is throttled between requests.
+    """
+    background_tasks.add_task(_session_keeper.check)
+    return {"status": "queued", "message": "Session check queued"}
 
 
 # ─── Extract Endpoint ────────────────────────────────────────────────────
 
 @app.post("/extract")
-async def extract(req: ExtractRequest, background_tasks: BackgroundTasks):
+async def extract(req: ExtractRequest):
     logger.info(f"POST /extract: intake_event_id={req.intake_event_id}")
-    background_tasks.add_task(_run_extraction, req.intake_event_id, req.user_id)
-    return {"status": "queued", "intake_event_id": req.intake_event_id}
+    job_id, created = await _enqueue_job(
+        "extract", req.intake_event_id,
+        {"intake_event_id": req.intake_event_id, "user_id": req.user_id},
+        req.priority,
+    )
+    return {"status": "queued", "intake_event_id": req.intake_event_id,
+            "job_id": job_id, "duplicate": not created}
 
 
 # ─── Enter Endpoint ──────────────────────────────────────────────────────
 
 @app.post("/enter")
-async def enter(req: EnterRequest, background_tasks: BackgroundTasks):
+async def enter(req: EnterRequest):
     logger.info(f"POST /enter: proposal_id={req.proposal_id}")
 
     # Mark as in_progress immediately
-    _update_proposal_tags(req.proposal_id, {
+    await _db(_update_proposal_tags, req.proposal_id, {
         "erp_sync_status": "in_progress",
         "erp_started_at": _now_iso(),
     })
 
-    background_tasks.add_task(_run_entry, req.proposal_id, req.user_id, req.order_id)
-    return {"status": "queued", "proposal_id": req.proposal_id}
+    job_id, created = await _enqueue_job(
+        "enter", req.proposal_id,
+        {"proposal_id": req.proposal_id, "user_id": req.user_id, "order_id": req.order_id},
+        req.priority,
+    )
+    return {"status": "queued", "proposal_id": req.proposal_id,
+            "job_id": job_id, "duplicate": not created}
+
+
+# ─── Jobs Endpoint ───────────────────────────────────────────────────────
+
+@app.get("/jobs")
+async def jobs():
+    """Queue depth and wait/run times per stage (last hour)."""
+    return {
+        "workers": STAGE_WORKERS,
+        "stages": await _db(_job_queue.stats),
+    }
 
 
-# ─── Background Tasks ────────────────────────────────────────────────────
+# ─── Pipeline Jobs ───────────────────────────────────────────────────────
 
-async def _run_extraction(intake_event_id: str, user_id: str = ""):
-    """Background: download PO PDF → run extraction agent → store .md in proposal metadata."""
+async def _run_extraction(intake_event_id: str, user_id: str = "", final_attempt: bool = True):
+    """Job: download PO PDF → run extraction agent → store .md in proposal metadata.
+
+    Raises on failure so the job queue can retry; the proposal is only marked
+    failed on the final attempt.
+    """
     start_time = time.time()
     intake_dir = None
     logger.info(f"[extract] Starting for intake_event_id={intake_event_id}")
 
     try:
         # 1. Fetch intake event
-        event = supabase.table("intake_events").select("*").eq(
+        event = await _execute(supabase.table("intake_events").select("*").eq(
             "id", intake_event_id
-        ).single().execute()
+        ).single())
         if not event.data:
             raise ValueError(f"Intake event {intake_event_id} not found")
 
         org_id = event.data.get("organization_id", "")
 
         # 2. Fetch associated files (PDFs)
-        files = supabase.table("intake_files").select("*").eq(
+        files = await _execute(supabase.table("intake_files").select("*").eq(
             "intake_event_id", intake_event_id
-        ).execute()
+        ))
         if not files.data:
             raise ValueError(f"No files found for intake event {intake_event_id}")
 
-        # 3. Download ALL files into a dedicated folder
+        # 3. Download ALL files into a dedicated folder (concurrent, streamed, cached)
         supported_exts = {"pdf", "jpg", "jpeg", "png", "gif", "webp"}
         intake_dir = AGENT_DIR / "tmp" / intake_event_id
         intake_dir.mkdir(parents=True, exist_ok=True)
-        downloaded_files: list[str] = []
+        downloads: list[tuple[str, Path, int | None]] = []
         for f in files.data:
             ext = (f.get("extension", "") or "").lower().lstrip(".")
             if ext not in supported_exts:
                 logger.info(f"[extract] Skipping unsupported file: {f.get('filename')} ({ext})")
                 continue
-            storage_path = f["storage_path"]
             filename = f.get("filename", f["id"])
-            logger.info(f"[extract] Downloading: {filename} ({storage_path})")
-            file_bytes = supabase.storage.from_(STORAGE_BUCKET).download(storage_path)
-            file_path = intake_dir / filename
-            file_path.write_bytes(file_bytes)
-            downloaded_files.append(filename)
-            logger.info(f"[extract] Saved to: {file_path}")
-        if not downloaded_files:
+            downloads.append((f["storage_path"], intake_dir / filename, f.get("size_bytes")))
+        if not downloads:
             raise ValueError(f"No supported files (PDF/image) found for intake event {intake_event_id}")
-        logger.info(f"[extract] Downloaded {len(downloaded_files)} file(s) to {intake_dir}")
+        download_start = time.time()
+        hits = await _intake_downloader.fetch_all(downloads)
+        downloaded_files = [dest.name for _, dest, _ in downloads]
+        logger.info(
+            f"[extract] Fetched {len(downloads)} file(s) to {intake_dir} in {time.time() - download_start:.1f}s "
+            f"({sum(hits)} from cache)"
+        )
 
         # 4. Create proposal early so we can write status updates to it
-        existing = supabase.table("order_change_proposals").select("id, metadata, tags").eq(
+        existing = await _execute(supabase.table("order_change_proposals").select("id, metadata, tags").eq(
             "intake_event_id", intake_event_id
-        ).limit(1).execute()
+        ).limit(1))
 
         if existing.data:
             proposal_id = existing.data[0]["id"]
         else:
-            new_proposal = supabase.table("order_change_proposals").insert({
+            new_proposal = await _execute(supabase.table("order_change_proposals").insert({
                 "organization_id": org_id,
                 "order_id": None,
                 "intake_event_id": intake_event_id,
@@ -198,20 +347,20 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
                 "tags": {"source": "orchestrator", "agent_version": "v2", "erp": "webflor",
                          "extraction_status": "starting"},
                 "metadata": {},
-            }).execute()
+            }))
             proposal_id = new_proposal.data[0]["id"]
             logger.info(f"[extract] Created proposal {proposal_id}")
 
         def _update_status(message: str):
-            """Push a status update to the proposal tags."""
-            _update_proposal_tags(proposal_id, {
+            """Queue a status update for the proposal tags (non-blocking — also called from the agent's reader thread)."""
+            _status_pipeline.publish(proposal_id, {
                 "extraction_status": message,
                 "extraction_updated_at": _now_iso(),
             })
 
         _update_status("Downloading files...")
 
-        # 5. Login to WebFlor (uses cached session from Supabase if available)
+        # 5. Login to WebFlor (never blocks — the agent's WebFlor calls re-login on a redirect)
         _ensure_login()
         _update_status("Analyzing order...")
 
@@ -224,15 +373,10 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
         md_tmpfile.close()
         logger.info(f"[extract] .md output path: {md_output_path}")
 
-        logger.info("[extract] Running extraction agent...")
-        agent_env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
-        result = _run_agent_streaming(
-            [sys.executable, str(EXTRACTION_SCRIPT), "--folder", str(intake_dir), "--output", md_output_path],
-            tag="extract", cwd=str(AGENT_DIR), env=agent_env, timeout=600,
-            on_status=_update_status,
-        )
+        logger.info(f"[extract] Running extraction agent ({AGENT_RUNNER})...")
+        agent_result = await _run_extraction_agent(str(intake_dir), md_output_path, on_status=_update_status)
         elapsed = time.time() - start_time
-        logger.info(f"[extract] Agent exited with code {result.returncode} in {elapsed:.1f}s")
+        logger.info(f"[extract] Agent finished in {elapsed:.1f}s")
 
         # 7. Read the .md content from the output file
         md_content = None
@@ -245,13 +389,18 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
             except OSError:
                 pass
 
-        if not md_content and result.returncode != 0:
-            raise RuntimeError(f"Extraction agent failed (exit {result.returncode})")
         if not md_content:
-            raise RuntimeError("Extraction agent completed but no .md output found")
-
-        # 8. Parse key fields from the .md
-        parsed_fields = _parse_md_fields(md_content)
+            detail = f": {agent_result['result'][:200]}" if agent_result.get("result") else ""
+            raise RuntimeError(f"Extraction agent completed but no .md output found{detail}")
+
+        # 8. Key fields from the agent's parsed Order Details
+        details = agent_result.get("order_details") or {}
+        parsed_fields = {
+            key: details[src]
+            for key, src in (("customer_name", "customer_name"), ("po_number", "po"),
+                             ("delivery_date", "consolidation_date"), ("customer_code", "customer_code"))
+            if details.get(src)
+        }
         logger.info(f"[extract] Parsed fields: {parsed_fields}")
 
         proposal_metadata = {
@@ -261,19 +410,16 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
         }
 
         # 9. Update proposal with .md + parsed fields
-        _update_status("Extraction complete")
-        existing_proposal = supabase.table("order_change_proposals").select("metadata").eq(
-            "id", proposal_id
-        ).single().execute()
-        old_metadata = (existing_proposal.data or {}).get("metadata") or {}
-        old_metadata.update(proposal_metadata)
-        supabase.table("order_change_proposals").update({
-            "metadata": old_metadata,
-        }).eq("id", proposal_id).execute()
+        await asyncio.to_thread(_status_pipeline.flush, proposal_id, {
+            "extraction_status": "Extraction complete",
+            "extraction_updated_at": _now_iso(),
+        })
+        await _db(_merge_proposal, proposal_id, metadata=proposal_metadata)
         logger.info(f"[extract] Updated proposal {proposal_id} with .md")
 
         # 9. Log to ai_analysis_logs
-        _log_agent_run(
+        await _db(
+            _log_agent_run,
             source_id=intake_event_id,
             user_id=user_id,
             success=True,
@@ -295,31 +441,36 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
         elapsed = time.time() - start_time
         logger.error(f"[extract] Failed for {intake_event_id}: {e}", exc_info=True)
 
+        if not final_attempt:
+            import shutil
+            if intake_dir and intake_dir.exists():
+                shutil.rmtree(intake_dir, ignore_errors=True)
+            raise
+
         # Mark proposal as failed
         error_str = str(e)[:500]
         try:
-            existing = supabase.table("order_change_proposals").select("id, tags").eq(
+            existing = await _execute(supabase.table("order_change_proposals").select("id").eq(
                 "intake_event_id", intake_event_id
-            ).limit(1).execute()
+            ).limit(1))
 
             if existing.data:
                 pid = existing.data[0]["id"]
-                old_tags = existing.data[0].get("tags") or {}
-                supabase.table("order_change_proposals").update({
-                    "status": "failed",
-                    "tags": {**old_tags,
-                             "extraction_status": f"Failed: {error_str[:100]}",
-                             "extraction_error": error_str,
-                             "extraction_failed_at": _now_iso()},
-                }).eq("id", pid).execute()
+                # Land any queued progress update before the failure, not after it
+                await asyncio.to_thread(_status_pipeline.flush, pid)
+                await _db(_merge_proposal, pid, status="failed", tags={
+                    "extraction_status": f"Failed: {error_str[:100]}",
+                    "extraction_error": error_str,
+                    "extraction_failed_at": _now_iso(),
+                })
                 logger.info(f"[extract] Marked proposal {pid} as failed")
             else:
                 # Proposal wasn't created yet (early failure) — create a failed one
-                event_data = supabase.table("intake_events").select("organization_id").eq(
+                event_data = await _execute(supabase.table("intake_events").select("organization_id").eq(
                     "id", intake_event_id
-                ).single().execute()
+                ).single())
                 oid = event_data.data.get("organization_id", "") if event_data.data else ""
-                supabase.table("order_change_proposals").insert({
+                await _execute(supabase.table("order_change_proposals").insert({
                     "organization_id": oid,
                     "order_id": None,
                     "intake_event_id": intake_event_id,
@@ -330,12 +481,13 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
                              "extraction_error": error_str,
                              "extraction_failed_at": _now_iso()},
                     "metadata": {},
-                }).execute()
+                }))
                 logger.info(f"[extract] Created failed proposal for {intake_event_id}")
         except Exception as tag_err:
             logger.error(f"[extract] Failed to update proposal status: {tag_err}")
 
-        _log_agent_run(
+        await _db(
+            _log_agent_run,
             source_id=intake_event_id,
             user_id=user_id,
             success=False,
@@ -354,9 +506,11 @@ async def _run_extraction(intake_event_id: str, user_id: str = ""):
         except Exception:
             pass
 
+        raise
+
 
 async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""):
-    """Background: read .md from proposal → run entry agent → create order in WebFlor."""
+    """Job: read .md from proposal → run entry agent → create order in WebFlor."""
     start_time = time.time()
     logger.info(f"[enter] Starting for proposal_id={proposal_id}")
 
@@ -364,9 +518,9 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
 
     try:
         # 1. Fetch proposal
-        proposal = supabase.table("order_change_proposals").select(
+        proposal = await _execute(supabase.table("order_change_proposals").select(
             "id, organization_id, metadata, tags, intake_event_id, order_id"
-        ).eq("id", proposal_id).single().execute()
+        ).eq("id", proposal_id).single())
         if not proposal.data:
             raise ValueError(f"Proposal {proposal_id} not found")
 
@@ -380,7 +534,7 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
         # Resolve order_id: prefer request param, fall back to proposal's order_id
         order_id = req_order_id or proposal.data.get("order_id")
 
-        # 2. Login to WebFlor (uses cached session if fresh)
+        # 2. Login to WebFlor (never blocks — the agent authenticates itself if the keeper can't vouch)
         _ensure_login()
 
         # 3. Write .md to temp file
@@ -390,24 +544,21 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
         md_path.write_text(md_content)
         logger.info(f"[enter] Wrote .md to {md_path} ({len(md_content)} chars)")
 
-        # 4. Run entry agent (streams output to Cloud Run logs)
-        logger.info(f"[enter] Running entry agent...")
-        agent_env = {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
-        result = _run_agent_streaming(
-            [sys.executable, str(ENTRY_SCRIPT), "--order", str(md_path)],
-            tag="enter", cwd=str(AGENT_DIR), env=agent_env, timeout=600,
+        # 4. Run entry agent (logs stream to Cloud Run logs)
+        logger.info(f"[enter] Running entry agent ({AGENT_RUNNER})...")
+        result = await _run_entry_agent(
+            str(md_path),
+            on_status=lambda message: _status_pipeline.publish(proposal_id, {"erp_sync_step": message}),
         )
+        await asyncio.to_thread(_status_pipeline.flush, proposal_id)
         elapsed = time.time() - start_time
-        logger.info(f"[enter] Agent exited with code {result.returncode} in {elapsed:.1f}s")
-
-        # 5. Parse result for WebFlor order ID/link
-        webflor_order_id = _parse_webflor_order_id(result.stdout, result.stderr)
+        logger.info(f"[enter] Agent finished in {elapsed:.1f}s")
 
-        if result.returncode != 0:
-            raise RuntimeError(f"Entry agent failed (exit {result.returncode})")
+        # 5. WebFlor order ID/link from the agent's result
+        webflor_order_id = str(result["order_id"]) if result.get("order_id") else None
 
         # 6. Update proposal tags: completed
-        _update_proposal_tags(proposal_id, {
+        await _db(_update_proposal_tags, proposal_id, {
             "erp_sync_status": "completed",
             "erp_completed_at": _now_iso(),
             "webflor_order_id": webflor_order_id,
@@ -415,20 +566,20 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
 
         # 7. Update order status to pushed_to_erp + store WebFlor ID/link
         if order_id:
-            webflor_link = None
-            if webflor_order_id:
+            webflor_link = result.get("link")
+            if webflor_order_id and not webflor_link:
                 webflor_link = (
                     f"http://190.146.143.55:5522/WebFlorExt/TablasBasicas/DetallesOrden"
                     f"?EsDesde=1&EsRepetitiva=0&iIdAccion=1&ManejaInventario=0&iIdPedido={webflor_order_id}"
                 )
-            _update_order_status(order_id, "pushed_to_erp", metadata_updates={
+            await _db(_update_order_status, order_id, "pushed_to_erp", metadata_updates={
                 "webflor_order_id": webflor_order_id,
                 "webflor_order_link": webflor_link,
             })
 
         # 8. Insert order_event: completed
         if order_id:
-            supabase.table("order_events").insert({
+            await _execute(supabase.table("order_events").insert({
                 "order_id": order_id,
                 "type": "erp_exported",
                 "metadata": {
@@ -437,10 +588,11 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
                     "destination": "WebFlor",
                     "webflor_order_id": webflor_order_id,
                 },
-            }).execute()
+            }))
 
         # 9. Log to ai_analysis_logs
-        _log_agent_run(
+        await _db(
+            _log_agent_run,
             source_id=proposal_id,
             user_id=user_id,
             success=True,
@@ -449,8 +601,9 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
             parsed_result={
                 "success": True,
                 "webflor_order_id": webflor_order_id,
+                **{k: result[k] for k in ("items", "extra", "missing") if k in result},
             },
-            raw_response=result.stdout[-5000:] if result.stdout else None,
+            raw_response=result.get("output"),
         )
 
         # 10. Clean up temp file
@@ -466,7 +619,7 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
         logger.error(f"[enter] Failed for {proposal_id}: {e}", exc_info=True)
 
         # Update proposal tags: failed
-        _update_proposal_tags(proposal_id, {
+        await _db(_update_proposal_tags, proposal_id, {
             "erp_sync_status": "failed",
             "erp_completed_at": _now_iso(),
             "erp_error": str(e)[:500],
@@ -474,11 +627,11 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
 
         # Update order status on failure
         if order_id:
-            _update_order_status(order_id, "export_failed")
+            await _db(_update_order_status, order_id, "export_failed")
 
         # Insert failure order_event
         if order_id:
-            supabase.table("order_events").insert({
+            await _execute(supabase.table("order_events").insert({
                 "order_id": order_id,
                 "type": "erp_exported",
                 "metadata": {
@@ -487,10 +640,11 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
                     "destination": "WebFlor",
                     "error": str(e)[:500],
                 },
-            }).execute()
+            }))
 
         # Log failure
-        _log_agent_run(
+        await _db(
+            _log_agent_run,
             source_id=proposal_id,
             user_id=user_id,
             success=False,
@@ -498,76 +652,289 @@ async def _run_entry(proposal_id: str, user_id: str = "", req_order_id: str = ""
             raw_request={"proposal_id": proposal_id, "order_id": order_id, "stage": "entry"},
             parsed_result={"success": False, "error": str(e)},
         )
+        raise
+
+
+# ─── ERP MCP Service ─────────────────────────────────────────────────────
+
+# Optionally run one long-lived webflor_mcp_server.py (SSE) that every extraction
+# run attaches to, instead of each agent spawning its own stdio server (imports,
+# reference data preload and session check per run). Agent subprocesses inherit
+# WEBFLOR_MCP_URL; they fall back to stdio while it's unreachable.
+MCP_SERVICE = os.getenv("ORCHESTRATOR_MCP_SERVICE", "0") == "1"
+MCP_SERVICE_PORT = int(os.getenv("MCP_SSE_PORT", "8000"))
+_mcp_service: subprocess.Popen | None = None
+
+
+def _start_mcp_service():
+    global _mcp_service
+    if not MCP_SERVICE or os.getenv("WEBFLOR_MCP_URL"):
+        return
+    _mcp_service = subprocess.Popen(
+        [sys.executable, str(AGENT_DIR / "webflor_mcp_server.py"), "--sse"],
+        cwd=str(AGENT_DIR), env={**os.environ, "MCP_SSE_PORT": str(MCP_SERVICE_PORT)},
+    )
+    os.environ["WEBFLOR_MCP_URL"] = f"http://127.0.0.1:{MCP_SERVICE_PORT}/sse"
+    logger.info(f"Started ERP MCP service (pid {_mcp_service.pid}) at {os.environ['WEBFLOR_MCP_URL']}")
+
+
+def _mcp_service_status() -> dict | None:
+    if _mcp_service is None:
+        return {"url": os.getenv("WEBFLOR_MCP_URL")} if os.getenv("WEBFLOR_MCP_URL") else None
+    return {"url": os.getenv("WEBFLOR_MCP_URL"), "pid": _mcp_service.pid,
+            "running": _mcp_service.poll() is None}
+
+
+# ─── Agent Runners ───────────────────────────────────────────────────────
+
+# How /extract and /enter jobs run the agents:
+#   inprocess  — await the agents' async entry points on this event loop (default):
+#                no interpreter start/imports per job, shared WebFlor session + pool
+#   pool       — the same entry points in a spawn-based process pool, for isolation
+#   subprocess — one Python subprocess per job, events read from its AGENT_EVENTS_FD pipe
+AGENT_RUNNER = os.getenv("ORCHESTRATOR_AGENT_RUNNER", "inprocess")
+AGENT_POOL_WORKERS = int(os.getenv("ORCHESTRATOR_AGENT_POOL_WORKERS", "2"))
+AGENT_TIMEOUT = 600
+
+# Agent tool names → user-friendly status messages
+TOOL_STATUS_MAP = {
+    "Read": "Reading files...",
+    "Glob": "Scanning folder...",
+    "Bash": "Running command...",
+    "Write": "Writing order file...",
+    "search_clients_csv": "Identifying customer...",
+    "search_customer_notes": "Checking customer rules...",
+    "get_week": "Looking up delivery week...",
+    "list_recent_orders": "Finding reference orders...",
+    "get_order_with_items": "Reviewing reference order details...",
+    "get_week_batch": "Looking up delivery week...",
+    "lookup_item_mappings": "Mapping line items...",
+    "lookup_item_mappings_batch": "Mapping line items...",
+    "lookup_client_product_ficha": "Checking pricing rules...",
+    "lookup_client_product_ficha_batch": "Checking pricing rules...",
+}
+
+_agent_pool: ProcessPoolExecutor | None = None
+
+
+def _get_agent_pool() -> ProcessPoolExecutor:
+    global _agent_pool
+    if _agent_pool is None:
+        _agent_pool = ProcessPoolExecutor(
+            max_workers=AGENT_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _agent_pool
+
+
+def _agent_env() -> dict:
+    return {k: v for k, v in os.environ.items() if k != "CLAUDECODE"}
+
+
+def _agent_event_handler(on_status=None) -> tuple:
+    """Event callback for one agent run, plus the dict it fills with the run's outcome.
+
+    tool_start/status events become on_status(message) calls; the result/error
+    event and any order_id reported along the way are kept in the outcome.
+    """
+    outcome: dict = {}
+
+    def handle(event: dict):
+        kind = event.get("type")
+        if kind in ("result", "error"):
+            outcome[kind] = event
+            return
+        if kind == "status" and event.get("order_id"):
+            outcome["order_id"] = event["order_id"]
+        message = TOOL_STATUS_MAP.get(event.get("name")) if kind == "tool_start" else event.get("message")
+        if on_status and kind in ("tool_start", "status") and message:
+            on_status(message)
+
+    return handle, outcome
+
+
+async def _run_agent(tag: str, cmd: list, entry, pool_entry, on_status=None) -> dict:
+    """Run an agent with the configured runner and return its result event. Raises on failure."""
+    handle, outcome = _agent_event_handler(on_status)
+    try:
+        if AGENT_RUNNER == "subprocess":
+            proc = await asyncio.to_thread(
+                _run_agent_streaming, cmd, tag=tag, cwd=str(AGENT_DIR), env=_agent_env(),
+                timeout=AGENT_TIMEOUT, on_event=handle,
+            )
+            logger.info(f"[{tag}] Agent exited with code {proc.returncode}")
+            if "error" in outcome:
+                raise RuntimeError(outcome["error"]["message"])
+            if proc.returncode != 0 or "result" not in outcome:
+                raise RuntimeError(f"Agent failed (exit {proc.returncode})")
+            return outcome["result"]
+        if AGENT_RUNNER == "pool":
+            run = asyncio.get_running_loop().run_in_executor(_get_agent_pool(), pool_entry)
+        else:
+            run = entry(handle)
+        return await asyncio.wait_for(run, timeout=AGENT_TIMEOUT)
+    except Exception as e:
+        if outcome.get("order_id"):
+            raise RuntimeError(f"{e} (WebFlor order {outcome['order_id']} was already created)") from e
+        raise
+
+
+async def _run_extraction_agent(folder: str, output: str, on_status=None) -> dict:
+    """Run the extraction agent; the .md is written to `output`. Raises on failure."""
+    import order_extraction_agent_v2 as extraction_agent
+    return await _run_agent(
+        "extract",
+        [sys.executable, str(EXTRACTION_SCRIPT), "--folder", folder, "--output", output],
+        lambda on_event: extraction_agent.extract_order(folder=folder, output=output, on_event=on_event),
+        functools.partial(extraction_agent.extract_order_sync, folder=folder, output=output),
+        on_status,
+    )
+
+
+async def _run_entry_agent(md_path: str, on_status=None) -> dict:
+    """Run the deterministic entry agent. Returns {"order_id", "link", ...}; raises on failure."""
+    import deterministic_enter_agent as entry_agent
+    return await _run_agent(
+        "enter",
+        [sys.executable, str(ENTRY_SCRIPT), "--order", md_path],
+        # The keeper already vouches for the session — skip the agent's validation round-trip
+        lambda on_event: entry_agent.run_enter(
+            md_path, on_event=on_event, authenticate=not _session_keeper.is_good(),
+        ),
+        functools.partial(entry_agent.run_enter_sync, md_path),
+        on_status,
+    )
+
+
+# ─── Status Pipeline ─────────────────────────────────────────────────────
+
+STATUS_MIN_INTERVAL = float(os.getenv("ORCHESTRATOR_STATUS_INTERVAL", "1.0"))
+
+
+class StatusPipeline:
+    """Coalesces progress updates into proposal tags at a bounded write rate.
+
+    publish() only records the latest patch per proposal and never blocks, so the
+    agent's log reader thread can call it for every tool call. A single writer
+    thread pushes each proposal at most once per `min_interval`; flush() writes
+    whatever is pending right away (e.g. the final status) and waits for it.
+    """
+
+    def __init__(self, min_interval: float = STATUS_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._cond = threading.Condition()
+        self._pending: dict[str, dict] = {}
+        self._urgent: set[str] = set()
+        self._waiters: dict[str, list[threading.Event]] = {}
+        self._last_write: dict[str, float] = {}
+        self._writing: str | None = None
+        self._thread: threading.Thread | None = None
+
+    def publish(self, proposal_id: str, updates: dict):
+        with self._cond:
+            self._pending.setdefault(proposal_id, {}).update(updates)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="status-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self, proposal_id: str, updates: dict | None = None, timeout: float = 30.0):
+        """Write pending (plus `updates`) for a proposal now; blocks until written."""
+        if updates:
+            self.publish(proposal_id, updates)
+        done = threading.Event()
+        with self._cond:
+            if proposal_id not in self._pending and self._writing != proposal_id:
+                return
+            self._urgent.add(proposal_id)
+            self._waiters.setdefault(proposal_id, []).append(done)
+            self._cond.notify()
+        if not done.wait(timeout):
+            logger.warning(f"Status flush for {proposal_id} timed out")
+
+    def _next_due(self) -> tuple[str, dict, list[threading.Event]]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._last_write = {pid: t for pid, t in self._last_write.items()
+                                    if now - t < self.min_interval}
+                for pid in self._pending:
+                    if pid in self._urgent or pid not in self._last_write:
+                        break
+                else:
+                    pid = None
+                if pid is not None:
+                    self._urgent.discard(pid)
+                    self._last_write[pid] = now
+                    self._writing = pid
+                    return pid, self._pending.pop(pid), self._waiters.pop(pid, [])
+                wait = None
+                if self._pending:
+                    wait = min(self.min_interval - (now - self._last_write[pid]) for pid in self._pending)
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            pid, updates, waiters = self._next_due()
+            _update_proposal_tags(pid, updates)
+            with self._cond:
+                self._writing = None
+                # flush() calls that arrived mid-write had nothing newer pending
+                if pid not in self._pending:
+                    self._urgent.discard(pid)
+                    waiters += self._waiters.pop(pid, [])
+            for done in waiters:
+                done.set()
+
+
+_status_pipeline = StatusPipeline()
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────
 
 
 def _run_agent_streaming(cmd: list, tag: str, cwd: str, env: dict, timeout: int = 600,
-                         on_status=None):
+                         on_event=None):
     """Run a subprocess while streaming output line-by-line to the logger.
 
     Args:
-        on_status: Optional callback(message: str) called when a status-worthy line is detected.
+        on_event: Optional callback(event: dict) for each agent_events event the
+            agent writes to its AGENT_EVENTS_FD pipe (consumed as it arrives).
 
     Returns a subprocess.CompletedProcess-like object with stdout/stderr captured.
     """
     import threading
-    import re
-
-    # Map tool names to user-friendly status messages
-    TOOL_STATUS_MAP = {
-        "Read": "Reading files...",
-        "Glob": "Scanning folder...",
-        "Bash": "Running command...",
-        "Write": "Writing order file...",
-        "search_clients_csv": "Identifying customer...",
-        "search_customer_notes": "Checking customer rules...",
-        "get_week": "Looking up delivery week...",
-        "list_recent_orders": "Finding reference orders...",
-        "get_order_with_items": "Reviewing reference order details...",
-        "lookup_item_mappings": "Mapping line items...",
-        "lookup_client_product_ficha": "Checking pricing rules...",
-    }
 
     stdout_lines: list[str] = []
     stderr_lines: list[str] = []
 
+    events_r, events_w = os.pipe()
     proc = subprocess.Popen(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-        text=True, cwd=cwd, env=env,
+        text=True, cwd=cwd, env={**env, EVENTS_FD_ENV: str(events_w)}, pass_fds=(events_w,),
     )
+    os.close(events_w)
 
     def _read_stream(stream, lines: list, level: str):
         for line in stream:
             line = line.rstrip("\n")
             lines.append(line)
-            if level == "stderr":
-                logger.info(f"[{tag}:stderr] {line}")
-                # Detect tool calls and emit status updates
-                if on_status:
-                    tool_match = re.search(r'Tool call #\d+: (\S+)', line)
-                    if tool_match:
-                        tool_name = tool_match.group(1)
-                        # Strip mcp__erp__ prefix for matching
-                        clean_name = re.sub(r'^mcp__erp__', '', tool_name)
-                        status_msg = TOOL_STATUS_MAP.get(clean_name) or TOOL_STATUS_MAP.get(tool_name)
-                        if status_msg:
-                            try:
-                                on_status(status_msg)
-                            except Exception as e:
-                                logger.warning(f"[{tag}] Status callback failed: {e}")
-            else:
-                logger.info(f"[{tag}] {line}")
+            logger.info(f"[{tag}:stderr] {line}" if level == "stderr" else f"[{tag}] {line}")
 
-    t_out = threading.Thread(target=_read_stream, args=(proc.stdout, stdout_lines, "stdout"))
-    t_err = threading.Thread(target=_read_stream, args=(proc.stderr, stderr_lines, "stderr"))
-    t_out.start()
-    t_err.start()
+    def _read_events():
+        with os.fdopen(events_r) as stream:
+            read_events(stream, on_event or (lambda event: None))
+
+    threads = [
+        threading.Thread(target=_read_stream, args=(proc.stdout, stdout_lines, "stdout")),
+        threading.Thread(target=_read_stream, args=(proc.stderr, stderr_lines, "stderr")),
+        threading.Thread(target=_read_events),
+    ]
+    for t in threads:
+        t.start()
 
     proc.wait(timeout=timeout)
-    t_out.join()
-    t_err.join()
+    for t in threads:
+        t.join()
 
     return subprocess.CompletedProcess(
         args=cmd,
@@ -577,99 +944,27 @@ def _run_agent_streaming(cmd: list, tag: str, cwd: str, env: dict, timeout: int
     )
 
 
-def _get_webflor_cookies() -> str | None:
-    """Read WebFlor cookies from Supabase user_tokens. Returns None if missing or expired."""
-    try:
-        result = supabase.table("user_tokens").select(
-            "encrypted_access_token, token_expires_at, updated_at"
-        ).eq("provider", "webflor").eq(
-            "organization_id", ORGANIZATION_ID
-        ).limit(1).execute()
-
-        if not result.data:
-            logger.info("[login] No webflor token found in Supabase")
-            return None
-
-        row = result.data[0]
-        token = row.get("encrypted_access_token")
-        updated_at = row.get("updated_at")
-
-        if not token:
-            logger.info("[login] Token row exists but encrypted_access_token is empty")
-            return None
-
-        logger.info(f"[login] Token found in Supabase (last updated: {updated_at})")
-
-        # Validate the session is still alive by hitting WebFlor
-        if not _validate_webflor_session(token):
-            logger.warning("[login] Token found but session is dead on WebFlor server")
-            return None
-
-        return token
-    except Exception as e:
-        logger.warning(f"[login] Failed to read cookies from Supabase: {e}")
-    return None
-
-
-def _validate_webflor_session(cookie_str: str) -> bool:
-    """Hit a lightweight WebFlor endpoint to check if the session cookie is still valid.
-
-    WebFlor redirects to a login page (3xx) when the session is expired.
-    """
-    import httpx
-
-    from urllib.parse import urlparse
-    base_url = os.getenv("WEBFLOR_BASE_URL", "http://190.146.143.55:5522/WebflorExt")
-    parsed = urlparse(base_url)
-    host_url = f"{parsed.scheme}://{parsed.netloc}"
-    test_url = f"{host_url}/WebFlorBasico/API/listarCompaniasActivasSinLogo"
-
-    try:
-        with httpx.Client(timeout=10, follow_redirects=False) as client:
-            resp = client.get(test_url, headers={"Cookie": cookie_str, "Accept": "application/json"})
-
-        if 300 <= resp.status_code < 400:
-            location = resp.headers.get("location", "")
-            logger.info(f"[login] WebFlor returned {resp.status_code} redirect to: {location}")
-            return False  # redirected to login = session dead
-
-        if resp.status_code == 200:
-            logger.info("[login] WebFlor session is valid (200 OK)")
-            return True
-
-        # Other status codes — treat as potentially valid but log it
-        logger.info(f"[login] WebFlor returned {resp.status_code} — assuming session is valid")
-        return True
-    except Exception as e:
-        logger.warning(f"[login] Could not reach WebFlor to validate session: {e}")
-        # Can't reach WebFlor at all — return the cached token anyway,
-        # the agent will fail later with a clearer error
-        return True
+def _load_webflor_token() -> dict | None:
+    """The user_tokens row for WebFlor (token, token_expires_at, updated_at), unvalidated."""
+    result = supabase.table("user_tokens").select(
+        "encrypted_access_token, token_expires_at, updated_at"
+    ).eq("provider", "webflor").eq(
+        "organization_id", ORGANIZATION_ID
+    ).limit(1).execute()
+    return result.data[0] if result.data else None
 
 
 def _run_login():
-    """Run login.py to get fresh WebFlor session cookies."""
+    """Get fresh WebFlor session cookies from the warm login service (it also saves them to Supabase)."""
     global _last_login_at
-    logger.info("[login] Running login.py...")
-    result = subprocess.run(
-        [sys.executable, str(LOGIN_SCRIPT)],
-        capture_output=True, text=True, timeout=120,
-        cwd=str(AGENT_DIR),
-        env={**os.environ},
-    )
-    if result.returncode != 0:
-        logger.error(f"[login] Failed: {result.stderr or result.stdout}")
-        raise RuntimeError(f"WebFlor login failed: {result.stderr or result.stdout}")
-
-    # Pull cookies from Supabase (login.py saves them there)
-    cookies = _get_webflor_cookies()
-    if cookies:
-        os.environ["WEBFLOR_COOKIES"] = cookies
-        logger.info("[login] Loaded cookies from Supabase")
-    else:
-        # Fall back to .env
-        load_dotenv(override=True)
-        logger.info("[login] Fell back to .env for cookies")
+    logger.info("[login] Logging in via the login service...")
+    try:
+        cookies = login_service.login_sync()
+    except Exception as e:
+        logger.error(f"[login] Failed: {e}")
+        raise RuntimeError(f"WebFlor login failed: {e}") from e
+    os.environ["WEBFLOR_COOKIES"] = cookies
+    _session_keeper.record_valid(cookies, expires_at=login_service.last_login.get("expires_at"))
 
     _last_login_at = time.time()
     logger.info("[login] Session established")
@@ -690,52 +985,245 @@ def _run_login_cached(force: bool = False):
         _run_login()
 
 
-def _ensure_login():
-    """Ensure a valid session exists.
+def _ensure_login() -> bool:
+    """Whether the session keeper vouches for the current WebFlor session.
 
-    Checks Supabase for cached cookies first. Falls back to Playwright login
-    if no token found or token is expired.
+    Answered from the keeper's in-memory state with no I/O, so request paths
+    never wait on Supabase or WebFlor. When there is no known-good session
+    (e.g. startup login failed) a keeper pass is started in the background;
+    the agent then validates the session itself and re-logs in on a redirect.
     """
-    logger.info("[login] Checking Supabase for cached WebFlor session...")
-    cookies = _get_webflor_cookies()
-    if cookies:
-        os.environ["WEBFLOR_COOKIES"] = cookies
-        logger.info("[login] Using cached cookies from Supabase (skipping Playwright)")
-        return
+    if _session_keeper.is_good():
+        return True
+    logger.info("[login] No known-good session — refreshing it in the background")
+    _session_keeper.refresh_in_background()
+    return False
+
+
+# ─── Session Keeper ───────────────────────────────────────────────────────
+# Background task that keeps the WebFlor session alive so request paths can
+# trust an in-memory "known good until T" instead of validating per request.
+# The session dies after an idle timeout (ASP.NET default 20 min until
+# learned) or at the cookie's token_expires_at, whichever comes first.
+
+SESSION_IDLE_TIMEOUT = float(os.getenv("WEBFLOR_IDLE_TIMEOUT", "1200"))
+MIN_IDLE_TIMEOUT = 120.0
+KEEPER_INTERVAL = 30.0
+# Send a keep-alive once this fraction of the idle timeout has passed
+KEEPALIVE_FRACTION = 0.5
+# Trust the session for this fraction of the idle timeout after it was last seen valid
+TRUST_FRACTION = 0.8
+# Re-login this long before token_expires_at
+EXPIRY_MARGIN = 120.0
+# Keep-alives only show the session survives gaps shorter than the current
+# estimate. After this many plain keep-alives, the next one waits PROBE_FACTOR
+# times the estimate (but stays under the shortest gap the session died after),
+# so a longer idle timeout can be learned. A failed probe costs one idle re-login.
+PROBE_EVERY = 10
+PROBE_FACTOR = 1.25
+PROBE_MAX_IDLE = float(os.getenv("WEBFLOR_PROBE_MAX_IDLE", "14400"))
+
+
+def _parse_expiry(value) -> float | None:
+    """token_expires_at (ISO string or Unix timestamp) → Unix timestamp."""
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class SessionKeeper:
+    """Tracks when the WebFlor session was last seen valid and keeps it that way."""
+
+    def __init__(self):
+        self.cookies = ""
+        self.last_valid = 0.0
+        self.expires_at: float | None = None
+        self.idle_timeout = SESSION_IDLE_TIMEOUT
+        # Longest idle gap the session survived — the idle timeout is at least this
+        self.max_idle_survived = 0.0
+        # Shortest idle gap the session died after — the idle timeout is below this
+        self.min_idle_died: float | None = None
+        self._keepalives_since_probe = 0
+        self._refresh_task: asyncio.Task | None = None
+
+    def good_until(self) -> float:
+        if not self.cookies or not self.last_valid:
+            return 0.0
+        until = self.last_valid + self.idle_timeout * TRUST_FRACTION
+        if self.expires_at:
+            until = min(until, self.expires_at - EXPIRY_MARGIN)
+        return until
+
+    def is_good(self) -> bool:
+        return time.time() < self.good_until()
+
+    def status(self) -> dict:
+        return {
+            "good_until": datetime.fromtimestamp(self.good_until(), tz=timezone.utc).isoformat() if self.good_until() else None,
+            "expires_at": datetime.fromtimestamp(self.expires_at, tz=timezone.utc).isoformat() if self.expires_at else None,
+            "idle_timeout_seconds": int(self.idle_timeout),
+            "max_idle_survived_seconds": int(self.max_idle_survived),
+            "min_idle_died_seconds": int(self.min_idle_died) if self.min_idle_died else None,
+        }
+
+    def record_valid(self, cookies: str, expires_at: float | None = None):
+        """The session `cookies` was just seen working (login, keep-alive, validation or a
+        successful in-process WebFlor request)."""
+        now = time.time()
+        if cookies != self.cookies:
+            self.expires_at = expires_at
+        elif self.last_valid:
+            self.max_idle_survived = max(self.max_idle_survived, now - self.last_valid)
+            self.idle_timeout = max(self.idle_timeout, self.max_idle_survived)
+        if expires_at:
+            self.expires_at = expires_at
+        self.cookies = cookies
+        self.last_valid = now
+        if os.environ.get("WEBFLOR_COOKIES") != cookies:
+            os.environ["WEBFLOR_COOKIES"] = cookies
+        # In-process agents use webflor_auth's session — keep it on the same cookies
+        if webflor_auth.get_session_cookies() != cookies:
+            webflor_auth.set_session_cookies(cookies)
+
+    def record_dead(self):
+        """The session was found expired — learn a shorter idle timeout if it died early."""
+        if self.last_valid:
+            gap = time.time() - self.last_valid
+            self.min_idle_died = min(self.min_idle_died or gap, gap)
+            if gap < self.idle_timeout:
+                self.idle_timeout = max(gap, self.max_idle_survived, MIN_IDLE_TIMEOUT)
+                logger.info(f"[session] Session died after {int(gap)}s idle — idle timeout now {int(self.idle_timeout)}s")
+        self.last_valid = 0.0
+
+    async def _ping(self) -> bool | None:
+        """Keep-alive request. True = valid, False = expired, None = ERP unreachable."""
+        from urllib.parse import urlparse
+
+        parsed = urlparse(os.getenv("WEBFLOR_BASE_URL", "http://190.146.143.55:5522/WebflorExt"))
+        url = f"{parsed.scheme}://{parsed.netloc}/WebFlorBasico/API/listarCompaniasActivasSinLogo"
+        try:
+            # webflor_auth's pooled client for this loop — no new connection per probe
+            resp = await webflor_auth._pooled_request(
+                "GET", url, headers={"Cookie": self.cookies, "Accept": "application/json"},
+                follow_redirects=False,
+            )
+        except Exception as e:
+            logger.warning(f"[session] Keep-alive failed to reach WebFlor: {e}")
+            return None
+        return not (300 <= resp.status_code < 400)
+
+    async def _adopt_stored(self):
+        """Pick up the cookies (and expiry) last saved to Supabase, e.g. by another instance."""
+        try:
+            row = await _db(_load_webflor_token)
+        except Exception as e:
+            logger.warning(f"[session] Failed to read cookies from Supabase: {e}")
+            return
+        if row and row.get("encrypted_access_token"):
+            self.cookies = row["encrypted_access_token"]
+            self.expires_at = _parse_expiry(row.get("token_expires_at"))
+            self.last_valid = 0.0
+
+    def _probe_gap(self) -> float | None:
+        """Idle gap for a probing keep-alive, or None when no probe is due or there's nothing to learn."""
+        if self._keepalives_since_probe < PROBE_EVERY:
+            return None
+        gap = min(self.idle_timeout * PROBE_FACTOR, PROBE_MAX_IDLE)
+        if self.min_idle_died:
+            gap = min(gap, self.min_idle_died * 0.95)
+        return gap if gap > self.idle_timeout * 1.05 else None
+
+    async def _login(self):
+        await asyncio.to_thread(_run_login_cached, True)
+
+    async def check(self):
+        """One keeper pass: keep-alive when due, re-login when dead or about to expire."""
+        if not self.cookies:
+            await self._adopt_stored()
+        now = time.time()
+        if self.expires_at and now >= self.expires_at - EXPIRY_MARGIN:
+            logger.info("[session] Cookie expiry approaching — logging in ahead of it")
+            await self._login()
+            return
+        probe_gap = self._probe_gap()
+        ping_after = probe_gap or self.idle_timeout * KEEPALIVE_FRACTION
+        if self.cookies and self.last_valid and now - self.last_valid < ping_after:
+            return
+        if self.cookies:
+            idle = now - self.last_valid if self.last_valid else 0.0
+            alive = await self._ping()
+            if alive is None:
+                return
+            if probe_gap:
+                self._keepalives_since_probe = 0
+                logger.info(f"[session] Idle probe after {int(idle)}s: session {'alive' if alive else 'expired'}")
+            else:
+                self._keepalives_since_probe += 1
+            if alive:
+                self.record_valid(self.cookies)
+                return
+            self.record_dead()
+        logger.info("[session] No live session — logging in")
+        await self._login()
+
+    def refresh_in_background(self):
+        """Start one keeper pass without waiting for it; a pass already in flight is reused."""
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self.check())
+        self._refresh_task.add_done_callback(self._log_refresh_failure)
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"[session] Background refresh failed: {task.exception()}")
+
+    async def run(self):
+        logger.info("[session] Session keeper started")
+        while True:
+            try:
+                await self.check()
+            except Exception as e:
+                logger.warning(f"[session] Keeper pass failed: {e}")
+            await asyncio.sleep(KEEPER_INTERVAL)
+
 
-    # No valid cookies in Supabase — do a full Playwright login
-    logger.info("[login] No valid cached session — falling back to Playwright login")
-    _run_login_cached(force=True)
+_session_keeper = SessionKeeper()
 
 
 def _update_order_status(order_id: str, status: str, metadata_updates: dict | None = None):
-    """Update order status and optionally merge metadata updates."""
+    """Update order status and optionally merge metadata updates (one atomic RPC)."""
     try:
-        update_data: dict = {"status": status}
-        if metadata_updates:
-            existing = supabase.table("orders").select("metadata").eq(
-                "id", order_id
-            ).single().execute()
-            order_metadata = (existing.data or {}).get("metadata") or {}
-            order_metadata.update(metadata_updates)
-            update_data["metadata"] = order_metadata
-        supabase.table("orders").update(update_data).eq("id", order_id).execute()
+        supabase.rpc("update_order_status_merge", {
+            "p_order_id": order_id,
+            "p_status": status,
+            "p_metadata": metadata_updates or None,
+        }).execute()
         logger.info(f"Updated order {order_id} status to '{status}'")
     except Exception as e:
         logger.error(f"Failed to update order status: {e}")
 
 
+def _merge_proposal(proposal_id: str, tags: dict | None = None, metadata: dict | None = None,
+                    status: str | None = None):
+    """Merge top-level keys into a proposal's tags/metadata JSONB server-side (no read, no lost updates)."""
+    supabase.rpc("merge_proposal_fields", {
+        "p_proposal_id": proposal_id,
+        "p_tags": tags,
+        "p_metadata": metadata,
+        "p_status": status,
+    }).execute()
+
+
 def _update_proposal_tags(proposal_id: str, updates: dict):
     """Merge updates into proposal's tags JSONB field."""
     try:
-        existing = supabase.table("order_change_proposals").select("tags").eq(
-            "id", proposal_id
-        ).single().execute()
-        tags = (existing.data or {}).get("tags") or {}
-        tags.update(updates)
-        supabase.table("order_change_proposals").update({"tags": tags}).eq(
-            "id", proposal_id
-        ).execute()
+        _merge_proposal(proposal_id, tags=updates)
     except Exception as e:
         logger.error(f"Failed to update proposal tags: {e}")
 
@@ -769,44 +1257,6 @@ def _log_agent_run(
         logger.error(f"Failed to log agent run: {e}")
 
 
-def _parse_md_fields(md_content: str) -> dict:
-    """Extract key fields from the .md order file's Order Details table."""
-    import re
-    fields = {}
-    for line in md_content.splitlines():
-        # Match "| Field | Value |" rows
-        m = re.match(r'\|\s*(.+?)\s*\|\s*(.+?)\s*\|', line)
-        if m:
-            key, val = m.group(1).strip(), m.group(2).strip()
-            if key == "Customer":
-                fields["customer_name"] = val
-            elif key == "PO":
-                fields["po_number"] = val
-            elif key == "Consolidation Date":
-                fields["delivery_date"] = val
-            elif key == "Customer Code":
-                fields["customer_code"] = val
-    return fields
-
-
-def _parse_webflor_order_id(stdout: str, stderr: str = "") -> str | None:
-    """Try to extract WebFlor order ID from agent output."""
-    import re
-    combined = stdout + "\n" + stderr
-    for line in combined.splitlines():
-        # Match JSON-style: "IdPedido": 314631
-        if "IdPedido" in line:
-            match = re.search(r'"?IdPedido"?\s*[:=]\s*(\d+)', line)
-            if match:
-                return match.group(1)
-        # Match natural language: "Order created with ID 314631"
-        if "order" in line.lower() and "id" in line.lower():
-            match = re.search(r'(?:order|ID)\s+(\d{5,})', line)
-            if match:
-                return match.group(1)
-    return None
-
-
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
@@ -825,9 +1275,22 @@ async def startup():
     (AGENT_DIR / "tmp").mkdir(exist_ok=True)
     INSTRUCTIONS_DIR.mkdir(parents=True, exist_ok=True)
 
-    # Pre-warm WebFlor session on startup (checks Supabase first, falls back to Playwright)
-    try:
-        _ensure_login()
-        logger.info("[startup] WebFlor session ready")
-    except Exception as e:
-        logger.warning(f"[startup] Initial login failed (will retry on first request): {e}")
+    # Launch the login browser now so a later re-login skips Chromium startup
+    login_service.warm_up()
+
+    # Logins/validations done by in-process agents (webflor_auth) count as seeing the session valid
+    webflor_auth.add_session_listener(_session_keeper.record_valid)
+    # Keep the WebFlor session alive in the background (adopts Supabase cookies, falls back to Playwright)
+    app.state.session_keeper_task = asyncio.create_task(_session_keeper.run())
+
+    # Shared warm MCP server for extraction agents (ORCHESTRATOR_MCP_SERVICE=1)
+    _start_mcp_service()
+
+    # Drain /extract and /enter jobs (including any left over from before a restart)
+    app.state.job_worker_tasks = _start_job_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if _mcp_service is not None and _mcp_service.poll() is None:
+        _mcp_service.terminate()
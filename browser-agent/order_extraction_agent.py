@@ -72,12 +72,12 @@ ERP_TOOL_NAMES = [
         # Session
         "refresh_session", "set_session",
         # Cached local lookups
-        "search_empaques", "search_farms", "search_products",
+        "search_empaques", "search_empaques_batch", "lookup_cached_empaques", "search_farms", "search_products",
         "search_picklists", "search_cached_file", "search_clients_csv",
         "search_box_marks", "search_box_types", "search_box_dimensions",
         "search_compositions", "search_varieties",
         # Live API lookups
-        "lookup_client_product_ficha", "lookup_marca_box_info", "lookup_empaque_details",
+        "lookup_client_product_ficha", "lookup_client_product_ficha_batch", "lookup_marca_box_info", "lookup_empaque_details",
         "resolve_delivery_date",
         # Reference order lookups
         "list_recent_orders", "get_order_with_items",
@@ -88,7 +88,7 @@ ERP_TOOL_NAMES = [
         # Customer-specific rules
         "search_customer_notes",
         # Item code → empaque mappings (historically observed, not exhaustive)
-        "lookup_item_mappings",
+        "lookup_item_mappings", "lookup_item_mappings_batch",
     ]
 ]
 
@@ -201,14 +201,15 @@ STEP 5: Map each line item to a WebFlor empaque.
   These are acceptable variant substitutions — adjust quantities proportionally but preserve
   the reference order's empaque choices. Do NOT replace them with a single different empaque.
 
-  ALSO: Call lookup_item_mappings with each item code (e.g. "CBD13451") to check for
+  ALSO: Call lookup_item_mappings_batch once with all item codes (e.g. ["CBD13451", "CBD01794"]) to check for
   historically observed mappings. These show which empaques have been used for this item
   code in past orders. Note: these are not exhaustive and not always 1:1 — a single item
   code may be split across multiple empaques in different quantities depending on availability.
   Use these to validate the reference order mapping or as candidates when no reference exists.
 
   FALLBACK (no reference order, or items not in reference):
-  a) Use search_empaques with keywords derived from the description to find candidates.
+  a) Use search_empaques_batch (one query per unmatched line) with keywords derived from the
+     description to find candidates.
      Translate abbreviations to full flower names (e.g. "CARNS" → "Carnation",
      "RBW" → "Rainbow", "ASST" → "Mixed", "MINI CARNS" → "Minicarnation").
   b) Match by Pack size (Ramos/Caja) to disambiguate if multiple results.
@@ -219,8 +220,8 @@ STEP 5: Map each line item to a WebFlor empaque.
 
 STEP 6: Determine Tipo Precio for each item.
   - If empaque PickManejaPrecio == 57: Tipo Precio = "Ramos" (locked for composites).
-  - If empaque PickManejaPrecio == 56: call lookup_client_product_ficha(client_id, product_id)
-    to get the ficha's PickTipoPrecio. 66 = "Ramos", 67 = "Tallos".
+  - If empaque PickManejaPrecio == 56: call lookup_client_product_ficha_batch(client_id, product_ids)
+    once with every such IdProducto to get the ficha's PickTipoPrecio. 66 = "Ramos", 67 = "Tallos".
     Cross-check with price: ~$0.10-0.20 = likely Tallos (per-stem), ~$1+ = likely Ramos (per-bunch).
 
 STEP 7: Determine farm and marca.
@@ -287,10 +288,10 @@ async def main():
     log_path = _setup_file_logging(pdf_basename)
 
     agent_cwd = os.path.dirname(os.path.abspath(__file__))
-    mcp_server_script = os.path.join(agent_cwd, "webflor_mcp_server.py")
 
     # Lazy import — requires claude_agent_sdk
     from claude_agent_sdk import ClaudeAgentOptions, query
+    from mcp_client_config import erp_mcp_server_config
 
     output_hint = ""
     if args.output:
@@ -302,27 +303,11 @@ async def main():
         allowed_tools=["Read", "Glob", "Grep", "Write"] + ERP_TOOL_NAMES,
         permission_mode="acceptEdits",
         cwd=agent_cwd,
-        mcp_servers={
-            "erp": {
-                "type": "stdio",
-                "command": sys.executable,
-                "args": [mcp_server_script],
-                "env": {
-                    "WEBFLOR_BASE_URL": os.getenv("WEBFLOR_BASE_URL", ""),
-                    "WEBFLOR_COOKIES": os.getenv("WEBFLOR_COOKIES", ""),
-                    "SUPABASE_URL": os.getenv("SUPABASE_URL", ""),
-                    "SUPABASE_SECRET_KEY": os.getenv("SUPABASE_SECRET_KEY", ""),
-                    "ORGANIZATION_ID": os.getenv("ORGANIZATION_ID", ""),
-                    "DATA_DIR": os.getenv("DATA_DIR", ""),
-                    "PATH": os.getenv("PATH", ""),
-                },
-            }
-        },
+        mcp_servers={"erp": erp_mcp_server_config()},
     )
 
     logger.info(f"PDF: {pdf_path}")
     logger.info(f"Agent CWD: {agent_cwd}")
-    logger.info(f"MCP server: {mcp_server_script}")
     logger.info(f"Tools: {len(ERP_TOOL_NAMES)} ERP + Read/Glob/Grep/Write")
     print(f"\nExtracting order from: {pdf_path}")
     print(f"Log file: {log_path}")
@@ -7,6 +7,8 @@ a minimal diff. No recipe/flower/material details — those come from the copy.
 Usage:
     cd browser-agent
     uv run order_extraction_agent_v2.py --file ../public/demo/PO029889_Customer_1142.pdf
+
+In-process: `await extract_order(folder=..., output=...)` returns a result dict.
 """
 
 import argparse
@@ -20,6 +22,8 @@ from datetime import datetime, timedelta, timezone
 
 from dotenv import load_dotenv
 
+from run_logging import RunLogHandler, close_run_log, open_run_log
+
 load_dotenv()
 
 # ─── Logging Setup ────────────────────────────────────────────────────────
@@ -32,21 +36,19 @@ _console.setLevel(logging.INFO)
 _console.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
 logger.addHandler(_console)
 
-_file_handler: logging.FileHandler | None = None
+# Own console handler — don't duplicate into the root logger when run in-process
+logger.propagate = False
 
 
-def _setup_file_logging(po_name: str = "extraction") -> str:
-    global _file_handler
+def _setup_file_logging(po_name: str = "extraction") -> tuple[str, RunLogHandler]:
+    # Per-run handler: concurrent in-process runs don't write into each other's logs
     log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_path = os.path.join(log_dir, f"{po_name}_v2_{timestamp}.log")
-    _file_handler = logging.FileHandler(log_path, encoding="utf-8")
-    _file_handler.setLevel(logging.DEBUG)
-    _file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-5s %(message)s"))
-    logger.addHandler(_file_handler)
+    file_handler = open_run_log(log_path, [logger])
     logger.info(f"Log file: {log_path}")
-    return log_path
+    return log_path, file_handler
 
 
 WEBFLOR_APP_URL = os.getenv("WEBFLOR_BASE_URL", "http://190.146.143.55:5522/WebflorExt")
@@ -68,14 +70,15 @@ ERP_TOOL_NAMES = [
         "search_clients_csv",
         "search_customer_notes",
         # Week lookup
-        "get_week",
+        "get_week", "get_week_batch",
         # Reference order lookups
         "list_recent_orders", "get_order_with_items",
         # Item mapping
-        "lookup_item_mappings",
+        "lookup_item_mappings", "lookup_item_mappings_batch",
         # Tipo Precio
-        "lookup_client_product_ficha",
-        # # Fallback: only needed if item not in any reference order
+        "lookup_client_product_ficha", "lookup_client_product_ficha_batch",
+        # Fallback: only needed if item not in any reference order
+        "search_empaques_batch",
         # "search_empaques", "lookup_empaque_details",
     ]
 ]
@@ -92,11 +95,13 @@ AVAILABLE TOOLS (use ONLY these — do NOT attempt any other tools):
 - Read, Glob, Grep, Write, Bash — standard file tools
 - search_clients_csv — find customer by name or code
 - search_customer_notes — get customer-specific rules
-- get_week — look up WebFlor week number for a date
+- get_week — look up WebFlor week number for a date (get_week_batch for several dates)
 - list_recent_orders — find recent orders for a customer
 - get_order_with_items — get full details of a reference order
-- lookup_item_mappings — validate item codes
-- lookup_client_product_ficha — check pricing rules
+- lookup_item_mappings_batch — validate ALL item codes on the PO in one call
+- lookup_client_product_ficha_batch — check pricing rules for ALL products in one call
+- lookup_item_mappings / lookup_client_product_ficha — single-key versions
+- search_empaques_batch — find empaques by name for lines not in the reference order
 
 WORKFLOW:
 
@@ -135,8 +140,8 @@ STEP 4: Find the best reference order to copy.
 
 STEP 5: Map PO line items to reference order items and determine quantities.
   - Match PO lines to reference order empaques by description similarity.
-  - Call lookup_item_mappings with each item code for validation.
-  - IMPORTANT: Use lookup_item_mappings to check how many empaques an item code maps to.
+  - Call lookup_item_mappings_batch ONCE with every item code on the PO for validation.
+  - IMPORTANT: Use the item mappings to check how many empaques an item code maps to.
     - If the item code maps to ONE empaque → use that empaque directly with the full PO quantity.
       Do NOT split it, even if the reference order has multiple similar-looking items.
       Example: CBD01794 maps to only "Carnation fcy Mixed" (1028) → always 1 row, full quantity.
@@ -144,12 +149,12 @@ STEP 5: Map PO line items to reference order items and determine quantities.
       Distribute proportionally based on the reference order ratios.
       Example: CBD13451 maps to 6 empaques (Polar Route, Halo, Rodas in fcy/sel variants).
       If the reference had 6 Polar Route + 4 Rodas, split the PO quantity in that 6:4 ratio.
-  - Fallback (item not in reference): search_empaques to find the empaque.
+  - Fallback (items not in reference): ONE search_empaques_batch call with a query per such line.
 
 STEP 6: Determine Tipo Precio for each item.
   - If empaque PickManejaPrecio == 57: "Ramos" (locked).
   - Otherwise: price >= $0.50 → "Ramos", price < $0.50 → "Tallos".
-    Cross-check with lookup_client_product_ficha. Flag disagreements with REVIEW.
+    Cross-check with lookup_client_product_ficha_batch (one call with every IdProducto). Flag disagreements with REVIEW.
 
 STEP 7: Output the .md file.
 
@@ -172,34 +177,28 @@ STEP 8: Write to orders/instructions/<PO_number>.md
 Be concise. Extract, find reference, output."""
 
 
-async def main():
-    parser = argparse.ArgumentParser(description="Extract order from PDF to .md (V2 — copy-first)")
-    group = parser.add_mutually_exclusive_group(required=True)
-    group.add_argument("--file", action="append", help="Path to a PDF or image file (can be specified multiple times)")
-    group.add_argument("--folder", help="Path to a folder containing PDF/image files")
-    parser.add_argument("--output", help="Output .md file path (default: orders/instructions/<PO>.md)")
-    args = parser.parse_args()
+async def extract_order(folder: str | None = None, files: list[str] | None = None,
+                        output: str | None = None, on_event=None) -> dict:
+    """Run the extraction agent on a folder or list of files.
 
-    if args.folder:
-        folder = os.path.abspath(args.folder)
-        if not os.path.isdir(folder):
-            print(f"Folder not found: {folder}")
-            sys.exit(1)
-    else:
-        # --file mode: validate all files exist
-        for f in args.file:
-            if not os.path.exists(os.path.abspath(f)):
-                print(f"File not found: {os.path.abspath(f)}")
-                sys.exit(1)
-        folder = None
-
-    log_name = os.path.basename(folder) if folder else os.path.splitext(os.path.basename(args.file[0]))[0]
-    log_path = _setup_file_logging(log_name)
+    In-process entry point (the orchestrator calls this directly). Progress goes out
+    as agent_events (to `on_event`, or the AGENT_EVENTS_FD pipe when run as a
+    subprocess). Returns the agent's result, the .md output path, its parsed Order
+    Details and run stats.
+    """
+    if folder:
+        folder = os.path.abspath(folder)
+    source = folder or ", ".join(os.path.abspath(f) for f in files)
+    log_name = os.path.basename(folder) if folder else os.path.splitext(os.path.basename(files[0]))[0]
+    log_path, file_handler = _setup_file_logging(log_name)
 
     agent_cwd = os.path.dirname(os.path.abspath(__file__))
-    mcp_server_script = os.path.join(agent_cwd, "webflor_mcp_server.py")
 
     from claude_agent_sdk import ClaudeAgentOptions, query
+    from agent_events import EventSink
+    from mcp_client_config import erp_mcp_server_config
+
+    events = EventSink(on_event)
 
     # Build date context in Colombia timezone (UTC-5) since La Gaitana is based there
     COT = timezone(timedelta(hours=-5))  # Colombia Time
@@ -224,12 +223,12 @@ async def main():
     ])
 
     output_hint = ""
-    if args.output:
-        output_hint = f"\nWrite the output to: {os.path.abspath(args.output)}"
+    if output:
+        output_hint = f"\nWrite the output to: {os.path.abspath(output)}"
     if folder:
         prompt = f"Extract the order from the files in this folder and produce a .md order file. Read ALL files — some may be the PO, others may be spec sheets or supporting images. List the folder first to see what's there:\n  {folder}{output_hint}\n\n{date_context}"
     else:
-        files_list = "\n".join(f"  - {os.path.abspath(f)}" for f in args.file)
+        files_list = "\n".join(f"  - {os.path.abspath(f)}" for f in files)
         prompt = f"Extract the order from these files and produce a .md order file. Read ALL files — some may be the PO, others may be spec sheets or supporting images:\n{files_list}{output_hint}\n\n{date_context}"
 
     options = ClaudeAgentOptions(
@@ -237,32 +236,13 @@ async def main():
         allowed_tools=["Read", "Glob", "Grep", "Write", "Bash"] + ERP_TOOL_NAMES,
         permission_mode="acceptEdits",
         cwd=agent_cwd,
-        mcp_servers={
-            "erp": {
-                "type": "stdio",
-                "command": sys.executable,
-                "args": [mcp_server_script],
-                "env": {
-                    "WEBFLOR_BASE_URL": os.getenv("WEBFLOR_BASE_URL", ""),
-                    "WEBFLOR_COOKIES": os.getenv("WEBFLOR_COOKIES", ""),
-                    "SUPABASE_URL": os.getenv("SUPABASE_URL", ""),
-                    "SUPABASE_SECRET_KEY": os.getenv("SUPABASE_SECRET_KEY", ""),
-                    "ORGANIZATION_ID": os.getenv("ORGANIZATION_ID", ""),
-                    "DATA_DIR": os.getenv("DATA_DIR", ""),
-                    "PATH": os.getenv("PATH", ""),
-                },
-            }
-        },
+        mcp_servers={"erp": erp_mcp_server_config()},
     )
 
-    source = folder or ", ".join(os.path.abspath(f) for f in args.file)
     logger.info(f"Source: {source}")
     logger.info(f"Agent CWD: {agent_cwd}")
-    logger.info(f"MCP server: {mcp_server_script}")
     logger.info(f"Tools: {len(ERP_TOOL_NAMES)} ERP + Read/Glob/Grep/Write")
-    print(f"\nExtracting order from: {source}")
-    print(f"Log file: {log_path}")
-    print(f"Starting extraction agent V2 (copy-first)...\n")
+    logger.info("Starting extraction agent V2 (copy-first)...")
 
     from claude_agent_sdk import (
         AssistantMessage, UserMessage, SystemMessage, ResultMessage,
@@ -274,68 +254,117 @@ async def main():
     tool_errors = 0
     turn_count = 0
     pending_tool_calls: dict[str, tuple[str, float]] = {}
+    result: dict = {"source": source, "output": os.path.abspath(output) if output else None,
+                    "log_path": log_path, "result": "", "turns": 0, "cost_usd": None}
 
-    result_text = ""
-    async for message in query(prompt=prompt, options=options):
-        if isinstance(message, AssistantMessage):
-            turn_count += 1
-            for block in message.content:
-                if isinstance(block, ToolUseBlock):
-                    tool_call_count += 1
-                    input_str = json.dumps(block.input)
-                    logger.info(f"[turn {turn_count}] Tool call #{tool_call_count}: {block.name}")
-                    logger.debug(f"  Tool input: {input_str}")
-                    pending_tool_calls[block.id] = (block.name, time.time())
-                elif isinstance(block, TextBlock) and block.text.strip():
-                    print(block.text)
-                    logger.debug(f"  Agent text: {block.text[:500]}")
-
-        elif isinstance(message, UserMessage):
-            if isinstance(message.content, list):
+    try:
+        async for message in query(prompt=prompt, options=options):
+            if isinstance(message, AssistantMessage):
+                turn_count += 1
                 for block in message.content:
-                    if isinstance(block, ToolResultBlock):
-                        content_str = str(block.content) if block.content else "(empty)"
-                        status = "ERROR" if block.is_error else "ok"
-                        if block.is_error:
-                            tool_errors += 1
-
-                        duration_str = ""
-                        tool_name = "?"
-                        if block.tool_use_id in pending_tool_calls:
-                            tool_name, call_start = pending_tool_calls.pop(block.tool_use_id)
-                            duration = time.time() - call_start
-                            duration_str = f" ({duration:.1f}s)"
-
-                        logger.info(f"  → {tool_name} [{status}]{duration_str} {content_str[:150]}")
-                        logger.debug(f"  Tool result [{status}]{duration_str}: {content_str}")
-
-        elif isinstance(message, ResultMessage):
-            result_text = message.result
-            elapsed = time.time() - run_start
-            print(f"\n{'='*60}")
-            print(f"Result: {result_text}")
-            if message.total_cost_usd is not None:
-                print(f"Cost: ${message.total_cost_usd:.4f}")
-            print(f"Turns: {message.num_turns} | Duration: {message.duration_ms/1000:.1f}s")
-            print(f"Tool calls: {tool_call_count} ({tool_errors} errors)")
-            print(f"Log: {log_path}")
-            print(f"{'='*60}")
-
-            logger.info(f"{'='*60}")
-            logger.info(f"EXTRACTION V2 COMPLETE")
-            logger.info(f"  Source: {source}")
-            logger.info(f"  Result: {result_text}")
-            logger.info(f"  Turns: {message.num_turns}")
-            logger.info(f"  Tool calls: {tool_call_count} ({tool_errors} errors)")
-            logger.info(f"  Wall time: {elapsed:.1f}s")
-            if message.total_cost_usd is not None:
-                logger.info(f"  Cost: ${message.total_cost_usd:.4f}")
-            logger.info(f"{'='*60}")
-
-        elif isinstance(message, SystemMessage):
-            logger.debug(f"System: {message.subtype} — {str(message)[:500]}")
+                    if isinstance(block, ToolUseBlock):
+                        tool_call_count += 1
+                        input_str = json.dumps(block.input)
+                        logger.info(f"[turn {turn_count}] Tool call #{tool_call_count}: {block.name}")
+                        logger.debug(f"  Tool input: {input_str}")
+                        pending_tool_calls[block.id] = (block.name, time.time())
+                        events.emit("tool_start", name=block.name.removeprefix("mcp__erp__"), id=block.id)
+                    elif isinstance(block, TextBlock) and block.text.strip():
+                        logger.info(f"Agent: {block.text}")
+
+            elif isinstance(message, UserMessage):
+                if isinstance(message.content, list):
+                    for block in message.content:
+                        if isinstance(block, ToolResultBlock):
+                            content_str = str(block.content) if block.content else "(empty)"
+                            status = "ERROR" if block.is_error else "ok"
+                            if block.is_error:
+                                tool_errors += 1
+
+                            duration_str = ""
+                            tool_name = "?"
+                            duration = None
+                            if block.tool_use_id in pending_tool_calls:
+                                tool_name, call_start = pending_tool_calls.pop(block.tool_use_id)
+                                duration = time.time() - call_start
+                                duration_str = f" ({duration:.1f}s)"
+                            events.emit("tool_end", name=tool_name.removeprefix("mcp__erp__"),
+                                        id=block.tool_use_id, ok=not block.is_error, duration=duration)
+
+                            logger.info(f"  → {tool_name} [{status}]{duration_str} {content_str[:150]}")
+                            logger.debug(f"  Tool result [{status}]{duration_str}: {content_str}")
+
+            elif isinstance(message, ResultMessage):
+                elapsed = time.time() - run_start
+                result.update(result=message.result, turns=message.num_turns,
+                              cost_usd=message.total_cost_usd, is_error=message.is_error)
+
+                logger.info(f"{'='*60}")
+                logger.info(f"EXTRACTION V2 COMPLETE")
+                logger.info(f"  Source: {source}")
+                logger.info(f"  Result: {message.result}")
+                logger.info(f"  Turns: {message.num_turns}")
+                logger.info(f"  Tool calls: {tool_call_count} ({tool_errors} errors)")
+                logger.info(f"  Wall time: {elapsed:.1f}s")
+                if message.total_cost_usd is not None:
+                    logger.info(f"  Cost: ${message.total_cost_usd:.4f}")
+                logger.info(f"{'='*60}")
+
+            elif isinstance(message, SystemMessage):
+                logger.debug(f"System: {message.subtype} — {str(message)[:500]}")
+
+        result.update(tool_calls=tool_call_count, tool_errors=tool_errors,
+                      duration=time.time() - run_start)
+        if result["output"] and os.path.exists(result["output"]):
+            from deterministic_enter_agent import parse_order_details
+            with open(result["output"]) as f:
+                result["order_details"] = parse_order_details(f.read())
+    except Exception as e:
+        events.emit("error", message=str(e))
+        raise
+    finally:
+        close_run_log(file_handler)
+
+    events.emit("result", **result)
+    return result
+
+
+def extract_order_sync(**kwargs) -> dict:
+    """extract_order() for process-pool workers."""
+    return asyncio.run(extract_order(**kwargs))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Extract order from PDF to .md (V2 — copy-first)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--file", action="append", help="Path to a PDF or image file (can be specified multiple times)")
+    group.add_argument("--folder", help="Path to a folder containing PDF/image files")
+    parser.add_argument("--output", help="Output .md file path (default: orders/instructions/<PO>.md)")
+    args = parser.parse_args()
+
+    if args.folder:
+        folder = os.path.abspath(args.folder)
+        if not os.path.isdir(folder):
+            print(f"Folder not found: {folder}")
+            sys.exit(1)
+    else:
+        # --file mode: validate all files exist
+        for f in args.file:
+            if not os.path.exists(os.path.abspath(f)):
+                print(f"File not found: {os.path.abspath(f)}")
+                sys.exit(1)
+        folder = None
 
+    result = await extract_order(folder=folder, files=args.file, output=args.output)
 
+    print(f"\n{'='*60}")
+    print(f"Result: {result['result']}")
+    if result["cost_usd"] is not None:
+        print(f"Cost: ${result['cost_usd']:.4f}")
+    print(f"Turns: {result['turns']} | Duration: {result['duration']:.1f}s")
+    print(f"Tool calls: {result['tool_calls']} ({result['tool_errors']} errors)")
+    print(f"Log: {result['log_path']}")
+    print(f"{'='*60}")
 
 if __name__ == "__main__":
     asyncio.run(main())
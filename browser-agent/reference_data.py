@@ -0,0 +1,674 @@
+"""
+In-memory reference data store for the cached WebFlor lookups in DATA_DIR.
+
+Each data file is parsed once and kept in memory. Per-field lowercase indexes
+(an exact-value dict plus a trigram index for substring queries) are built
+lazily the first time a field is searched, so the search_* tools answer
+without touching disk.
+
+Files are re-read when they change on disk (see Hot Reload below), so a
+download_reference_data.py run is picked up within a few seconds.
+
+Used by the MCP server, the chat server and the Chainlit app in chat-app/
+(which imports this module from here).
+"""
+
+import csv
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable
+
+logger = logging.getLogger("reference_data")
+
+DATA_DIR = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# Files that may also sit next to this script (older deploys copied clientes.csv there)
+_FALLBACK_DIR = os.path.dirname(os.path.abspath(__file__))
+_FALLBACK_FILES = ("clientes.csv",)
+
+_NGRAM = 3
+
+
+# ─── Indexes ─────────────────────────────────────────────────────────────
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+class FieldIndex:
+    """Lowercase index over one column of values.
+
+    exact:    lowercase value → record positions
+    trigrams: 3-char substring → record positions (sorted)
+    Queries shorter than 3 chars fall back to a scan of the lowercase column,
+    which is still in-memory and cheap at these sizes.
+    """
+
+    def __init__(self, values: list[str]):
+        self.values: list[str] = [v.lower() for v in values]
+        self.exact: dict[str, list[int]] = {}
+        trigrams: dict[str, list[int]] = {}
+        for pos, val in enumerate(self.values):
+            self.exact.setdefault(val, []).append(pos)
+            for gram in _trigrams(val):
+                trigrams.setdefault(gram, []).append(pos)
+        self.trigrams = trigrams
+
+    def lookup(self, value: str) -> list[int]:
+        """Positions whose value equals `value` (case-insensitive)."""
+        return self.exact.get(value.lower(), [])
+
+    def search(self, query: str, max_results: int | None = None) -> list[int]:
+        """Positions whose value contains `query` (case-insensitive), in record order."""
+        q = query.lower()
+        if len(q) < _NGRAM:
+            candidates = range(len(self.values))
+        else:
+            postings = []
+            for gram in _trigrams(q):
+                hits = self.trigrams.get(gram)
+                if not hits:
+                    return []
+                postings.append(hits)
+            postings.sort(key=len)
+            common = set(postings[0])
+            for hits in postings[1:]:
+                common.intersection_update(hits)
+                if not common:
+                    return []
+            candidates = sorted(common)
+        results = []
+        for pos in candidates:
+            if q in self.values[pos]:
+                results.append(pos)
+                if max_results is not None and len(results) >= max_results:
+                    break
+        return results
+
+
+class Dataset:
+    """A parsed data file plus its lazily-built field indexes."""
+
+    def __init__(self, filename: str, raw: Any, records: list[dict]):
+        self.filename = filename
+        self.raw = raw
+        self.records = records
+        self._fields: dict[str, FieldIndex] = {}
+        self._lock = threading.Lock()
+
+    def field(self, name: str) -> FieldIndex:
+        index = self._fields.get(name)
+        if index is None:
+            with self._lock:
+                index = self._fields.get(name)
+                if index is None:
+                    index = FieldIndex([str(r.get(name, "")) for r in self.records])
+                    self._fields[name] = index
+        return index
+
+    def search(self, field: str, query: str, max_results: int = 20) -> list[dict]:
+        return [self.records[pos] for pos in self.field(field).search(query, max_results)]
+
+    def lookup(self, field: str, value: str) -> list[dict]:
+        return [self.records[pos] for pos in self.field(field).lookup(value)]
+
+
+# ─── Loading & Hot Reload ────────────────────────────────────────────────
+# Every cached object (dataset or derived index) is keyed by its DATA_DIR
+# filename and stamped with a (inode, mtime_ns, size) fingerprint. Stats are
+# throttled to once per RELOAD_CHECK_INTERVAL per file (or done by the watcher
+# thread); when a fingerprint changes the object is rebuilt off to the side and
+# swapped in with a single dict assignment, and the generation counter bumps.
+
+RELOAD_CHECK_INTERVAL = float(os.getenv("DATA_RELOAD_INTERVAL", "2"))
+
+Fingerprint = tuple[int, int, int]
+
+
+def _fingerprint(filepath: str) -> Fingerprint | None:
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class _Entry:
+    __slots__ = ("filename", "value", "fingerprint", "checked_at", "builder")
+
+    def __init__(self, filename: str, value: Any, fingerprint: Fingerprint | None, builder: Callable[[str], Any]):
+        self.filename = filename
+        self.value = value
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+        self.builder = builder
+
+
+# (filename, kind) → entry; kind separates e.g. raw CSV rows from an index over them
+_cache: dict[tuple[str, str], _Entry] = {}
+_cache_lock = threading.Lock()
+_generation = 0
+_watcher: threading.Thread | None = None
+
+
+def _path(filename: str) -> str:
+    """Where `filename` is read from: DATA_DIR, or the script's directory for a fallback file missing there."""
+    filepath = os.path.join(DATA_DIR, filename)
+    if filename in _FALLBACK_FILES and not os.path.exists(filepath):
+        alt = os.path.join(_FALLBACK_DIR, filename)
+        if os.path.exists(alt):
+            return alt
+    return filepath
+
+
+def _read_json(filepath: str) -> Any:
+    """Read a JSON file, falling back to the first line for JSONL dumps."""
+    with open(filepath, "r") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            f.seek(0)
+            return json.loads(f.readline())
+
+
+def _build_dataset(filename: str) -> Dataset:
+    filepath = _path(filename)
+    if not os.path.exists(filepath):
+        return Dataset(filename, None, [])
+    raw = _read_json(filepath)
+    records = raw if isinstance(raw, list) else [raw]
+    logger.info(f"Loaded {filename} ({len(records)} records)")
+    return Dataset(filename, raw, records)
+
+
+def _read_csv(filename: str, header_start: str = "") -> list[dict]:
+    """Read a CSV from DATA_DIR into row dicts (empty if missing).
+
+    header_start: skip preamble lines until one starting with this prefix
+    (the WebFlor packaging export has report titles above the header).
+    """
+    filepath = _path(filename)
+    if not os.path.exists(filepath):
+        return []
+    with open(filepath, "r", newline="", encoding="utf-8-sig") as f:
+        if header_start:
+            while True:
+                pos = f.tell()
+                line = f.readline()
+                if not line:
+                    return []
+                if line.startswith(header_start):
+                    f.seek(pos)
+                    break
+        rows = list(csv.DictReader(f))
+    logger.info(f"Loaded {filename} ({len(rows)} rows)")
+    return rows
+
+
+def _build(filename: str, builder: Callable[[str], Any]) -> _Entry:
+    # Fingerprint before reading so a write racing the build is caught next check
+    fingerprint = _fingerprint(_path(filename))
+    return _Entry(filename, builder(filename), fingerprint, builder)
+
+
+def _refresh(key: tuple[str, str], entry: _Entry) -> _Entry:
+    """Rebuild `entry` if its file changed on disk; returns the current entry."""
+    global _generation
+    entry.checked_at = time.monotonic()
+    if _fingerprint(_path(entry.filename)) == entry.fingerprint:
+        return entry
+    with _cache_lock:
+        current = _cache.get(key)
+        if current is not entry:
+            return current or entry
+        try:
+            fresh = _build(entry.filename, entry.builder)
+        except Exception as e:
+            # Half-written download — keep serving the old data, retry next check
+            logger.warning(f"Reload of {entry.filename} failed, keeping previous version: {e}")
+            return entry
+        _cache[key] = fresh
+        _generation += 1
+    logger.info(f"Reloaded {entry.filename} (generation {_generation})")
+    return fresh
+
+
+def _get(filename: str, builder: Callable[[str], Any], kind: str = "json") -> Any:
+    key = (filename, kind)
+    entry = _cache.get(key)
+    if entry is None:
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is None:
+                entry = _build(filename, builder)
+                _cache[key] = entry
+        return entry.value
+    if _watcher is None and time.monotonic() - entry.checked_at >= RELOAD_CHECK_INTERVAL:
+        entry = _refresh(key, entry)
+    return entry.value
+
+
+def get_dataset(filename: str) -> Dataset:
+    """Get the in-memory dataset for a DATA_DIR JSON file, loading it on first use."""
+    return _get(filename, _build_dataset)
+
+
+def load_csv_rows(filename: str, header_start: str = "") -> list[dict]:
+    """All rows of a DATA_DIR CSV file as dicts (copies), cached like the JSON datasets."""
+    return _copies(_get(filename, lambda name: _read_csv(name, header_start), kind=f"csv:{header_start}"))
+
+
+def exists(filename: str) -> bool:
+    """Whether a loaded data file was present on disk at its last check."""
+    for (name, _kind), entry in list(_cache.items()):
+        if name == filename:
+            return entry.fingerprint is not None
+    return os.path.exists(_path(filename))
+
+
+def generation() -> int:
+    """Counter bumped every time a changed file is swapped in.
+
+    Callers that derive their own caches from this data can compare it to
+    know when to drop them.
+    """
+    return _generation
+
+
+def check_for_changes() -> int:
+    """Stat every loaded file now and swap in rebuilt copies. Returns the generation."""
+    for key, entry in list(_cache.items()):
+        _refresh(key, entry)
+    return _generation
+
+
+def start_watcher(interval: float = RELOAD_CHECK_INTERVAL) -> None:
+    """Poll DATA_DIR fingerprints from a daemon thread.
+
+    Rebuilds then happen in the background instead of on the first call after
+    a refresh, and the hot path skips its own stat checks. Safe to call twice.
+    """
+    global _watcher
+    if _watcher is not None:
+        return
+
+    def _loop():
+        while True:
+            time.sleep(interval)
+            try:
+                check_for_changes()
+            except Exception as e:
+                logger.warning(f"Data watcher check failed: {e}")
+
+    _watcher = threading.Thread(target=_loop, name="reference-data-watcher", daemon=True)
+    _watcher.start()
+    logger.info(f"Watching {DATA_DIR} for changes every {interval:g}s")
+
+
+# ─── Packaging Index ─────────────────────────────────────────────────────
+# packaging_webflor_items_list.csv is the full empaque catalog (listarEmpaquesActivos
+# caps at 100). It gets an inverted token index so multi-keyword queries are
+# answered by intersecting posting lists instead of scanning every row.
+
+EMPAQUES_FILE = "packaging_webflor_items_list.csv"
+
+# Field weights for ranking — a keyword hit in the empaque name counts most
+_EMPAQUE_FIELDS = {
+    "NomEmpaque": 3.0,
+    "NomVariedad": 2.0,
+    "NomProducto": 1.0,
+    "NomColor": 1.0,
+    "NomGrado": 1.0,
+}
+# Match quality of a query keyword against an indexed token
+_EXACT, _PREFIX, _INFIX = 1.0, 0.8, 0.5
+# Keywords whose matches are kept (least recently used dropped first)
+_KEYWORD_CACHE_SIZE = 1024
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class EmpaqueIndex:
+    """Inverted token index over the packaging CSV.
+
+    postings: token → {row position: best field weight}
+    by_id:    IdEmpaque → row
+    tokens:   trigram index over the vocabulary, to find the tokens containing a keyword
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.by_id: dict[str, dict] = {}
+        self.postings: dict[str, dict[int, float]] = {}
+        self._name_lower = [str(r.get("NomEmpaque") or "").lower() for r in rows]
+        self._keyword_cache: OrderedDict[str, dict[int, float]] = OrderedDict()
+        self._keyword_lock = threading.Lock()
+        for pos, row in enumerate(rows):
+            emp_id = str(row.get("IdEmpaque") or "").strip()
+            if emp_id:
+                self.by_id.setdefault(emp_id, row)
+            for field, weight in _EMPAQUE_FIELDS.items():
+                for token in _tokens(str(row.get(field) or "")):
+                    hits = self.postings.setdefault(token, {})
+                    if hits.get(pos, 0.0) < weight:
+                        hits[pos] = weight
+        self.vocabulary = sorted(self.postings)
+        self.tokens = FieldIndex(self.vocabulary)
+
+    def _match_keyword(self, keyword: str) -> dict[int, float]:
+        """Row position → score for every row with a token containing `keyword`."""
+        with self._keyword_lock:
+            cached = self._keyword_cache.get(keyword)
+            if cached is not None:
+                self._keyword_cache.move_to_end(keyword)
+                return cached
+        scores: dict[int, float] = {}
+        for token in (self.vocabulary[i] for i in self.tokens.search(keyword)):
+            if token == keyword:
+                quality = _EXACT
+            elif token.startswith(keyword):
+                quality = _PREFIX
+            else:
+                quality = _INFIX
+            for pos, weight in self.postings[token].items():
+                score = weight * quality
+                if scores.get(pos, 0.0) < score:
+                    scores[pos] = score
+        with self._keyword_lock:
+            self._keyword_cache[keyword] = scores
+            if len(self._keyword_cache) > _KEYWORD_CACHE_SIZE:
+                self._keyword_cache.popitem(last=False)
+        return scores
+
+    def search(self, query: str, max_results: int = 20) -> list[dict]:
+        """AND search: every keyword must hit a token in one of the indexed fields.
+
+        Ranked by summed keyword score, then rows whose NomEmpaque contains
+        every keyword, then shorter names, then catalog order.
+        """
+        keywords = [tok for word in query.lower().split() for tok in _tokens(word)]
+        if not keywords:
+            return self.rows[:max_results]
+        per_keyword = sorted((self._match_keyword(kw) for kw in keywords), key=len)
+        if not per_keyword[0]:
+            return []
+        totals = dict(per_keyword[0])
+        for scores in per_keyword[1:]:
+            totals = {pos: total + scores[pos] for pos, total in totals.items() if pos in scores}
+            if not totals:
+                return []
+        raw_keywords = query.lower().split()
+        ranked = sorted(
+            totals,
+            key=lambda pos: (
+                -totals[pos],
+                not all(kw in self._name_lower[pos] for kw in raw_keywords),
+                len(self._name_lower[pos]),
+                pos,
+            ),
+        )
+        return [self.rows[pos] for pos in ranked[:max_results]]
+
+    def get(self, empaque_id: str | int) -> dict | None:
+        return self.by_id.get(str(empaque_id).strip())
+
+
+def _build_empaque_index(filename: str) -> EmpaqueIndex:
+    index = EmpaqueIndex(_read_csv(filename, header_start="IdEmpaque"))
+    logger.info(f"Indexed {filename} ({len(index.rows)} empaques, {len(index.vocabulary)} tokens)")
+    return index
+
+
+def get_empaque_index() -> EmpaqueIndex:
+    """The packaging index, built on first use and rebuilt when the CSV changes."""
+    return _get(EMPAQUES_FILE, _build_empaque_index, kind="empaques")
+
+
+# ─── Customer Index ──────────────────────────────────────────────────────
+# clientes.csv resolves the customer on a PO to a WebFlor IdCliente — the first
+# step of every extraction. Exact maps cover codes/IDs/NIT/phone, the name and
+# all-fields columns get substring indexes, and a trigram index over normalized
+# names catches misspellings.
+
+CLIENTES_FILE = "clientes.csv"
+
+# Trailing legal-entity words that POs often add, drop or abbreviate differently
+_LEGAL_SUFFIXES = {"inc", "llc", "ltd", "ltda", "corp", "co", "sa", "sas", "s", "a", "the"}
+_FUZZY_MIN_SCORE = 0.35
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, strip accents/punctuation and legal suffixes ('Flores S.A.S.' → 'flores')."""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    words = re.sub(r"[^a-z0-9]+", " ", text).split()
+    while len(words) > 1 and words[-1] in _LEGAL_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def normalize_phone(phone: str) -> str:
+    """Digits only, without country code (last 10 digits). Empty if too short to be a phone."""
+    digits = re.sub(r"\D", "", phone)
+    return digits[-10:] if len(digits) >= 7 else ""
+
+
+def _normalize_nit(nit: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", nit.lower())
+
+
+def _name_grams(name: str) -> set[str]:
+    return _trigrams(f"  {name} ")
+
+
+class CustomerIndex:
+    """Prebuilt lookup structures over clientes.csv."""
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.by_codigo: dict[str, list[int]] = {}
+        self.by_id: dict[str, list[int]] = {}
+        self.by_nit: dict[str, list[int]] = {}
+        self.by_phone: dict[str, list[int]] = {}
+        self.name_grams: dict[str, list[int]] = {}
+        self._gram_counts: list[int] = []
+        for pos, row in enumerate(rows):
+            self.by_codigo.setdefault(str(row.get("Codigo", "")).strip().lower(), []).append(pos)
+            self.by_id.setdefault(str(row.get("IdCliente", "")).strip(), []).append(pos)
+            nit = _normalize_nit(str(row.get("NIT", "")))
+            if nit:
+                self.by_nit.setdefault(nit, []).append(pos)
+            phone = normalize_phone(str(row.get("Telefono", "")))
+            if phone:
+                self.by_phone.setdefault(phone, []).append(pos)
+            grams = _name_grams(normalize_name(str(row.get("NomCliente", ""))))
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self.name_grams.setdefault(gram, []).append(pos)
+        self.names = FieldIndex([str(r.get("NomCliente", "")) for r in rows])
+        self.all_fields = FieldIndex([" ".join(str(v) for v in r.values()) for r in rows])
+        # Code, ID, name and NIT together — what each query word is matched against
+        self.key_fields = FieldIndex([
+            " ".join(str(r.get(k, "")) for k in ("Codigo", "IdCliente", "NomCliente", "NIT")) for r in rows
+        ])
+
+    def _exact_other(self, search: str) -> list[int]:
+        """Exact IdCliente / NIT / phone hits, in that order."""
+        hits = list(self.by_id.get(search, []))
+        nit = _normalize_nit(search)
+        if nit:
+            hits += self.by_nit.get(nit, [])
+        if re.fullmatch(r"[\d\s()+.-]+", search):
+            phone = normalize_phone(search)
+            if phone:
+                hits += self.by_phone.get(phone, [])
+        return hits
+
+    def word_matches(self, words: list[str]) -> dict[int, int]:
+        """position → how many of `words` occur in its code/ID/name/NIT (at least one)."""
+        counts: dict[int, int] = {}
+        for word in set(words):
+            for pos in self.key_fields.search(word):
+                counts[pos] = counts.get(pos, 0) + 1
+        return counts
+
+    def fuzzy(self, query: str, limit: int | None = 10) -> list[tuple[int, float]]:
+        """(position, Dice similarity) of names sharing enough trigrams with `query`."""
+        grams = _name_grams(normalize_name(query))
+        if not grams:
+            return []
+        shared: dict[int, int] = {}
+        for gram in grams:
+            for pos in self.name_grams.get(gram, ()):
+                shared[pos] = shared.get(pos, 0) + 1
+        scored = []
+        for pos, count in shared.items():
+            score = 2 * count / (len(grams) + self._gram_counts[pos])
+            if score >= _FUZZY_MIN_SCORE:
+                scored.append((pos, score))
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored[:limit] if limit is not None else scored
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Priority order: exact Codigo, name contains, all query words, any field (exact
+        IDs first), then some query words, then fuzzy name.
+
+        Words are matched separately against code/ID/name/NIT, so reordered or
+        partial words ("gaitana flores") still match. Each result row carries
+        `_match` (codigo/name/words/field/partial/fuzzy); partial and fuzzy hits
+        also carry a `_score` in [0, 1]. Partial and fuzzy matching only run
+        when neither the code, the name nor all words matched.
+        """
+        search = query.strip().lower()
+        seen: set[int] = set()
+        results: list[dict] = []
+
+        def _add(positions, match: str, score: float | None = None) -> None:
+            for pos in positions:
+                if pos in seen or len(results) >= limit:
+                    continue
+                seen.add(pos)
+                row = dict(self.rows[pos])
+                row["_match"] = match
+                if score is not None:
+                    row["_score"] = round(score, 2)
+                results.append(row)
+
+        words = search.split()
+        word_counts = self.word_matches(words) if words else {}
+        _add(self.by_codigo.get(search, []), "codigo")
+        _add(self.names.search(search), "name")
+        _add(sorted(pos for pos, n in word_counts.items() if n == len(set(words))), "words")
+        strong = len(results)
+        _add(self._exact_other(search), "field")
+        _add(self.all_fields.search(search), "field")
+        if not strong:
+            fuzzy = self.fuzzy(search, None)
+            fuzzy_scores = dict(fuzzy)
+            # Most words matched first; name similarity breaks ties (e.g. one misspelled word)
+            partial = sorted(word_counts, key=lambda pos: (-word_counts[pos], -fuzzy_scores.get(pos, 0.0), pos))
+            for pos in partial:
+                _add([pos], "partial", word_counts[pos] / len(set(words)))
+            for pos, score in fuzzy:
+                _add([pos], "fuzzy", score)
+        return results
+
+
+def _build_customer_index(filename: str) -> CustomerIndex:
+    index = CustomerIndex(_read_csv(filename))
+    logger.info(f"Indexed {filename} ({len(index.rows)} customers)")
+    return index
+
+
+def get_customer_index() -> CustomerIndex:
+    """The customer index, built on first use and rebuilt when clientes.csv changes."""
+    return _get(CLIENTES_FILE, _build_customer_index, kind="customers")
+
+
+# ─── Public API ──────────────────────────────────────────────────────────
+# Records handed out are shallow copies: the cached ones are shared by every
+# caller, so a tool that tags or pops a field mustn't change them for the next.
+
+def _copies(rows: list[dict]) -> list[dict]:
+    return [dict(row) for row in rows]
+
+
+def load_records(filename: str) -> list[dict]:
+    """All records of a cached JSON/JSONL data file (empty if missing)."""
+    return _copies(get_dataset(filename).records)
+
+
+def search(filename: str, field: str, query: str, max_results: int = 20) -> list[dict]:
+    """Case-insensitive substring search on one field, in file order."""
+    return _copies(get_dataset(filename).search(field, query, max_results))
+
+
+def lookup(filename: str, field: str, value: str) -> list[dict]:
+    """Case-insensitive exact match on one field."""
+    return _copies(get_dataset(filename).lookup(field, value))
+
+
+def search_empaques(query: str, max_results: int = 20) -> list[dict]:
+    """Ranked multi-keyword search over the packaging CSV (see EmpaqueIndex)."""
+    return _copies(get_empaque_index().search(query, max_results))
+
+
+def get_empaque(empaque_id: str | int) -> dict | None:
+    """The packaging CSV row for an IdEmpaque, or None."""
+    row = get_empaque_index().get(empaque_id)
+    return dict(row) if row is not None else None
+
+
+def search_customers(query: str, limit: int = 10) -> list[dict]:
+    """Resolve a customer code / name / ID / NIT / phone against clientes.csv (see CustomerIndex)."""
+    return get_customer_index().search(query, limit)
+
+
+def search_picklists(query: str, category: str = "", max_results: int = 20) -> list[dict]:
+    """Search picklists.json (a dict of category → records) by NomPickList/Nombre."""
+    data = get_dataset("picklists.json").raw
+    if not isinstance(data, dict):
+        return []
+    q = query.lower()
+    results = []
+    categories = [category] if category and category in data else list(data.keys())
+    for cat in categories:
+        for item in data.get(cat, []):
+            val = str(item.get("NomPickList", "") or item.get("Nombre", "")).lower()
+            if q in val:
+                item_copy = {k: v for k, v in item.items() if k != "$id"}
+                item_copy["_category"] = cat
+                results.append(item_copy)
+                if len(results) >= max_results:
+                    return results
+    return results
+
+
+def preload(filenames: list[str] | None = None) -> int:
+    """Load data files up front so the first tool call doesn't pay for parsing.
+
+    Defaults to every .json file in DATA_DIR. Returns the number of files loaded.
+    """
+    if filenames is None:
+        if not os.path.isdir(DATA_DIR):
+            return 0
+        filenames = sorted(f for f in os.listdir(DATA_DIR) if f.endswith(".json"))
+    for filename in filenames:
+        try:
+            get_dataset(filename)
+        except Exception as e:
+            logger.warning(f"Failed to preload {filename}: {e}")
+    if os.path.exists(_path(EMPAQUES_FILE)):
+        get_empaque_index()
+    if os.path.exists(_path(CLIENTES_FILE)):
+        get_customer_index()
+    return len(filenames)
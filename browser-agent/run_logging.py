@@ -0,0 +1,61 @@
+"""
+Per-run log files for agents that may run concurrently in one process.
+
+The agents log through module-level loggers. When the orchestrator runs several
+extractions/entries in-process at once, a plain FileHandler on those loggers
+would collect every run's lines. Each run's handler here only accepts records
+logged from that run's context (the task that opened it and any tasks/threads
+it spawns, which inherit the context).
+
+    handler = open_run_log(log_path, [logger, auth_logger])
+    try:
+        ...
+    finally:
+        close_run_log(handler)
+"""
+
+import logging
+from contextvars import ContextVar
+
+_current_run: ContextVar[object | None] = ContextVar("agent_run_log", default=None)
+
+
+class _RunFilter(logging.Filter):
+    def __init__(self, run: object):
+        super().__init__()
+        self.run = run
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return _current_run.get() is self.run
+
+
+class RunLogHandler(logging.FileHandler):
+    """FileHandler that only writes records from the run that opened it."""
+
+    def __init__(self, path: str, loggers: list[logging.Logger]):
+        super().__init__(path, encoding="utf-8")
+        self.loggers = loggers
+        self.run = object()
+        self._context_token = _current_run.set(self.run)
+        self.addFilter(_RunFilter(self.run))
+
+
+def open_run_log(path: str, loggers: list[logging.Logger],
+                 fmt: str = "%(asctime)s %(levelname)-5s %(message)s") -> RunLogHandler:
+    """Start logging the current run's records from `loggers` to `path`."""
+    handler = RunLogHandler(path, loggers)
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(logging.Formatter(fmt))
+    for log in loggers:
+        log.addHandler(handler)
+    return handler
+
+
+def close_run_log(handler: RunLogHandler):
+    for log in handler.loggers:
+        log.removeHandler(handler)
+    try:
+        _current_run.reset(handler._context_token)
+    except ValueError:
+        pass  # closed from a different context than it was opened in
+    handler.close()
@@ -0,0 +1,25 @@
+"""
+Supabase project for the current APP_ENV.
+
+APP_ENV=production uses the prod project and SUPABASE_PROD_SECRET_KEY; anything
+else (default staging) uses the staging project and SUPABASE_SECRET_KEY.
+"""
+
+import os
+
+APP_ENV = os.getenv("APP_ENV", "staging")
+if APP_ENV == "production":
+    SUPABASE_URL = "https://zkglvdfppodwlgzhfgqs.supabase.co"
+    SECRET_KEY_VAR = "SUPABASE_PROD_SECRET_KEY"
+else:
+    SUPABASE_URL = "https://laxhubapvubwwoafrewk.supabase.co"
+    SECRET_KEY_VAR = "SUPABASE_SECRET_KEY"
+SUPABASE_SECRET_KEY = os.getenv(SECRET_KEY_VAR, "")
+
+
+def create_supabase_client():
+    """A Supabase client for APP_ENV; raises RuntimeError naming the key variable if it isn't set."""
+    if not SUPABASE_SECRET_KEY:
+        raise RuntimeError(f"{SECRET_KEY_VAR} is not set (APP_ENV={APP_ENV}) — can't connect to {SUPABASE_URL}")
+    from supabase import create_client
+    return create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
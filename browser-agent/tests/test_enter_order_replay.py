@@ -0,0 +1,159 @@
+"""enter_order end to end against webflor_replay.FakeWebFlor (no real ERP)."""
+
+import asyncio
+import json
+
+import pytest
+
+import deterministic_enter_agent as enter_agent
+import webflor_auth
+from webflor_replay import FakeWebFlor, call_label
+
+REFERENCE_ORDER = 123
+# FakeWebFlor numbers copies from here: order, then each item followed by its recipe containers
+NEW_ORDER, NEW_A, NEW_B, NEW_C, NEW_C_CONTAINER, NEW_X = range(900_000_000, 900_000_006)
+
+REFERENCE_ITEMS = [
+    {"IdPedidoItem": 11, "IdEmpaque": 10, "NomEmpaque": "A", "Receta": 1,
+     "CantidadCaja": 5, "CajaConfirmada": 5, "CajaId": 7, "PullDate": "062"},
+    {"IdPedidoItem": 12, "IdEmpaque": 11, "NomEmpaque": "B", "Receta": 1,
+     "CantidadCaja": 3, "CajaConfirmada": 3, "CajaId": 7, "PullDate": "062"},
+    {"IdPedidoItem": 13, "IdEmpaque": 12, "NomEmpaque": "C", "Receta": 2,
+     "CantidadCaja": 2, "CajaConfirmada": 2},
+    {"IdPedidoItem": 14, "IdEmpaque": 99, "NomEmpaque": "X", "Receta": 1,
+     "CantidadCaja": 1, "CajaConfirmada": 1},
+]
+
+ORDER_MD = """\
+| Field | Value |
+|---|---|
+| PO | PO-777 |
+| Reference Order | 123 |
+| Consolidation Date | 02/20/2026 |
+
+| Empaque | IdEmpaque | Cajas | CajaId | PullDate |
+|---|---|---|---|---|
+| A | 10 | 5 | 7 | 062 |
+| B | 11 | 4 | 7 | 062 |
+| C | 12 | 2 |  | 062 |
+{extra}"""
+
+
+def _rec(method: str, endpoint: str, response, params=None, body=None) -> dict:
+    return {"method": method, "path": f"/WebFlorVenta/API/{endpoint}", "params": params, "body": body,
+            "status": 200, "latency": 0.0, "response": json.dumps(response)}
+
+
+def _recording(header_ack, item_ack) -> list[dict]:
+    """A recorded entry of one copy of the reference order; write answers as given."""
+    recorded_copy = 500
+    return [
+        _rec("POST", "copiarPedido_Ajustes", [{"IdPedido": recorded_copy}], body={"iIdPedido": REFERENCE_ORDER}),
+        _rec("GET", "listarOrdenById", [{"IdPedido": recorded_copy, "PO": "old"}],
+             params={"iIdPedido": str(recorded_copy)}),
+        _rec("GET", "listarDetalleOrdenByIdPedido", [{**it, "IdPedido": recorded_copy} for it in REFERENCE_ITEMS],
+             params={"iIdPedido": str(recorded_copy)}),
+        _rec("GET", "seleccionarDatosAdicionales", {"NombreUPC": "UPC B", "NumeroUPC": "0001"},
+             params={"IdPedidoItem": "12", "IdPedidoItemReceta": "0"}),
+        _rec("GET", "listarOrdenRecByIdPedidoItem", [{"IdPedidoItemReceta": 1, "IdPedidoItem": 13, "PullDate": "060"}],
+             params={"IdPedidoItem": "13"}),
+        _rec("PUT", "actualizarOrden", header_ack),
+        _rec("PUT", "V1/editarOrdenIt", item_ack),
+        _rec("DELETE", "eliminarOrdenItem", True),
+        _rec("PUT", "editarDatosAdicionalesReceta", True),
+    ]
+
+
+@pytest.fixture
+def enter(tmp_path, monkeypatch):
+    """enter(recording, extra_md_rows="", full_verify=None) → (result, fake, calls, writes)."""
+    monkeypatch.setattr(enter_agent, "VERIFY_FULL_READ", False)
+
+    def _enter(records: list[dict], extra: str = "", full_verify: bool | None = None):
+        order_file = tmp_path / "order.md"
+        order_file.write_text(ORDER_MD.format(extra=extra))
+        fake = FakeWebFlor(records, latency=0.0)
+
+        async def main():
+            webflor_auth.set_transport(fake)
+            webflor_auth.set_session_cookies("replay=1")
+            call_label.set("order")
+            try:
+                return await enter_agent.enter_order(str(order_file), authenticate=False, full_verify=full_verify)
+            finally:
+                webflor_auth.set_transport(None)
+
+        result = asyncio.run(main())
+        return result, fake, fake.calls["order"], fake.writes["order"]
+
+    return _enter
+
+
+def test_skips_unchanged_writes_and_reads_back_acknowledged_order(enter):
+    result, fake, calls, writes = enter(_recording(header_ack=True, item_ack={"Mensaje": "ok"}))
+
+    # Only B's quantity, X's removal and C's recipe PullDate differ from the copy
+    assert [(w["endpoint"], (w["body"] or {}).get("IdPedidoItem")) for w in writes] == [
+        ("copiarPedido_Ajustes", None),
+        ("actualizarOrden", None),
+        ("editarOrdenIt", NEW_B),
+        ("eliminarOrdenItem", NEW_X),
+        ("editarDatosAdicionalesReceta", NEW_C),
+    ]
+    assert result["skipped_calls"] == {"item_updates": 2, "datos_fetches": 1, "recipe_updates": 0}
+    assert calls["GET seleccionarDatosAdicionales"] == 1  # only B, the item being written
+
+    # Verified from the writes: B (ambiguous answer) and X (bare ack) are re-read one by one,
+    # the header (bare `true`) with its own GET — the items list isn't fetched again
+    assert result["verify"] == "writes"
+    assert calls["GET listarItemDetalleOrdenByIdPedidoItem"] == 2
+    assert calls["GET listarOrdenById"] == 2 and calls["GET listarDetalleOrdenByIdPedido"] == 1
+    assert (result["order_id"], result["items"], result["extra"], result["missing"]) == (NEW_ORDER, 3, [], [])
+
+    assert fake.orders[NEW_ORDER]["PO"] == "PO-777"
+    assert fake.items[NEW_ORDER][NEW_B]["CantidadCaja"] == 4
+    assert writes[2]["body"]["NombreUPC"] == "UPC B"  # datos adicionales preserved on the PUT
+    assert NEW_X not in fake.items[NEW_ORDER]
+    assert fake.containers[NEW_C][0]["PullDate"] == "062"
+
+
+def test_ack_only_writes_make_no_full_get_by_default(enter):
+    result, _, calls, _ = enter(_recording(header_ack=True, item_ack=True))
+
+    assert result["verify"] == "writes"
+    assert calls["GET listarDetalleOrdenByIdPedido"] == 1  # only the pre-write read
+    assert calls["GET listarItemDetalleOrdenByIdPedidoItem"] == 2  # B updated, X deleted
+    assert (result["items"], result["extra"], result["missing"]) == (3, [], [])
+
+
+def test_many_unconfirmed_writes_read_items_once(enter, monkeypatch):
+    monkeypatch.setattr(enter_agent, "VERIFY_TARGETED_MAX", 1)
+    result, _, calls, _ = enter(_recording(header_ack=True, item_ack=True))
+
+    assert result["verify"] == "writes"
+    assert calls["GET listarDetalleOrdenByIdPedido"] == 2
+    assert "GET listarItemDetalleOrdenByIdPedidoItem" not in calls
+    assert (result["items"], result["extra"], result["missing"]) == (3, [], [])
+
+
+def test_ambiguous_item_write_is_read_back(enter):
+    # X kept (no delete); the header PUT echoes the order, the item PUT only says "ok"
+    result, _, calls, _ = enter(
+        _recording(header_ack=[{"IdPedido": NEW_ORDER, "PO": "PO-777"}], item_ack={"Mensaje": "ok"}),
+        extra="| X | 99 | 1 |  |  |\n",
+    )
+
+    assert result["verify"] == "writes"
+    assert calls["GET listarItemDetalleOrdenByIdPedidoItem"] == 1
+    assert calls["GET listarOrdenById"] == 1 and calls["GET listarDetalleOrdenByIdPedido"] == 1
+    assert (result["items"], result["extra"], result["missing"]) == (4, [], [])
+
+
+def test_full_verify_always_rereads(enter):
+    result, _, calls, _ = enter(
+        _recording(header_ack=[{"IdPedido": NEW_ORDER, "PO": "PO-777"}], item_ack={"Mensaje": "ok"}),
+        extra="| X | 99 | 1 |  |  |\n", full_verify=True,
+    )
+    assert result["verify"] == "full"
+    assert calls["GET listarOrdenById"] == 2
+    assert "GET listarItemDetalleOrdenByIdPedidoItem" not in calls
@@ -0,0 +1,46 @@
+from deterministic_enter_agent import _item_diff, _same_value
+
+
+def _copied_item(**fields) -> dict:
+    item = {"IdPedidoItem": 1, "Receta": 0, "CantidadCaja": 4, "CajaConfirmada": 4, "CajaId": 12, "PullDate": "062"}
+    item.update(fields)
+    return item
+
+
+def test_unchanged_item_is_a_no_op():
+    target = {"cajas": 4, "caja_id": "12", "pull_date": "062"}
+    assert _item_diff(_copied_item(), target) == {}
+
+
+def test_webflor_types_compare_equal_to_order_file_strings():
+    assert _same_value(12, "12")
+    assert _same_value(None, "")
+    assert _same_value(" 062", "062 ")
+    assert not _same_value(0, "")
+
+
+def test_changed_quantity_is_reported():
+    diff = _item_diff(_copied_item(), {"cajas": 6, "caja_id": "", "pull_date": ""})
+    assert diff == {"CantidadCaja": (4, 6), "CajaConfirmada": (4, 6)}
+
+
+def test_blank_optional_targets_are_ignored():
+    item = _copied_item(CajaId=99, PullDate="001")
+    assert _item_diff(item, {"cajas": 4, "caja_id": "", "pull_date": ""}) == {}
+
+
+def test_caja_and_pull_date_changes():
+    diff = _item_diff(_copied_item(), {"cajas": 4, "caja_id": "15", "pull_date": "075"})
+    assert diff == {"CajaId": (12, "15"), "PullDate": ("062", "075")}
+
+
+def test_pull_date_not_compared_on_recipe_items():
+    # Receta=2 items carry PullDate on their recipe containers, not the item row
+    item = _copied_item(Receta=2, PullDate=None)
+    assert _item_diff(item, {"cajas": 4, "caja_id": "", "pull_date": "075"}) == {}
+
+
+def test_null_fields_on_copy_are_differences():
+    item = _copied_item(CajaConfirmada=None, PullDate=None)
+    diff = _item_diff(item, {"cajas": 4, "caja_id": "", "pull_date": "062"})
+    assert diff == {"CajaConfirmada": (None, 4), "PullDate": (None, "062")}
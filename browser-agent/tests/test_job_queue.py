@@ -0,0 +1,82 @@
+import job_queue
+from job_queue import JobQueue
+
+
+def _queue(tmp_path) -> JobQueue:
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_by_priority_then_age(tmp_path):
+    q = _queue(tmp_path)
+    low, _ = q.enqueue("enter", "p1", {"n": 1})
+    high, _ = q.enqueue("enter", "p2", {"n": 2}, priority=5)
+    later, _ = q.enqueue("enter", "p3", {"n": 3})
+    q.enqueue("extract", "e1", {})
+
+    assert [q.claim("enter").id for _ in range(3)] == [high, low, later]
+    assert q.claim("enter") is None
+    assert q.claim("extract").key == "e1"
+
+
+def test_active_key_is_deduplicated(tmp_path):
+    q = _queue(tmp_path)
+    job_id, created = q.enqueue("enter", "p1", {"a": 1})
+    assert created
+    assert q.enqueue("enter", "p1", {"a": 2}) == (job_id, False)
+
+    job = q.claim("enter")
+    assert job.payload == {"a": 1}
+    assert q.enqueue("enter", "p1", {}) == (job_id, False)  # running still counts
+
+    q.complete(job.id)
+    new_id, created = q.enqueue("enter", "p1", {})
+    assert created and new_id != job_id
+
+
+def test_failed_job_retried_after_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "retry_delay", lambda attempts: 0.0)
+    q = _queue(tmp_path)
+    q.enqueue("extract", "e1", {}, max_attempts=2)
+
+    first = q.claim("extract")
+    assert first.attempts == 1 and not first.final_attempt
+    assert q.fail(first, "timeout") is True
+
+    second = q.claim("extract")
+    assert second.id == first.id and second.attempts == 2 and second.final_attempt
+    assert q.fail(second, "timeout again") is False
+    assert q.claim("extract") is None
+    assert q.stats()["extract"]["failed"] == 1
+
+
+def test_retry_waits_for_run_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "retry_delay", lambda attempts: 3600.0)
+    q = _queue(tmp_path)
+    q.enqueue("extract", "e1", {}, max_attempts=3)
+    assert q.fail(q.claim("extract"), "boom") is True
+    assert q.claim("extract") is None
+    assert q.stats()["extract"]["queued"] == 1
+
+
+def test_retry_delay_is_capped_exponential():
+    for attempts in range(1, 10):
+        cap = min(job_queue.RETRY_MAX_DELAY, job_queue.RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        assert cap / 2 <= job_queue.retry_delay(attempts) <= cap
+
+
+def test_recover_after_restart(tmp_path):
+    q = _queue(tmp_path)
+    q.enqueue("extract", "e1", {}, max_attempts=3)
+    q.enqueue("enter", "p1", {"proposal_id": "p1"}, max_attempts=1)
+    extract_job, enter_job = q.claim("extract"), q.claim("enter")
+    assert extract_job and enter_job
+
+    # Process dies with both running; a new one opens the same file
+    restarted = _queue(tmp_path)
+    lost = restarted.recover()
+
+    assert [job.key for job in lost] == ["p1"]  # no attempts left: failed, not re-run
+    again = restarted.claim("extract")
+    assert again.id == extract_job.id and again.attempts == 2
+    assert restarted.claim("enter") is None
+    assert restarted.stats()["enter"]["failed"] == 1
@@ -0,0 +1,23 @@
+import asyncio
+import json
+
+import reference_data
+import webflor_mcp_server
+
+
+def test_item_mappings_batch_keyed_by_input_spelling(tmp_path, monkeypatch):
+    (tmp_path / "item_mappings.csv").write_text(
+        "item_code,IdEmpaque,empaque_name\n"
+        "CBD01794,1028,Carnation fcy Mixed\n"
+        "CBD13451,15380,Carnation fcy white Polar Route\n"
+        "CBD13451,15381,Carnation fcy white Halo\n"
+    )
+    monkeypatch.setattr(reference_data, "DATA_DIR", str(tmp_path))
+    codes = ["cbd01794", "CBD01794 ", "CBD13451", "CBD99999"]
+    results = json.loads(asyncio.run(webflor_mcp_server.lookup_item_mappings_batch(codes)))
+
+    assert list(results) == codes
+    assert [r["IdEmpaque"] for r in results["cbd01794"]] == ["1028"]
+    assert results["CBD01794 "] == results["cbd01794"]
+    assert len(results["CBD13451"]) == 2
+    assert results["CBD99999"] == []
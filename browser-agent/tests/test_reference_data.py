@@ -0,0 +1,101 @@
+import json
+
+import reference_data
+from reference_data import CustomerIndex
+
+CUSTOMERS = [
+    {"IdCliente": "101", "Codigo": "FGA", "NomCliente": "Flores La Gaitana S.A.S", "NIT": "900123456-1", "Estado": "A"},
+    {"IdCliente": "102", "Codigo": "GAI", "NomCliente": "Gaitana Imports LLC", "NIT": "", "Estado": "A"},
+    {"IdCliente": "103", "Codigo": "FLM", "NomCliente": "Flores del Monte", "NIT": "800555111", "Estado": "A"},
+    {"IdCliente": "104", "Codigo": "RSX", "NomCliente": "Rosa Express Inc", "NIT": "", "Estado": "A"},
+]
+
+
+def _ids(results: list[dict]) -> list[str]:
+    return [r["IdCliente"] for r in results]
+
+
+def test_all_words_match_in_any_order():
+    index = CustomerIndex(CUSTOMERS)
+    for query in ("flores gaitana", "gaitana flores", "FLORES  GAITANA"):
+        results = index.search(query)
+        assert _ids(results)[0] == "101", query
+        assert results[0]["_match"] == "words"
+
+
+def test_words_match_across_code_and_name():
+    results = CustomerIndex(CUSTOMERS).search("fga gaitana")
+    assert _ids(results)[0] == "101"
+    assert results[0]["_match"] == "words"
+
+
+def test_partial_word_matches_rank_before_fuzzy():
+    results = CustomerIndex(CUSTOMERS).search("flores gaitana miami")
+    partial = [r for r in results if r["_match"] == "partial"]
+    assert _ids(partial)[0] == "101"  # two of three words
+    assert set(_ids(partial)) == {"101", "102", "103"}
+    assert partial[0]["_score"] > partial[-1]["_score"]
+    first_fuzzy = next((i for i, r in enumerate(results) if r["_match"] == "fuzzy"), len(results))
+    assert all(r["_match"] == "partial" for r in results[:first_fuzzy])
+
+
+def test_exact_code_and_name_still_first():
+    index = CustomerIndex(CUSTOMERS)
+    assert index.search("GAI")[0]["IdCliente"] == "102"
+    assert index.search("flores del monte")[0]["_match"] == "name"
+
+
+def test_one_misspelled_word_still_finds_customer():
+    results = CustomerIndex(CUSTOMERS).search("rosa expres")
+    assert _ids(results)[0] == "104"
+
+
+def test_returned_records_are_copies(tmp_path, monkeypatch):
+    (tmp_path / "semanas_test.json").write_text(json.dumps([{"Semana": 1}, {"Semana": 2}]))
+    (tmp_path / "rows_test.csv").write_text("code,name\nA1,Alpha\n")
+    monkeypatch.setattr(reference_data, "DATA_DIR", str(tmp_path))
+
+    reference_data.load_records("semanas_test.json")[0]["Semana"] = 99
+    reference_data.search("semanas_test.json", "Semana", "2")[0].pop("Semana")
+    reference_data.lookup("semanas_test.json", "Semana", "1")[0]["_tag"] = "x"
+    reference_data.load_csv_rows("rows_test.csv")[0]["name"] = "changed"
+
+    assert reference_data.load_records("semanas_test.json") == [{"Semana": 1}, {"Semana": 2}]
+    assert reference_data.load_csv_rows("rows_test.csv") == [{"code": "A1", "name": "Alpha"}]
+
+
+def test_clientes_csv_falls_back_to_script_dir(tmp_path, monkeypatch):
+    script_dir = tmp_path / "script"
+    script_dir.mkdir()
+    (script_dir / "clientes.csv").write_text("IdCliente,Codigo,NomCliente\n101,FGA,Flores La Gaitana\n")
+    monkeypatch.setattr(reference_data, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(reference_data, "_FALLBACK_DIR", str(script_dir))
+    monkeypatch.setattr(reference_data, "_cache", {})
+
+    assert reference_data.exists(reference_data.CLIENTES_FILE)
+    assert _ids(reference_data.search_customers("gaitana", 5)) == ["101"]
+
+
+
+EMPAQUES = [
+    {"IdEmpaque": "1", "NomEmpaque": "Rosa Freedom 50cm", "NomVariedad": "Freedom", "NomProducto": "Rosa"},
+    {"IdEmpaque": "2", "NomEmpaque": "Rosa Explorer 60cm", "NomVariedad": "Explorer", "NomProducto": "Rosa"},
+    {"IdEmpaque": "3", "NomEmpaque": "Bouquet Rosas Mixtas", "NomVariedad": "Surtido", "NomProducto": "Bouquet"},
+    {"IdEmpaque": "4", "NomEmpaque": "Clavel Rojo", "NomVariedad": "Moonlight", "NomProducto": "Clavel"},
+]
+
+
+def test_empaque_keywords_match_exact_prefix_and_infix_tokens():
+    index = reference_data.EmpaqueIndex(EMPAQUES)
+    assert [r["IdEmpaque"] for r in index.search("rosa")] == ["1", "2", "3"]  # rosa / rosa / rosas
+    assert [r["IdEmpaque"] for r in index.search("light")] == ["4"]  # inside moonlight
+    assert [r["IdEmpaque"] for r in index.search("50")] == ["1"]  # short keyword: vocabulary scan
+    assert index.search("rosa clavel") == []
+
+
+def test_empaque_keyword_cache_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(reference_data, "_KEYWORD_CACHE_SIZE", 2)
+    index = reference_data.EmpaqueIndex(EMPAQUES)
+    for keyword in ("rosa", "clavel", "rosa", "freedom"):
+        index._match_keyword(keyword)
+    assert list(index._keyword_cache) == ["rosa", "freedom"]
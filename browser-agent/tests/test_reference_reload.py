@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+import reference_data
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_data, "DATA_DIR", str(tmp_path))
+    # Entries other tests loaded from their own DATA_DIR would all look changed here
+    monkeypatch.setattr(reference_data, "_cache", {})
+    return tmp_path
+
+
+def _write(path, records):
+    path.write_text(json.dumps(records))
+    # Same-size rewrites within one mtime tick must still look different
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_changed_file_is_swapped_in(data_dir):
+    path = data_dir / "reload_changed.json"
+    _write(path, [{"id": 1}])
+    assert reference_data.load_records("reload_changed.json") == [{"id": 1}]
+    before = reference_data.generation()
+
+    assert reference_data.check_for_changes() == before  # untouched file: no rebuild
+    _write(path, [{"id": 1}, {"id": 2}])
+    assert reference_data.check_for_changes() == before + 1
+    assert reference_data.load_records("reload_changed.json") == [{"id": 1}, {"id": 2}]
+    assert reference_data.search("reload_changed.json", "id", "2") == [{"id": 2}]
+
+
+def test_half_written_file_keeps_previous_data(data_dir):
+    path = data_dir / "reload_broken.json"
+    _write(path, [{"id": 1}])
+    reference_data.load_records("reload_broken.json")
+    before = reference_data.generation()
+
+    path.write_text('[{"id": 1}, {"id"')
+    assert reference_data.check_for_changes() == before
+    assert reference_data.load_records("reload_broken.json") == [{"id": 1}]
+
+    _write(path, [{"id": 3}])  # next good write is picked up
+    reference_data.check_for_changes()
+    assert reference_data.load_records("reload_broken.json") == [{"id": 3}]
+
+
+def test_hot_path_checks_at_most_once_per_interval(data_dir, monkeypatch):
+    path = data_dir / "reload_rows.csv"
+    path.write_text("code\nA\n")
+    assert reference_data.load_csv_rows("reload_rows.csv") == [{"code": "A"}]
+
+    monkeypatch.setattr(reference_data, "RELOAD_CHECK_INTERVAL", 3600.0)
+    path.write_text("code\nA\nB\n")
+    assert reference_data.load_csv_rows("reload_rows.csv") == [{"code": "A"}]  # not re-stat'ed yet
+
+    monkeypatch.setattr(reference_data, "RELOAD_CHECK_INTERVAL", 0.0)
+    assert reference_data.load_csv_rows("reload_rows.csv") == [{"code": "A"}, {"code": "B"}]
+
+
+def test_deleted_file_reads_as_missing(data_dir):
+    path = data_dir / "reload_deleted.json"
+    _write(path, [{"id": 1}])
+    reference_data.load_records("reload_deleted.json")
+    path.unlink()
+    reference_data.check_for_changes()
+    assert reference_data.load_records("reload_deleted.json") == []
+    assert not reference_data.exists("reload_deleted.json")
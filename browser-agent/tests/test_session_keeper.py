@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import httpx
+
+# orchestrator builds its Supabase client at import; the tests never call it
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test-key")
+
+import orchestrator  # noqa: E402
+import webflor_auth  # noqa: E402
+from orchestrator import SessionKeeper  # noqa: E402
+
+
+def test_ensure_login_never_blocks_and_refreshes_once(monkeypatch):
+    keeper = SessionKeeper()
+    monkeypatch.setattr(orchestrator, "_session_keeper", keeper)
+    # record_valid() publishes the cookies — keep that out of the other tests
+    monkeypatch.setenv("WEBFLOR_COOKIES", "")
+    monkeypatch.setattr(webflor_auth, "_session_cookies", "")
+    checks, release = [], asyncio.Event()
+
+    async def fake_check():
+        checks.append(1)
+        await release.wait()
+
+    monkeypatch.setattr(keeper, "check", fake_check)
+
+    async def main():
+        # No known-good session: answered at once, one background pass for both calls
+        assert orchestrator._ensure_login() is False
+        assert orchestrator._ensure_login() is False
+        await asyncio.sleep(0)
+        assert checks == [1]
+        release.set()
+        await keeper._refresh_task
+
+        keeper.record_valid("ASP.NET_SessionId=ok")
+        assert orchestrator._ensure_login() is True
+        assert checks == [1]
+
+    asyncio.run(main())
+
+
+def test_ping_uses_pooled_client():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.headers["cookie"])
+        return httpx.Response(302 if len(seen) > 1 else 200, headers={"location": "/login"})
+
+    keeper = SessionKeeper()
+    keeper.cookies = "ASP.NET_SessionId=abc"
+    webflor_auth.set_transport(httpx.MockTransport(handler))
+
+    async def main():
+        alive = await keeper._ping()
+        client = webflor_auth._get_http_client()
+        dead = await keeper._ping()
+        return alive, dead, webflor_auth._get_http_client() is client
+
+    try:
+        assert asyncio.run(main()) == (True, False, True)
+        assert seen == ["ASP.NET_SessionId=abc"] * 2
+    finally:
+        webflor_auth.set_transport(None)
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+# orchestrator builds its Supabase client at import; the tests never call it
+os.environ.setdefault("SUPABASE_SECRET_KEY", "test-key")
+
+import orchestrator  # noqa: E402
+from orchestrator import StatusPipeline  # noqa: E402
+
+
+def _record_writes(monkeypatch, delay: float = 0.0) -> list[tuple[str, dict, float]]:
+    writes, lock = [], threading.Lock()
+
+    def fake_update(proposal_id: str, updates: dict):
+        time.sleep(delay)
+        with lock:
+            writes.append((proposal_id, dict(updates), time.monotonic()))
+
+    monkeypatch.setattr(orchestrator, "_update_proposal_tags", fake_update)
+    return writes
+
+
+def test_updates_coalesce_to_bounded_writes(monkeypatch):
+    writes = _record_writes(monkeypatch)
+    pipeline = StatusPipeline(min_interval=0.2)
+    for step in range(50):
+        pipeline.publish("p1", {"step": step, f"seen_{step % 3}": True})
+    pipeline.flush("p1")
+
+    assert 1 <= len(writes) <= 3
+    merged = {}
+    for _, updates, _ in writes:
+        merged.update(updates)
+    assert merged == {"step": 49, "seen_0": True, "seen_1": True, "seen_2": True}
+
+
+def test_writes_per_proposal_respect_min_interval(monkeypatch):
+    writes = _record_writes(monkeypatch)
+    pipeline = StatusPipeline(min_interval=0.15)
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        pipeline.publish("p1", {"at": time.monotonic()})
+        time.sleep(0.01)
+    pipeline.flush("p1")
+
+    times = [t for pid, _, t in writes if pid == "p1"]
+    gaps = [b - a for a, b in zip(times, times[1:-1])]  # the final flush may jump the interval
+    assert all(gap >= 0.14 for gap in gaps)
+    assert len(times) <= 6
+
+
+def test_flush_writes_now_and_waits(monkeypatch):
+    writes = _record_writes(monkeypatch, delay=0.05)
+    pipeline = StatusPipeline(min_interval=10.0)
+    pipeline.publish("p1", {"status": "running"})
+    pipeline.flush("p1")
+    pipeline.flush("p1", {"status": "done"})  # within min_interval of the first write
+
+    assert [u["status"] for _, u, _ in writes] == ["running", "done"]
+
+
+def test_proposals_are_throttled_independently(monkeypatch):
+    writes = _record_writes(monkeypatch)
+    pipeline = StatusPipeline(min_interval=10.0)
+    pipeline.flush("p1", {"n": 1})
+    pipeline.flush("p2", {"n": 2})
+    assert [pid for pid, _, _ in writes] == ["p1", "p2"]
+
+
+def test_flush_without_pending_returns_immediately(monkeypatch):
+    writes = _record_writes(monkeypatch)
+    started = time.monotonic()
+    StatusPipeline(min_interval=10.0).flush("p1", timeout=5.0)
+    assert time.monotonic() - started < 1.0
+    assert writes == []
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from deterministic_enter_agent import StepGraph
+
+
+def _step(name: str, delay: float, log: list):
+    async def fn(results: dict):
+        log.append(("start", name, sorted(results)))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return name.upper()
+    return fn
+
+
+def test_steps_wait_for_deps_and_independent_steps_overlap():
+    log = []
+    graph = StepGraph()
+    graph.add("auth", _step("auth", 0.01, log))
+    graph.add("header", _step("header", 0.05, log), deps=("auth",))
+    graph.add("items", _step("items", 0.05, log), deps=("auth",))
+    graph.add("write", _step("write", 0.01, log), deps=("header", "items"))
+    results = asyncio.run(graph.run())
+
+    assert results == {"auth": "AUTH", "header": "HEADER", "items": "ITEMS", "write": "WRITE"}
+    starts = {entry[1]: entry[2] for entry in log if entry[0] == "start"}
+    assert starts["header"] == ["auth"] and starts["items"] == ["auth"]
+    assert starts["write"] == ["auth", "header", "items"]
+    # header and items both started before either finished
+    order = [entry[:2] for entry in log]
+    assert order.index(("start", "items")) < order.index(("end", "header"))
+    t = graph.timings
+    assert t["write"][0] >= max(t["header"][1], t["items"][1])
+
+
+def test_critical_path_follows_slowest_chain():
+    log = []
+    graph = StepGraph()
+    graph.add("auth", _step("auth", 0.01, log))
+    graph.add("fast", _step("fast", 0.01, log), deps=("auth",))
+    graph.add("slow", _step("slow", 0.08, log), deps=("auth",))
+    graph.add("join", _step("join", 0.01, log), deps=("fast", "slow"))
+    graph.add("side", _step("side", 0.02, log), deps=("auth",))
+    asyncio.run(graph.run())
+
+    assert graph.critical_path() == ["auth", "slow", "join"]
+
+
+def test_unknown_dependency_rejected():
+    graph = StepGraph()
+    with pytest.raises(ValueError, match="unknown step 'missing'"):
+        graph.add("a", _step("a", 0, []), deps=("missing",))
+
+
+def test_failure_cancels_remaining_steps():
+    log = []
+
+    async def boom(results):
+        raise RuntimeError("copy failed")
+
+    graph = StepGraph()
+    graph.add("copy", boom)
+    graph.add("slow", _step("slow", 1.0, log))
+    graph.add("after", _step("after", 0, log), deps=("copy",))
+    with pytest.raises(RuntimeError, match="copy failed"):
+        asyncio.run(graph.run())
+    assert ("end", "slow") not in log
+    assert not any(entry[1] == "after" for entry in log)
+
+
+def test_critical_path_empty_before_run():
+    assert StepGraph().critical_path() == []
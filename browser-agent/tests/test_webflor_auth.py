@@ -0,0 +1,238 @@
+import asyncio
+import threading
+
+import httpx
+
+import webflor_auth
+
+
+def _ok_transport() -> httpx.MockTransport:
+    return httpx.MockTransport(lambda request: httpx.Response(200, json=[]))
+
+
+async def _client_after_request() -> httpx.AsyncClient:
+    await webflor_auth._pooled_request("GET", "http://webflor.test/api/ping")
+    return webflor_auth._get_http_client()
+
+
+def test_run_loop_closes_its_client():
+    webflor_auth.set_transport(_ok_transport())
+    try:
+        clients = [webflor_auth.run_loop(_client_after_request()) for _ in range(3)]
+        assert len({id(c) for c in clients}) == 3
+        assert all(c.is_closed for c in clients)
+        assert webflor_auth._http_clients == {}
+    finally:
+        webflor_auth.set_transport(None)
+
+
+def test_concurrent_loops_get_their_own_client():
+    webflor_auth.set_transport(_ok_transport())
+    both_started, clients, still_open = threading.Barrier(2), [], []
+
+    async def worker():
+        client = await _client_after_request()
+        clients.append(client)
+        both_started.wait()
+        # Another loop creating its client didn't replace or close this one
+        still_open.append(webflor_auth._get_http_client() is client and not client.is_closed)
+
+    try:
+        threads = [threading.Thread(target=webflor_auth.run_loop, args=(worker(),)) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert still_open == [True, True]
+        assert clients[0] is not clients[1]
+        assert all(c.is_closed for c in clients)
+    finally:
+        webflor_auth.set_transport(None)
+
+
+def test_set_transport_closes_existing_client():
+    async def main():
+        webflor_auth.set_transport(_ok_transport())
+        old = await _client_after_request()
+        webflor_auth.set_transport(_ok_transport())
+        await asyncio.sleep(0)
+        assert old.is_closed
+        assert await _client_after_request() is not old
+
+    try:
+        asyncio.run(main())
+    finally:
+        webflor_auth.set_transport(None)
+
+
+def test_prewarm_capped_at_keepalive_limit(monkeypatch):
+    monkeypatch.setattr(webflor_auth, "PREWARM_CONNECTIONS", 50)
+    monkeypatch.setattr(webflor_auth, "POOL_MAX_KEEPALIVE", 3)
+    webflor_auth.set_transport(_ok_transport())
+    try:
+        assert webflor_auth.run_loop(webflor_auth.prewarm_connections()) == 3
+        assert webflor_auth.run_loop(webflor_auth.prewarm_connections(10)) == 3
+    finally:
+        webflor_auth.set_transport(None)
+
+
+def test_pool_stats_degrade_without_pool_internals():
+    async def main():
+        await _client_after_request()
+        return webflor_auth.pool_stats()
+
+    webflor_auth.set_transport(_ok_transport())
+    try:
+        stats = webflor_auth.run_loop(main())
+    finally:
+        webflor_auth.set_transport(None)
+    # MockTransport has no httpcore pool: counts unknown, everything else still reported
+    assert stats["connections"] is None and stats["idle"] is None
+    assert stats["requests"] > 0
+
+
+def test_limiter_grows_additively_and_halves_on_overload(monkeypatch):
+    monkeypatch.setattr(webflor_auth, "DECREASE_COOLDOWN", 0.0)
+    limiter = webflor_auth.AdaptiveLimiter(initial=4, min_limit=2, max_limit=6)
+
+    async def call(latency: float, overloaded: bool = False):
+        await limiter.acquire()
+        limiter.release("GET x", latency, overloaded)
+
+    async def main():
+        for _ in range(4):
+            await call(0.1)
+        assert 4.9 < limiter.limit < 5.0  # ~ +1 per window of `limit` fast calls
+        await call(0.1, overloaded=True)
+        assert 2.4 < limiter.limit < 2.5
+        await call(0.1, overloaded=True)
+        await call(0.1, overloaded=True)
+        assert limiter.limit == 2  # floor
+        for _ in range(100):
+            await call(0.1)
+        assert limiter.limit == 6  # ceiling
+        await call(0.5)  # 5x the endpoint's average: congestion, gentle decrease
+        assert limiter.limit == 6 * 0.9
+
+    asyncio.run(main())
+    assert limiter.decreases == 4
+
+
+def test_limiter_caps_requests_in_flight():
+    limiter = webflor_auth.AdaptiveLimiter(initial=3, min_limit=1, max_limit=3)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        await limiter.acquire()
+        peak = max(peak, limiter.in_flight)
+        await asyncio.sleep(0.01)
+        limiter.release("GET x", 0.01)
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(20)))
+
+    asyncio.run(main())
+    assert peak == 3 and limiter.in_flight == 0
+
+
+def test_retries_idempotent_requests_on_503(monkeypatch):
+    monkeypatch.setattr(webflor_auth, "_retry_delay", lambda attempt: 0.0)
+    statuses = iter([503, 503, 200])
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.method)
+        return httpx.Response(next(statuses) if request.method == "GET" else 503, json=[])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(webflor_auth, "_get_http_client", lambda: client)
+    assert asyncio.run(webflor_auth._send_with_retries("GET", "/api/ping")).status_code == 200
+    assert sent == ["GET"] * 3
+    sent.clear()
+    # POST creates rows — a 503 after it reached the server is not replayed
+    assert asyncio.run(webflor_auth._send_with_retries("POST", "/api/copy")).status_code == 503
+    assert sent == ["POST"]
+
+
+def test_each_loop_gets_its_own_limiter():
+    async def slow(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.005)
+        return httpx.Response(200, json=[])
+
+    webflor_auth.set_transport(httpx.MockTransport(slow))
+    limiters, errors = [], []
+
+    async def burst():
+        limiters.append(webflor_auth._get_limiter())
+        # More requests than the limit, so some wait on the limiter's futures
+        await asyncio.gather(*(webflor_auth._send_with_retries("GET", f"/api/{i}") for i in range(40)))
+
+    def worker():
+        try:
+            asyncio.run(asyncio.wait_for(burst(), 10))
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        webflor_auth.set_transport(None)
+    assert errors == []
+    assert len({id(lim) for lim in limiters}) == 3
+    assert all(lim.in_flight == 0 for lim in limiters)
+
+
+def test_one_login_for_callers_on_two_loops(monkeypatch):
+    logins = []
+
+    async def fake_login() -> str:
+        logins.append(threading.get_ident())
+        await asyncio.sleep(0.2)
+        return "fresh=1"
+
+    monkeypatch.setattr(webflor_auth, "_run_login_async", fake_login)
+    monkeypatch.setattr(webflor_auth, "_session_cookies", "")
+    monkeypatch.setattr(webflor_auth, "_session_listeners", [])
+    both_ready, results = threading.Barrier(2), []
+
+    def worker():
+        both_ready.wait()
+        results.append(asyncio.run(webflor_auth.refresh_session()))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == ["fresh=1", "fresh=1"]
+    assert len(logins) == 1
+    assert webflor_auth._refresh_flight is None
+
+
+def test_login_failure_reaches_waiters_on_other_loops(monkeypatch):
+    async def failing_login() -> str:
+        await asyncio.sleep(0.2)
+        raise RuntimeError("bad credentials")
+
+    monkeypatch.setattr(webflor_auth, "_run_login_async", failing_login)
+    monkeypatch.setattr(webflor_auth, "_session_cookies", "")
+    both_ready, errors = threading.Barrier(2), []
+
+    def worker():
+        both_ready.wait()
+        try:
+            asyncio.run(webflor_auth.refresh_session())
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert errors == ["bad credentials", "bad credentials"]
@@ -18,7 +18,6 @@ import asyncio
 import json
 import logging
 import os
-import sys
 import time
 from datetime import datetime
 
@@ -78,9 +77,10 @@ ERP_TOOL_NAMES = [
         # Reference order lookups
         "list_recent_orders", "get_order_with_items",
         # Live API lookups (returns authoritative data)
-        "lookup_marca_box_info", "lookup_client_product_ficha", "lookup_empaque_details",
+        "lookup_marca_box_info", "lookup_client_product_ficha", "lookup_client_product_ficha_batch",
+        "lookup_empaque_details",
         # Cached local lookups (no API calls)
-        "search_empaques", "search_farms", "search_box_marks", "search_box_types",
+        "search_empaques", "search_empaques_batch", "lookup_cached_empaques", "search_farms", "search_box_marks", "search_box_types",
         "search_box_dimensions", "search_compositions", "search_varieties",
         "search_products", "search_picklists", "search_cached_file",
         # Spec sheets & active varieties
@@ -152,7 +152,8 @@ STEP 4-CREATE: Look up IDs needed for items.
 
    4a) From cached data (no API calls):
    - search_farms: find IdFinca by farm name from the order (e.g. "Gaitana").
-   - search_empaques: find each item's empaque by name (e.g. "Carnation fcy Mixed").
+   - search_empaques_batch: find every item's empaque by name in one call
+     (e.g. ["Carnation fcy Mixed", "Bouquet Unico Mixed"]).
      Returns IdEmpaque and IdProducto. IdProducto is needed for the ficha call in 4b.
 
    4b) Look up picklist IDs:
@@ -161,7 +162,8 @@ STEP 4-CREATE: Look up IDs needed for items.
 
    4c) Live API lookups (2 calls, reuse results across items with same product/marca):
    1. lookup_client_product_ficha(client_id, product_id):
-      - Call once per unique IdProducto (from search_empaques).
+      - Call once per unique IdProducto (from search_empaques), or use
+        lookup_client_product_ficha_batch(client_id, product_ids) to fetch them all in one call.
       - Returns: PickTipoCorte, PickTipoPrecio, default PickMarcaCaja.
       - This is the ONLY source for PickTipoCorte — NEVER hardcode it.
       - PickTipoPrecio from the ficha is only a DEFAULT. If the order file specifies
@@ -221,6 +223,7 @@ Be concise. Execute ALL steps and report."""
 
 async def run_agent(initial_task: str | None = None, file_path: str | None = None):
     from claude_agent_sdk import query, ClaudeAgentOptions
+    from mcp_client_config import erp_mcp_server_config
 
     # Build the prompt
     if file_path:
@@ -243,31 +246,12 @@ async def run_agent(initial_task: str | None = None, file_path: str | None = Non
     # Use browser-agent dir as cwd
     agent_cwd = os.path.dirname(os.path.abspath(__file__))
 
-    # Path to the standalone MCP server
-    mcp_server_script = os.path.join(agent_cwd, "webflor_mcp_server.py")
-
     options = ClaudeAgentOptions(
         system_prompt=WEBFLOR_AGENT_PROMPT,
         allowed_tools=["Read", "Glob", "Grep"] + ERP_TOOL_NAMES,
         permission_mode="acceptEdits",
         cwd=agent_cwd,
-        mcp_servers={
-            "erp": {
-                "type": "stdio",
-                "command": sys.executable,
-                "args": [mcp_server_script],
-                "env": {
-                    # Pass through relevant env vars to the subprocess
-                    "WEBFLOR_BASE_URL": os.getenv("WEBFLOR_BASE_URL", ""),
-                    "WEBFLOR_COOKIES": os.getenv("WEBFLOR_COOKIES", ""),
-                    "SUPABASE_URL": os.getenv("SUPABASE_URL", ""),
-                    "SUPABASE_SECRET_KEY": os.getenv("SUPABASE_SECRET_KEY", ""),
-                    "ORGANIZATION_ID": os.getenv("ORGANIZATION_ID", ""),
-                    "DATA_DIR": os.getenv("DATA_DIR", ""),
-                    "PATH": os.getenv("PATH", ""),
-                },
-            }
-        },
+        mcp_servers={"erp": erp_mcp_server_config()},
     )
 
     # Set up file logging
@@ -15,7 +15,6 @@ import asyncio
 import json
 import logging
 import os
-import sys
 import time
 from datetime import datetime
 
@@ -138,6 +137,7 @@ Be concise. Execute all steps."""
 
 async def run_agent(initial_task: str | None = None, file_path: str | None = None):
     from claude_agent_sdk import query, ClaudeAgentOptions
+    from mcp_client_config import erp_mcp_server_config
 
     if file_path:
         abs_path = os.path.abspath(file_path)
@@ -157,7 +157,6 @@ async def run_agent(initial_task: str | None = None, file_path: str | None = Non
             return
 
     agent_cwd = os.path.dirname(os.path.abspath(__file__))
-    mcp_server_script = os.path.join(agent_cwd, "webflor_mcp_server.py")
 
     options = ClaudeAgentOptions(
         model="claude-haiku-4-5",
@@ -165,22 +164,7 @@ async def run_agent(initial_task: str | None = None, file_path: str | None = Non
         allowed_tools=["Read", "Glob", "Grep"] + ERP_TOOL_NAMES,
         permission_mode="acceptEdits",
         cwd=agent_cwd,
-        mcp_servers={
-            "erp": {
-                "type": "stdio",
-                "command": sys.executable,
-                "args": [mcp_server_script],
-                "env": {
-                    "WEBFLOR_BASE_URL": os.getenv("WEBFLOR_BASE_URL", ""),
-                    "WEBFLOR_COOKIES": os.getenv("WEBFLOR_COOKIES", ""),
-                    "SUPABASE_URL": os.getenv("SUPABASE_URL", ""),
-                    "SUPABASE_SECRET_KEY": os.getenv("SUPABASE_SECRET_KEY", ""),
-                    "ORGANIZATION_ID": os.getenv("ORGANIZATION_ID", ""),
-                    "DATA_DIR": os.getenv("DATA_DIR", ""),
-                    "PATH": os.getenv("PATH", ""),
-                },
-            }
-        },
+        mcp_servers={"erp": erp_mcp_server_config()},
     )
 
     run_name = os.path.splitext(os.path.basename(file_path))[0] if file_path else "task"
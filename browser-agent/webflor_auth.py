@@ -3,16 +3,22 @@ Shared WebFlor authentication and HTTP client.
 
 Loads session cookies from: Supabase user_tokens → .env → login.py (fallback).
 Provides webflor_fetch() for making authenticated API calls.
-Used by both the MCP server and the deterministic enter agent.
+Used by the MCP server, the deterministic enter agent and the Chainlit app in chat-app/.
 """
 
 import asyncio
+import concurrent.futures
 import json
 import logging
 import os
+import random
 import subprocess
 import sys
-from typing import Any
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Coroutine
 from urllib.parse import urlparse
 
 import httpx
@@ -33,14 +39,400 @@ ORGANIZATION_ID = os.getenv("ORGANIZATION_ID", "")
 # ─── State ───────────────────────────────────────────────────────────────
 
 _session_cookies: str = os.getenv("WEBFLOR_COOKIES", "")
-_http_client: httpx.AsyncClient | None = None
+# The login in progress, shared by every caller that needs fresh cookies
+# (a concurrent Future: callers on other threads' loops wait for it too)
+_refresh_flight: concurrent.futures.Future | None = None
+_refresh_lock = threading.Lock()
+# One pooled client per event loop (orchestrator workers each run their own, see run_loop)
+_http_clients: dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+_background_tasks: set[asyncio.Task] = set()
+# Replaces the network for every request when set (see set_transport)
+_transport: httpx.AsyncBaseTransport | None = None
+
+# ─── Connection Pool ─────────────────────────────────────────────────────
+# The ERP is slow and far away: reuse connections, keep them alive just under
+# IIS's 120s idle timeout, and fail fast on connect/pool waits instead of
+# sharing one 600s timeout. Writes (copiarPedido, actualizarOrden, ...) get a
+# longer read timeout than lookups.
+
+POOL_MAX_CONNECTIONS = int(os.getenv("WEBFLOR_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("WEBFLOR_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("WEBFLOR_KEEPALIVE_EXPIRY", "100"))
+HTTP2_ENABLED = os.getenv("WEBFLOR_HTTP2", "") == "1"
+PREWARM_CONNECTIONS = int(os.getenv("WEBFLOR_PREWARM_CONNECTIONS", "4"))
+
+READ_TIMEOUT = httpx.Timeout(
+    connect=float(os.getenv("WEBFLOR_CONNECT_TIMEOUT", "10")),
+    read=float(os.getenv("WEBFLOR_READ_TIMEOUT", "120")),
+    write=30.0,
+    pool=float(os.getenv("WEBFLOR_POOL_TIMEOUT", "30")),
+)
+WRITE_TIMEOUT = httpx.Timeout(
+    connect=READ_TIMEOUT.connect,
+    read=float(os.getenv("WEBFLOR_WRITE_READ_TIMEOUT", "600")),
+    write=60.0,
+    pool=READ_TIMEOUT.pool,
+)
+
+_pool_metrics = {
+    "requests": 0, "in_flight": 0, "new_connections": 0,
+    "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+}
+
+
+def _close_client(loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient):
+    """Close `client` on the loop that owns its connections."""
+    if loop.is_closed():
+        return
+    coro = client.aclose()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if loop is running:
+        task = loop.create_task(coro)
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    else:
+        asyncio.run_coroutine_threadsafe(coro, loop)
 
 
 def _get_http_client() -> httpx.AsyncClient:
-    global _http_client
-    if _http_client is None:
-        _http_client = httpx.AsyncClient(timeout=600.0)
-    return _http_client
+    """The shared client for the running event loop (pooled connections can't cross loops).
+
+    Each loop gets its own client. Short-lived loops should close theirs with
+    close_http_client() before they end — run_loop() does it for them.
+    """
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        for old_loop in [old for old in _http_clients if old.is_closed()]:
+            # Ended without close_http_client() — its sockets went with the loop
+            _http_clients.pop(old_loop, None)
+        http2 = HTTP2_ENABLED
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("WEBFLOR_HTTP2=1 but the 'h2' package is not installed — using HTTP/1.1")
+                http2 = False
+        client = httpx.AsyncClient(
+            timeout=READ_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            http2=http2,
+            transport=_transport,
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """Close the running loop's pooled client; the next request on this loop opens a new one."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def run_loop(main: Coroutine) -> Any:
+    """asyncio.run(main), closing the loop's pooled client before the loop goes away."""
+    async def run_and_close():
+        try:
+            return await main
+        finally:
+            await close_http_client()
+
+    return asyncio.run(run_and_close())
+
+
+def set_transport(transport: httpx.AsyncBaseTransport | None):
+    """Route all WebFlor requests through `transport` (e.g. the webflor_replay stand-in); None restores the network."""
+    global _transport
+    _transport = transport
+    # Existing clients still point at the old transport — close them, new ones are made on demand
+    for loop, client in list(_http_clients.items()):
+        _http_clients.pop(loop, None)
+        _close_client(loop, client)
+
+
+def _pool_trace():
+    """httpcore trace hook that records how long a request waited for a pooled connection."""
+    started = time.monotonic()
+    waited = False
+
+    async def trace(event_name: str, info: dict):
+        nonlocal waited
+        if event_name == "connection.connect_tcp.complete":
+            _pool_metrics["new_connections"] += 1
+        if not waited and event_name.startswith(("connection.", "http11.", "http2.")):
+            waited = True
+            wait_ms = (time.monotonic() - started) * 1000
+            _pool_metrics["wait_ms_total"] += wait_ms
+            _pool_metrics["wait_ms_max"] = max(_pool_metrics["wait_ms_max"], wait_ms)
+
+    return trace
+
+
+async def _pooled_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """client.request with the per-method timeout and pool metrics."""
+    kwargs.setdefault("timeout", READ_TIMEOUT if method in ("GET", "HEAD") else WRITE_TIMEOUT)
+    _pool_metrics["requests"] += 1
+    _pool_metrics["in_flight"] += 1
+    try:
+        return await _get_http_client().request(method, url, extensions={"trace": _pool_trace()}, **kwargs)
+    finally:
+        _pool_metrics["in_flight"] -= 1
+
+
+def _pool_connections() -> tuple[int, int] | None:
+    """(open, idle) connections across the per-loop pools, or None if httpcore's pool can't be read.
+
+    httpx exposes no pool API, so this reads the private client._transport._pool
+    (httpcore.AsyncConnectionPool). If a release renames or reshapes it the
+    counts are reported as unknown rather than failing the stats call.
+    """
+    opened = idle = 0
+    try:
+        for client in list(_http_clients.values()):
+            connections = list(client._transport._pool.connections)
+            opened += len(connections)
+            idle += sum(1 for c in connections if c.is_idle())
+    except (AttributeError, TypeError):
+        return None
+    return opened, idle
+
+
+def pool_stats() -> dict:
+    """Connection pool snapshot: in-use / idle connections, reuse and pool wait times."""
+    counts = _pool_connections()
+    requests = _pool_metrics["requests"]
+    return {
+        "connections": counts[0] if counts else None,
+        "in_use": counts[0] - counts[1] if counts else None,
+        "idle": counts[1] if counts else None,
+        "in_flight_requests": _pool_metrics["in_flight"],
+        "requests": requests,
+        "new_connections": _pool_metrics["new_connections"],
+        "wait_ms_avg": round(_pool_metrics["wait_ms_total"] / requests, 1) if requests else 0.0,
+        "wait_ms_max": round(_pool_metrics["wait_ms_max"], 1),
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive": POOL_MAX_KEEPALIVE,
+        "keepalive_expiry": KEEPALIVE_EXPIRY,
+    }
+
+
+async def prewarm_connections(count: int | None = None) -> int:
+    """Open `count` keep-alive connections to the ERP ahead of the first real call. Returns how many succeeded."""
+    # More than the keep-alive limit would just be closed again after the warm-up
+    count = min(PREWARM_CONNECTIONS if count is None else count, POOL_MAX_KEEPALIVE)
+    if count <= 0:
+        return 0
+    timeout = httpx.Timeout(READ_TIMEOUT.connect, read=READ_TIMEOUT.connect)
+    results = await asyncio.gather(
+        *(_pooled_request("HEAD", f"{API_BASE_URL}/", timeout=timeout, follow_redirects=False) for _ in range(count)),
+        return_exceptions=True,
+    )
+    warmed = sum(1 for r in results if isinstance(r, httpx.Response))
+    logger.info(f"Pre-warmed {warmed}/{count} WebFlor connections")
+    return warmed
+
+
+# ─── Adaptive Concurrency & Retries ──────────────────────────────────────
+# Bulk entry fires dozens of PUTs at once. Every webflor_fetch attempt takes a
+# slot from a shared AIMD limiter: the limit grows by ~1 per window of fast
+# responses and shrinks multiplicatively when an endpoint's latency jumps
+# well above its running average or the ERP answers 5xx / times out.
+
+MIN_CONCURRENCY = int(os.getenv("WEBFLOR_MIN_CONCURRENCY", "2"))
+MAX_CONCURRENCY = int(os.getenv("WEBFLOR_MAX_CONCURRENCY", "16"))
+INITIAL_CONCURRENCY = int(os.getenv("WEBFLOR_INITIAL_CONCURRENCY", "6"))
+# A response slower than this multiple of its endpoint's average counts as congestion
+LATENCY_TOLERANCE = 2.0
+# At most one decrease per cooldown, so one burst of slow responses halves once
+DECREASE_COOLDOWN = 1.0
+
+MAX_RETRIES = int(os.getenv("WEBFLOR_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+# WebFlor PUTs send the full object, so replaying one is harmless. POST
+# (copiarPedido, agregar*) creates rows and DELETE of an already-deleted item
+# errors — those are only retried when the request never reached the server.
+RETRY_METHODS = {"GET", "HEAD", "OPTIONS", "PUT"}
+RETRY_STATUSES = {502, 503, 504}
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by every webflor_fetch call on one event loop.
+
+    Not thread-safe: waiters are futures of the loop that created them, so each
+    loop gets its own limiter (see _get_limiter).
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int):
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self._waiters: list[asyncio.Future] = []
+        self._latency: dict[str, float] = {}
+        self._last_decrease = 0.0
+        self.decreases = 0
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, key: str, latency: float | None, overloaded: bool = False):
+        """Free a slot. `latency` None means no signal (cancelled); `overloaded` is a 5xx/timeout."""
+        self.in_flight -= 1
+        if latency is not None:
+            average = self._latency.get(key)
+            slow = average is not None and latency > average * LATENCY_TOLERANCE
+            self._latency[key] = latency if average is None else average * 0.9 + latency * 0.1
+            if overloaded or slow:
+                self._decrease(0.5 if overloaded else 0.9)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+        self.decreases += 1
+        logger.info(f"WebFlor concurrency limit → {self.limit:.1f}")
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        for waiter in self._waiters[:max(free, 0)]:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+# One limiter per event loop (the orchestrator's, the login thread's, each pool
+# worker's asyncio.run). Each adapts to the ERP's latency on its own; a loop's
+# limiter goes away with the loop.
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AdaptiveLimiter]" = weakref.WeakKeyDictionary()
+_limiters_lock = threading.Lock()
+
+
+def _get_limiter() -> AdaptiveLimiter:
+    """The running loop's limiter, created on first use."""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(loop)
+            if limiter is None:
+                limiter = AdaptiveLimiter(INITIAL_CONCURRENCY, MIN_CONCURRENCY, MAX_CONCURRENCY)
+                _limiters[loop] = limiter
+    return limiter
+
+# "METHOD endpoint" → counters
+_site_metrics: dict[str, dict] = {}
+
+
+def _record_call(site: str, latency: float, status: int, error: str | None = None):
+    m = _site_metrics.setdefault(site, {
+        "calls": 0, "errors": 0, "timeouts": 0, "retries": 0, "latency_total": 0.0, "latency_max": 0.0,
+    })
+    m["calls"] += 1
+    m["latency_total"] += latency
+    m["latency_max"] = max(m["latency_max"], latency)
+    if error == "timeout":
+        m["timeouts"] += 1
+    if error or status >= 500:
+        m["errors"] += 1
+
+
+def _retry_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def limiter_stats() -> dict:
+    """Current concurrency limit plus per-call-site counters and latencies."""
+    sites = {}
+    for site, m in sorted(_site_metrics.items()):
+        sites[site] = {
+            "calls": m["calls"],
+            "errors": m["errors"],
+            "timeouts": m["timeouts"],
+            "retries": m["retries"],
+            "latency_avg": round(m["latency_total"] / m["calls"], 3) if m["calls"] else 0.0,
+            "latency_max": round(m["latency_max"], 3),
+        }
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    try:
+        current = _limiters.get(asyncio.get_running_loop())
+    except RuntimeError:
+        current = None
+    # The calling loop's limit; from outside a loop, the tightest one
+    limit = current.limit if current else min((lim.limit for lim in limiters), default=float(INITIAL_CONCURRENCY))
+    return {
+        "limit": round(limit, 2),
+        "loops": len(limiters),
+        "in_flight": sum(lim.in_flight for lim in limiters),
+        "waiting": sum(len(lim._waiters) for lim in limiters),
+        "decreases": sum(lim.decreases for lim in limiters),
+        "sites": sites,
+    }
+
+
+async def _send_with_retries(method: str, path: str, **kwargs) -> httpx.Response:
+    """One logical request: limiter slot per attempt, backoff between retryable failures."""
+    site = f"{method} {path.rstrip('/').rsplit('/', 1)[-1]}"
+    limiter = _get_limiter()
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        started = time.monotonic()
+        resp: httpx.Response | None = None
+        error: Exception | None = None
+        try:
+            resp = await _pooled_request(method, f"{API_BASE_URL}{path}", **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            latency = time.monotonic() - started
+            if resp is None and error is None:
+                limiter.release(path, None)  # cancelled
+            else:
+                overloaded = isinstance(error, httpx.TimeoutException) or (resp is not None and resp.status_code >= 500)
+                limiter.release(path, latency, overloaded)
+
+        _record_call(
+            site, latency, resp.status_code if resp is not None else 0,
+            "timeout" if isinstance(error, httpx.TimeoutException) else ("error" if error else None),
+        )
+        if error is not None:
+            retryable = method in RETRY_METHODS or isinstance(error, _NOT_SENT_ERRORS)
+        else:
+            retryable = method in RETRY_METHODS and resp.status_code in RETRY_STATUSES
+        if not retryable or attempt >= MAX_RETRIES:
+            if error is not None:
+                raise error
+            return resp
+        delay = _retry_delay(attempt)
+        attempt += 1
+        _site_metrics[site]["retries"] += 1
+        reason = f"{type(error).__name__}: {error}" if error else f"HTTP {resp.status_code}"
+        logger.warning(f"WebFlor {site} failed ({reason}) — retry {attempt}/{MAX_RETRIES} in {delay:.1f}s")
+        await asyncio.sleep(delay)
 
 
 # ─── Cookie Sources ──────────────────────────────────────────────────────
@@ -72,7 +464,7 @@ def load_cookies_from_supabase() -> str:
 
 
 def _run_login_script() -> str:
-    """Run login.py to get fresh cookies (saves to both .env and Supabase)."""
+    """Run login.py as a subprocess — fallback when the in-process login service can't be imported."""
     login_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "login.py")
     logger.info("Running login.py for fresh cookies...")
     result = subprocess.run(
@@ -93,8 +485,15 @@ def _run_login_script() -> str:
 
 
 async def _run_login_async() -> str:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, _run_login_script)
+    """Fresh cookies from the warm in-process login service (saved to .env and Supabase too)."""
+    try:
+        import login as login_service
+    except ImportError as e:
+        logger.info(f"Login service unavailable ({e}) — running login.py")
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, _run_login_script)
+    logger.info("Logging in via the login service...")
+    return await login_service.request_login()
 
 
 # ─── Validation ──────────────────────────────────────────────────────────
@@ -104,9 +503,8 @@ async def _validate_cookies(cookies: str) -> bool:
     if not cookies:
         return False
     try:
-        client = _get_http_client()
         url = f"{API_BASE_URL}/WebFlorBasico/API/listarCompaniasActivasSinLogo"
-        resp = await client.get(url, headers={"Cookie": cookies, "Accept": "application/json"}, follow_redirects=False)
+        resp = await _pooled_request("GET", url, headers={"Cookie": cookies, "Accept": "application/json"}, follow_redirects=False)
         if 300 <= resp.status_code < 400 or resp.status_code >= 400:
             return False
         json.loads(resp.text)
@@ -115,16 +513,85 @@ async def _validate_cookies(cookies: str) -> bool:
         return False
 
 
+# ─── Session Listeners ───────────────────────────────────────────────────
+# Let a host process (the orchestrator's session keeper) track the session
+# this module uses: listeners get callback(cookies) whenever a session is seen
+# working — after a login, when stored cookies validate, and on every
+# successful request.
+
+_session_listeners: list = []
+
+
+def add_session_listener(callback):
+    """Call callback(cookies) each time a WebFlor session is seen valid."""
+    _session_listeners.append(callback)
+
+
+def _notify_session_valid(cookies: str):
+    for callback in _session_listeners:
+        try:
+            callback(cookies)
+        except Exception as e:
+            logger.warning(f"Session listener failed: {e}")
+
+
 # ─── Public API ──────────────────────────────────────────────────────────
 
+async def refresh_session(stale_cookies: str | None = None) -> str:
+    """Log in again and return the fresh cookies — at most one login at a time.
+
+    Concurrent callers, on this or any other thread's event loop, wait for the
+    login already in progress. Callers that pass the cookies their failed
+    request used get the current cookies back without a new login if the
+    session was replaced in the meantime, so stragglers that saw the old
+    redirect don't throw away a fresh session.
+    """
+    global _session_cookies, _refresh_flight
+    while True:
+        if stale_cookies is not None and _session_cookies and _session_cookies != stale_cookies:
+            return _session_cookies
+        with _refresh_lock:
+            flight = _refresh_flight
+            leading = flight is None or flight.done()
+            if leading:
+                flight = _refresh_flight = concurrent.futures.Future()
+        if leading:
+            break
+        try:
+            return await asyncio.shield(asyncio.wrap_future(flight))
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise
+            # The leading caller was cancelled mid-login — take over
+
+    try:
+        cookies = await _run_login_async()
+        _session_cookies = cookies
+        _notify_session_valid(cookies)
+        flight.set_result(cookies)
+        return cookies
+    except asyncio.CancelledError:
+        flight.cancel()
+        raise
+    except Exception as e:
+        flight.set_exception(e)
+        raise
+    finally:
+        with _refresh_lock:
+            if _refresh_flight is flight:
+                _refresh_flight = None
+
+
 async def ensure_session() -> str:
     """Ensure a valid WebFlor session. Tries: .env → Supabase → login.py."""
     global _session_cookies
+    observed = _session_cookies
 
     # 1. Try existing cookies from env
     if _session_cookies:
         if await _validate_cookies(_session_cookies):
             logger.info("Session valid (from env).")
+            _notify_session_valid(_session_cookies)
             return _session_cookies
 
     # 2. Try Supabase
@@ -133,11 +600,12 @@ async def ensure_session() -> str:
     if sb_cookies and await _validate_cookies(sb_cookies):
         _session_cookies = sb_cookies
         logger.info("Session valid (from Supabase).")
+        _notify_session_valid(sb_cookies)
         return _session_cookies
 
     # 3. Fall back to login.py
     logger.info("No valid cookies — running login.py...")
-    _session_cookies = await _run_login_async()
+    await refresh_session(stale_cookies=observed)
     logger.info("Session refreshed via login.py.")
     return _session_cookies
 
@@ -153,6 +621,200 @@ def set_session_cookies(cookies: str):
     _session_cookies = cookies
 
 
+# ─── Response Cache ──────────────────────────────────────────────────────
+# Opt-in (WEBFLOR_RESPONSE_CACHE=1 or enable_response_cache()). Only endpoints
+# listed in CACHE_TTLS are stored; every concurrent identical GET shares one
+# in-flight request either way. Entries are keyed by (path, params), tagged
+# with the order/item IDs in their params, and evicted LRU past
+# CACHE_MAX_BYTES of response text. Only this process's writes invalidate
+# entries — writes by other processes or the ERP UI can be served stale for up
+# to an order-scoped TTL, so long-lived servers leave it off by default.
+
+# Endpoint name (last path segment) → TTL in seconds
+CACHE_TTLS: dict[str, float] = {
+    # Reference data — changes rarely
+    "listarCajasMarcaTipoDimension": 3600,
+    "listarFichaClientePorIdClienteIdProducto": 900,
+    "listarClienteSucursalesById": 3600,
+    "listarTipoVenta": 3600,
+    "listarEmpaqueByIdEmpaqueSinImagen": 3600,
+    # Order-scoped — short TTL, invalidated by writes to the same order/item
+    "listarOrdenById": 30,
+    "listarDetalleOrdenByIdPedido": 30,
+    "listarOrdenRecByIdPedidoItem": 30,
+    "listarOrdenFlorById": 30,
+    "seleccionarDatosAdicionales": 30,
+}
+CACHE_MAX_BYTES = int(os.getenv("WEBFLOR_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+_ORDER_KEYS = ("iIdPedido", "IdPedido")
+_ITEM_KEYS = ("iIdPedidoItem", "IdPedidoItem")
+
+_cache_enabled: bool = os.getenv("WEBFLOR_RESPONSE_CACHE", "") == "1"
+# key → (expires_at, json_text, scope tags)
+_response_cache: OrderedDict[tuple, tuple[float, str, frozenset]] = OrderedDict()
+_cache_bytes = 0
+_inflight: dict[tuple, asyncio.Future] = {}
+# Bumped by every write; a GET that overlapped a write doesn't store its result
+_write_epoch = 0
+_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidated": 0, "evicted": 0}
+
+
+def enable_response_cache(enabled: bool = True):
+    """Turn the webflor_fetch response cache on or off (off also clears it)."""
+    global _cache_enabled
+    _cache_enabled = enabled
+    if not enabled:
+        clear_response_cache()
+
+
+def clear_response_cache():
+    global _cache_bytes
+    _response_cache.clear()
+    _cache_bytes = 0
+
+
+def cache_stats() -> dict:
+    """Hit/miss/coalesce counters plus current size of the response cache."""
+    return {
+        **_cache_stats,
+        "enabled": _cache_enabled,
+        "entries": len(_response_cache),
+        "bytes": _cache_bytes,
+    }
+
+
+def _scope_tags(*sources: dict | None) -> frozenset:
+    """("order", id) / ("item", id) tags for the IDs found in params or a body."""
+    tags = set()
+    for source in sources:
+        if not isinstance(source, dict):
+            continue
+        for kind, keys in (("order", _ORDER_KEYS), ("item", _ITEM_KEYS)):
+            for key in keys:
+                if source.get(key) not in (None, "", 0, "0"):
+                    tags.add((kind, str(source[key])))
+    return frozenset(tags)
+
+
+def _drop_entry(key: tuple):
+    global _cache_bytes
+    entry = _response_cache.pop(key, None)
+    if entry:
+        _cache_bytes -= len(entry[1])
+
+
+def _store(key: tuple, ttl: float, text: str, tags: frozenset):
+    global _cache_bytes
+    if len(text) > CACHE_MAX_BYTES:
+        return
+    _drop_entry(key)
+    _response_cache[key] = (time.monotonic() + ttl, text, tags)
+    _cache_bytes += len(text)
+    while _cache_bytes > CACHE_MAX_BYTES:
+        oldest = next(iter(_response_cache))
+        _drop_entry(oldest)
+        _cache_stats["evicted"] += 1
+
+
+def _invalidate_for_write(params: dict | None, body: dict | None):
+    """Drop cached entries for the orders/items a write touches (all scoped entries if it names none)."""
+    global _write_epoch
+    _write_epoch += 1
+    tags = _scope_tags(params, body)
+    stale = [
+        key for key, (_, _, entry_tags) in _response_cache.items()
+        if entry_tags and (not tags or entry_tags & tags)
+    ]
+    for key in stale:
+        _drop_entry(key)
+    _cache_stats["invalidated"] += len(stale)
+
+
+async def _cached_get(path: str, params: dict[str, str] | None) -> Any:
+    key = (path, tuple(sorted((params or {}).items())))
+    entry = _response_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        _response_cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return json.loads(entry[1])
+
+    flight = _inflight.get(key)
+    if flight:
+        _cache_stats["coalesced"] += 1
+        try:
+            return json.loads(await asyncio.shield(flight))
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise
+            # The leading request was cancelled, not us — make our own
+            return await _webflor_request(path, "GET", params)
+
+    _cache_stats["misses"] += 1
+    flight = asyncio.get_running_loop().create_future()
+    _inflight[key] = flight
+    epoch = _write_epoch
+    try:
+        result = await _webflor_request(path, "GET", params)
+        text = json.dumps(result)
+        flight.set_result(text)
+    except asyncio.CancelledError:
+        flight.cancel()
+        raise
+    except Exception as e:
+        flight.set_exception(e)
+        # Followers re-raise; mark retrieved so an unawaited future doesn't warn
+        flight.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+    ttl = CACHE_TTLS.get(path.rstrip("/").rsplit("/", 1)[-1])
+    failed = isinstance(result, dict) and ("_error" in result or "_raw" in result)
+    if ttl and not failed and epoch == _write_epoch:
+        _store(key, ttl, text, _scope_tags(params))
+    return result
+
+
+# ─── Recording ───────────────────────────────────────────────────────────
+# WEBFLOR_RECORD_PATH=<file> (or start_recording()) appends every webflor_fetch
+# round-trip to a JSON-lines file: method, path, params, body, status, latency
+# and response text. Request headers (session cookies) are never written.
+# webflor_replay.py serves these recordings back as a local ERP stand-in.
+
+_record_file = None
+
+
+def start_recording(path: str):
+    """Append webflor_fetch request/response pairs to `path` until stop_recording()."""
+    global _record_file
+    stop_recording()
+    _record_file = open(path, "a", buffering=1)
+    logger.info(f"Recording WebFlor traffic to {path}")
+
+
+def stop_recording():
+    global _record_file
+    if _record_file is not None:
+        _record_file.close()
+        _record_file = None
+
+
+def _record(method: str, path: str, params: dict | None, body: dict | None,
+            resp: httpx.Response, latency: float):
+    if _record_file is None:
+        return
+    _record_file.write(json.dumps({
+        "ts": time.time(), "method": method, "path": path, "params": params, "body": body,
+        "status": resp.status_code, "latency": round(latency, 4),
+        "location": resp.headers.get("location"), "response": resp.text,
+    }, default=str) + "\n")
+
+
+if os.getenv("WEBFLOR_RECORD_PATH"):
+    start_recording(os.environ["WEBFLOR_RECORD_PATH"])
+
+
 # ─── HTTP Client ─────────────────────────────────────────────────────────
 
 def _order_link(order_id: int) -> str:
@@ -165,30 +827,52 @@ async def webflor_fetch(
     method: str = "GET",
     params: dict[str, str] | None = None,
     body: dict | None = None,
+) -> Any:
+    """Make an authenticated HTTP request to WebFlor. Auto-refreshes session on redirect.
+
+    With the response cache enabled, GETs go through _cached_get and writes
+    invalidate the order-scoped entries they touch.
+    """
+    if not _cache_enabled:
+        return await _webflor_request(path, method, params, body)
+    if method == "GET":
+        return await _cached_get(path, params)
+    _invalidate_for_write(params, body)
+    try:
+        return await _webflor_request(path, method, params, body)
+    finally:
+        # Drop anything a concurrent GET stored while the write was in flight
+        _invalidate_for_write(params, body)
+
+
+async def _webflor_request(
+    path: str,
+    method: str = "GET",
+    params: dict[str, str] | None = None,
+    body: dict | None = None,
     _retried: bool = False,
 ) -> Any:
-    """Make an authenticated HTTP request to WebFlor. Auto-refreshes session on redirect."""
-    global _session_cookies
     if not _session_cookies:
         await ensure_session()
 
-    client = _get_http_client()
-    url = f"{API_BASE_URL}{path}"
-    headers = {"Cookie": _session_cookies, "Accept": "application/json"}
+    cookies = _session_cookies
+    headers = {"Cookie": cookies, "Accept": "application/json"}
     if body and method != "GET":
         headers["Content-Type"] = "application/json"
 
     logger.info(f"WebFlor {method} {path}" + (f" params={params}" if params else "") + (f" body_keys={list(body.keys())}" if body else ""))
 
+    started = time.monotonic()
     try:
-        resp = await client.request(
-            method, url, headers=headers, params=params,
+        resp = await _send_with_retries(
+            method, path, headers=headers, params=params,
             content=json.dumps(body) if body else None,
             follow_redirects=False,
         )
     except Exception as e:
         logger.error(f"WebFlor HTTP error for {method} {path}: {e}")
         return {"_error": str(e), "_status": 0}
+    _record(method, path, params, body, resp, time.monotonic() - started)
 
     logger.info(f"WebFlor response: {resp.status_code} ({len(resp.text)} bytes)")
 
@@ -197,8 +881,11 @@ async def webflor_fetch(
         location = resp.headers.get("location", "")
         if "login" in location.lower() or "cerrarsesion" in location.lower():
             logger.warning("Session expired during API call — auto-refreshing...")
-            _session_cookies = await _run_login_async()
-            return await webflor_fetch(path, method, params, body, _retried=True)
+            await refresh_session(stale_cookies=cookies)
+            return await _webflor_request(path, method, params, body, _retried=True)
+
+    if 200 <= resp.status_code < 300:
+        _notify_session_valid(cookies)
 
     if resp.status_code >= 400:
         logger.error(f"HTTP {resp.status_code} from {path}: {resp.text[:500]}")
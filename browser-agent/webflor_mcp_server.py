@@ -10,14 +10,19 @@ Usage (standalone test):
     uv run webflor_mcp_server.py
 
 Used by webflor_agent_sdk.py as a subprocess MCP server.
+
+Long-lived mode (warm caches + session shared by every agent run):
+    MCP_SSE_PORT=8000 uv run webflor_mcp_server.py --sse
+    # agents attach with WEBFLOR_MCP_URL=http://127.0.0.1:8000/sse
 """
 
 import asyncio
-import csv
 import json
 import logging
 import os
 import sys
+import time
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
@@ -34,12 +39,25 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from webflor_auth import (
     ensure_session,
     get_session_cookies,
+    prewarm_connections,
     set_session_cookies,
-    webflor_fetch,
+    webflor_fetch as _webflor_fetch,
     _order_link,
-    _run_login_async,
+    refresh_session as refresh_webflor_session,
 )
 
+
+async def webflor_fetch(path: str, method: str = "GET", params: dict | None = None, body: dict | None = None):
+    """webflor_auth.webflor_fetch that also drops the cached order headers a write may change."""
+    if method == "GET":
+        return await _webflor_fetch(path, method, params, body)
+    _invalidate_order_headers(params, body)
+    try:
+        return await _webflor_fetch(path, method, params, body)
+    finally:
+        # A header fetched while the write was in flight may predate it
+        _invalidate_order_headers(params, body)
+
 # ─── Config ────────────────────────────────────────────────────────────────
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
@@ -49,38 +67,20 @@ ORGANIZATION_ID = os.getenv("ORGANIZATION_ID", "")
 supabase = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY) if SUPABASE_URL and SUPABASE_SECRET_KEY else None
 
 # ─── Cached Data ──────────────────────────────────────────────────────────
+# Files in DATA_DIR are parsed once and indexed in memory by reference_data.
 
-DATA_DIR = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+import reference_data
+from reference_data import DATA_DIR
 
 
 def load_cached_json(filename: str) -> list[dict]:
     """Load a cached JSON/JSONL data file from the data directory."""
-    filepath = os.path.join(DATA_DIR, filename)
-    if not os.path.exists(filepath):
-        return []
-    with open(filepath, "r") as f:
-        try:
-            data = json.load(f)
-            return data if isinstance(data, list) else [data]
-        except json.JSONDecodeError:
-            f.seek(0)
-            first_line = f.readline()
-            data = json.loads(first_line)
-            return data if isinstance(data, list) else [data]
+    return reference_data.load_records(filename)
 
 
 def search_cached_data(filename: str, search_field: str, query: str, max_results: int = 20) -> list[dict]:
     """Search a cached data file by a field value (case-insensitive substring match)."""
-    data = load_cached_json(filename)
-    query_lower = query.lower()
-    results = []
-    for item in data:
-        val = str(item.get(search_field, "")).lower()
-        if query_lower in val:
-            results.append(item)
-            if len(results) >= max_results:
-                break
-    return results
+    return reference_data.search(filename, search_field, query, max_results)
 
 
 
@@ -145,7 +145,14 @@ def load_customers() -> list[dict]:
 
 # ─── MCP Server ───────────────────────────────────────────────────────────
 
-mcp = FastMCP("erp", log_level="WARNING")
+@asynccontextmanager
+async def _lifespan(_server):
+    # Warm the pool on the server's own event loop, not the startup one
+    await prewarm_connections()
+    yield
+
+
+mcp = FastMCP("erp", log_level="WARNING", lifespan=_lifespan)
 
 
 # -- Session tools --
@@ -155,8 +162,7 @@ async def refresh_session() -> str:
     """Refresh the WebFlor session by running automated login. Use if an API call fails due to expired session."""
     logger.info("[tool] refresh_session called")
     try:
-        new_cookies = await _run_login_async()
-        set_session_cookies(new_cookies)
+        await refresh_webflor_session()
         result = await webflor_fetch("/WebFlorBasico/API/listarCompaniasActivasSinLogo")
         companies = result if isinstance(result, list) else []
         names = [c.get("NomCompania", "?") for c in companies]
@@ -260,25 +266,9 @@ async def search_picklists(query: str, category: str = "") -> str:
     """Search cached picklist values. Categories: tipoNegociacion, tipoVenta, tipoCorte, tipoPrecio, tipoOrden, vendedores.
     Returns IdPickList, NomPickList. If no category given, searches all."""
     logger.info(f"[tool] search_picklists: query={query!r} category={category or 'all'}")
-    filepath = os.path.join(DATA_DIR, "picklists.json")
-    if not os.path.exists(filepath):
+    if reference_data.get_dataset("picklists.json").raw is None:
         return "picklists.json not found."
-    with open(filepath, "r") as f:
-        data = json.load(f)
-    query_lower = query.lower()
-    results = []
-    categories = [category] if category and category in data else list(data.keys())
-    for cat in categories:
-        for item in data.get(cat, []):
-            val = str(item.get("NomPickList", "") or item.get("Nombre", "")).lower()
-            if query_lower in val:
-                item_copy = {k: v for k, v in item.items() if k != "$id"}
-                item_copy["_category"] = cat
-                results.append(item_copy)
-                if len(results) >= 20:
-                    break
-        if len(results) >= 20:
-            break
+    results = reference_data.search_picklists(query, category)
     logger.info(f"[tool] search_picklists: {len(results)} results")
     return json.dumps(results, indent=2) if results else "No matches."
 
@@ -303,28 +293,25 @@ async def search_active_varieties(query: str, product: str = "", color: str = ""
     search_active_varieties('', product='Carnation', color='Red') → all active red carnations.
     Returns PRODUCTO, COLOR, VARIEDAD for each match."""
     logger.info(f"[tool] search_active_varieties: query={query!r} product={product!r} color={color!r}")
-    filepath = os.path.join(DATA_DIR, "current_active_varieties.csv")
-    if not os.path.exists(filepath):
+    if not reference_data.exists("current_active_varieties.csv"):
         return "current_active_varieties.csv not found."
     query_lower = query.lower()
     product_lower = product.lower()
     color_lower = color.lower()
     results = []
-    with open(filepath, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            prod = row.get("PRODUCTO", "")
-            col = row.get("COLOR", "")
-            var = row.get("VARIEDAD", "")
-            if product_lower and product_lower not in prod.lower():
-                continue
-            if color_lower and color_lower not in col.lower():
-                continue
-            if query_lower and query_lower not in var.lower():
-                continue
-            results.append({"PRODUCTO": prod, "COLOR": col, "VARIEDAD": var})
-            if len(results) >= 50:
-                break
+    for row in reference_data.load_csv_rows("current_active_varieties.csv"):
+        prod = row.get("PRODUCTO", "")
+        col = row.get("COLOR", "")
+        var = row.get("VARIEDAD", "")
+        if product_lower and product_lower not in prod.lower():
+            continue
+        if color_lower and color_lower not in col.lower():
+            continue
+        if query_lower and query_lower not in var.lower():
+            continue
+        results.append({"PRODUCTO": prod, "COLOR": col, "VARIEDAD": var})
+        if len(results) >= 50:
+            break
     logger.info(f"[tool] search_active_varieties: {len(results)} results")
     return json.dumps(results, indent=2) if results else "No matches."
 
@@ -335,15 +322,12 @@ async def search_customer_notes(customer_code: str) -> str:
     Returns special instructions for order entry such as PO field rules, date handling, etc.
     Call this after identifying the customer to check for any overrides."""
     logger.info(f"[tool] search_customer_notes: customer_code={customer_code!r}")
-    filepath = os.path.join(DATA_DIR, "customer_notes.csv")
-    if not os.path.exists(filepath):
+    if not reference_data.exists("customer_notes.csv"):
         return "No customer notes file found."
-    results = []
-    with open(filepath, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("customer_code", "").strip() == customer_code.strip():
-                results.append(row)
+    results = [
+        row for row in reference_data.load_csv_rows("customer_notes.csv")
+        if row.get("customer_code", "").strip() == customer_code.strip()
+    ]
     if not results:
         return f"No notes found for customer {customer_code}."
     logger.info(f"[tool] search_customer_notes: {len(results)} notes found")
@@ -364,15 +348,12 @@ async def lookup_item_mappings(item_code: str) -> str:
     - Use these as a helpful starting point. Check recent orders or the active
       empaques list if the specific empaque needed isn't found here."""
     logger.info(f"[tool] lookup_item_mappings: item_code={item_code!r}")
-    filepath = os.path.join(DATA_DIR, "item_mappings.csv")
-    if not os.path.exists(filepath):
+    if not reference_data.exists("item_mappings.csv"):
         return "No item mappings file found."
-    results = []
-    with open(filepath, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row.get("item_code", "").strip().upper() == item_code.strip().upper():
-                results.append(row)
+    results = [
+        row for row in reference_data.load_csv_rows("item_mappings.csv")
+        if row.get("item_code", "").strip().upper() == item_code.strip().upper()
+    ]
     if not results:
         return (
             f"No known mappings for item code '{item_code}'. "
@@ -387,6 +368,29 @@ async def lookup_item_mappings(item_code: str) -> str:
     return disclaimer + json.dumps(results, indent=2)
 
 
+@mcp.tool()
+async def lookup_item_mappings_batch(item_codes: list[str]) -> str:
+    """Batch version of lookup_item_mappings: look up every item code on a PO in one call.
+    Returns item code (as passed in) → list of historically observed mappings ([] when none are known).
+    Codes are matched ignoring case and surrounding whitespace.
+    The same caveats apply: mappings are NOT exhaustive and not always 1:1 — one item code
+    may be split across multiple empaques depending on availability."""
+    logger.info(f"[tool] lookup_item_mappings_batch: {len(item_codes)} item codes")
+    if not reference_data.exists("item_mappings.csv"):
+        return "No item mappings file found."
+    results: dict[str, list[dict]] = {code: [] for code in item_codes}
+    # Normalized code → every input spelling of it ("cbd01794" and "CBD01794 " both get the rows)
+    wanted: dict[str, list[str]] = {}
+    for code in results:
+        wanted.setdefault(code.strip().upper(), []).append(code)
+    for row in reference_data.load_csv_rows("item_mappings.csv"):
+        for code in wanted.get(row.get("item_code", "").strip().upper(), []):
+            results[code].append(row)
+    found = sum(1 for rows in results.values() if rows)
+    logger.info(f"[tool] lookup_item_mappings_batch: {found}/{len(results)} item codes have mappings")
+    return json.dumps(results, indent=2)
+
+
 @mcp.tool()
 async def get_spec_sheet(query: str) -> str:
     """Look up product spec sheet details by item code (e.g. 'CBD01794'), product name (e.g. 'Carnation fcy Mixed'),
@@ -492,56 +496,71 @@ async def lookup_marca_box_info(marca_query: str = "") -> str:
         return f"ERROR: {e}"
 
 
+def _empaque_summary(row: dict) -> dict:
+    """The packaging CSV fields returned by the empaque tools."""
+    return {
+        "IdEmpaque": row.get("IdEmpaque"),
+        "NomEmpaque": row.get("NomEmpaque"),
+        "IdProducto": row.get("IdProducto"),
+        "NomProducto": row.get("NomProducto"),
+        "NomColor": row.get("NomColor"),
+        "NomGrado": row.get("NomGrado"),
+        "NomVariedad": row.get("NomVariedad"),
+        "PickManejaPrecio": row.get("PickManejaPrecio"),
+    }
+
+
 @mcp.tool()
 async def search_empaques(query: str) -> str:
     """Search cached empaque/packaging data by name. Returns IdEmpaque, NomEmpaque, IdProducto, PickManejaPrecio, etc.
     Use to find IdEmpaque for order items. Empaque names look like 'Carnation fcy Mixed', 'Bouquet Unico Mixed'.
-    Search with partial names (e.g. 'Carnation fcy Mixed') for best results.
+    Search with partial names (e.g. 'Carnation fcy Mixed') for best results. All words must match
+    (in the empaque name, product, color, grade or variety); best matches come first.
     IdProducto: needed for lookup_client_product_ficha to get PickTipoCorte and PickTipoPrecio.
     PickManejaPrecio: 56=Ramos pricing, 57=Tallos pricing (empaque's pricing mode)."""
     logger.info(f"[tool] search_empaques: query={query!r}")
-    filepath = os.path.join(DATA_DIR, "packaging_webflor_items_list.csv")
-    logger.info(f"[tool] search_empaques: CSV path={filepath} exists={os.path.exists(filepath)}")
-    if not os.path.exists(filepath):
+    filepath = os.path.join(DATA_DIR, reference_data.EMPAQUES_FILE)
+    if not reference_data.exists(reference_data.EMPAQUES_FILE):
         return f"packaging_webflor_items_list.csv not found at {filepath}"
-    query_lower = query.lower()
-    # Split into keywords — all must match (AND logic) for multi-word queries
-    keywords = query_lower.split()
-    results = []
-    total_rows = 0
-    with open(filepath, "r") as f:
-        # Skip any non-header lines at the start of the file
-        while True:
-            pos = f.tell()
-            line = f.readline()
-            if not line:
-                return "CSV file is empty."
-            if line.startswith("IdEmpaque"):
-                f.seek(pos)
-                break
-        reader = csv.DictReader(f)
-        logger.info(f"[tool] search_empaques: fieldnames={reader.fieldnames}")
-        for row in reader:
-            total_rows += 1
-            nom = row.get("NomEmpaque", "")
-            nom_lower = nom.lower()
-            if all(kw in nom_lower for kw in keywords):
-                results.append({
-                    "IdEmpaque": row.get("IdEmpaque"),
-                    "NomEmpaque": nom,
-                    "IdProducto": row.get("IdProducto"),
-                    "NomProducto": row.get("NomProducto"),
-                    "NomColor": row.get("NomColor"),
-                    "NomGrado": row.get("NomGrado"),
-                    "NomVariedad": row.get("NomVariedad"),
-                    "PickManejaPrecio": row.get("PickManejaPrecio"),
-                })
-                if len(results) >= 20:
-                    break
+    index = reference_data.get_empaque_index()
+    if not index.rows:
+        return "CSV file is empty."
+    results = [_empaque_summary(row) for row in index.search(query)]
+    total_rows = len(index.rows)
     logger.info(f"[tool] search_empaques: {len(results)} results from {total_rows} rows")
     return json.dumps(results, indent=2) if results else "No matches."
 
 
+@mcp.tool()
+async def search_empaques_batch(queries: list[str]) -> str:
+    """Batch version of search_empaques: search several empaque names in one call.
+    Returns query → list of matches (same fields and ranking as search_empaques, [] when nothing matches)."""
+    logger.info(f"[tool] search_empaques_batch: {len(queries)} queries")
+    if not reference_data.exists(reference_data.EMPAQUES_FILE):
+        return f"packaging_webflor_items_list.csv not found at {os.path.join(DATA_DIR, reference_data.EMPAQUES_FILE)}"
+    index = reference_data.get_empaque_index()
+    results = {query: [_empaque_summary(row) for row in index.search(query)] for query in queries}
+    found = sum(1 for rows in results.values() if rows)
+    logger.info(f"[tool] search_empaques_batch: {found}/{len(results)} queries matched")
+    return json.dumps(results, indent=2)
+
+
+@mcp.tool()
+async def lookup_cached_empaques(empaque_ids: list[str]) -> str:
+    """Get the cached packaging CSV row for one or more IdEmpaque values, without calling WebFlor.
+    Returns IdEmpaque → {NomEmpaque, IdProducto, NomProducto, NomColor, NomGrado, NomVariedad, PickManejaPrecio}
+    (null for IDs not in the catalog). Use this instead of lookup_empaque_details when you only need
+    these fields — lookup_empaque_details is only required for ManejaReceta/IdComposicion."""
+    logger.info(f"[tool] lookup_cached_empaques: {len(empaque_ids)} ids")
+    results = {}
+    for emp_id in empaque_ids:
+        row = reference_data.get_empaque(emp_id)
+        results[str(emp_id)] = _empaque_summary(row) if row else None
+    found = sum(1 for r in results.values() if r)
+    logger.info(f"[tool] lookup_cached_empaques: {found}/{len(results)} found")
+    return json.dumps(results, indent=2)
+
+
 @mcp.tool()
 async def lookup_empaque_details(empaque_id: str) -> str:
     """Get full empaque details from WebFlor by IdEmpaque.
@@ -585,6 +604,43 @@ async def lookup_client_product_ficha(client_id: int, product_id: int) -> str:
         return f"ERROR: {e}"
 
 
+# Max concurrent ficha requests per batch call
+FICHA_BATCH_CONCURRENCY = int(os.getenv("FICHA_BATCH_CONCURRENCY", "6"))
+
+
+@mcp.tool()
+async def lookup_client_product_ficha_batch(client_id: int, product_ids: list[int]) -> str:
+    """Batch version of lookup_client_product_ficha: fetch the ficha for every product on a PO in one call.
+    Returns IdProducto → ficha (PickTipoCorte, PickTipoPrecio, PickMarcaCaja, ...), null when no ficha
+    exists, or {"error": ...} if that product's lookup failed. Duplicate product IDs are fetched once."""
+    unique_ids = list(dict.fromkeys(str(pid) for pid in product_ids))
+    logger.info(f"[tool] lookup_client_product_ficha_batch: client_id={client_id} {len(unique_ids)} products")
+    semaphore = asyncio.Semaphore(FICHA_BATCH_CONCURRENCY)
+
+    async def _fetch(product_id: str):
+        async with semaphore:
+            try:
+                data = await webflor_fetch(
+                    "/WebFlorVenta/API/listarFichaClientePorIdClienteIdProducto",
+                    params={"iIdCliente": str(client_id), "iIdProducto": product_id},
+                )
+            except Exception as e:
+                logger.error(f"[tool] lookup_client_product_ficha_batch: product {product_id} failed: {e}")
+                return {"error": str(e)}
+        if isinstance(data, list):
+            return data[0] if data else None
+        if isinstance(data, dict) and "_error" in data:
+            return {"error": data["_error"]}
+        return data or None
+
+    fichas = await asyncio.gather(*(_fetch(pid) for pid in unique_ids))
+    results = dict(zip(unique_ids, fichas))
+    for pid, ficha in results.items():
+        if ficha and "error" not in ficha:
+            logger.info(f"[tool] ficha {pid}: PickTipoCorte={ficha.get('PickTipoCorte')} PickTipoPrecio={ficha.get('PickTipoPrecio')} PickMarcaCaja={ficha.get('PickMarcaCaja')}")
+    return json.dumps(results, indent=2)
+
+
 # -- Order tools --
 
 @mcp.tool()
@@ -1360,6 +1416,51 @@ async def webflor_api_call(path: str, method: str = "GET", params: dict | None =
     return text
 
 
+# Header fields list_recent_orders returns per order
+_ORDER_HEADER_FIELDS = (
+    "PO", "FechaOrden", "FechaEntrega", "FechaLlegada", "NomEstado", "Cajas", "TotalUnidades", "Comentario",
+)
+# Order headers (listarOrdenById) cached by IdPedido → (fetched_at, header)
+ORDER_HEADER_TTL = float(os.getenv("ORDER_HEADER_TTL", "300"))
+ORDER_HEADER_CONCURRENCY = int(os.getenv("ORDER_HEADER_CONCURRENCY", "5"))
+_order_header_cache: dict[str, tuple[float, dict]] = {}
+
+
+def _invalidate_order_headers(params: dict | None, body: dict | None):
+    """Drop cached headers of the orders a write names (IdPedido, IdPedidoDestino, ...).
+
+    Item-level writes that only carry item IDs can still change an order's
+    Cajas/TotalUnidades, so without an order ID the whole cache is dropped.
+    """
+    order_ids = {
+        str(value)
+        for source in (params or {}, body if isinstance(body, dict) else {})
+        for key, value in source.items()
+        if "idpedido" in key.lower() and "item" not in key.lower() and value
+    }
+    if not order_ids:
+        _order_header_cache.clear()
+    for order_id in order_ids:
+        _order_header_cache.pop(order_id, None)
+
+
+async def _get_order_header(order_id, semaphore: asyncio.Semaphore) -> tuple[dict, bool]:
+    """(header, fetched) — served from the TTL cache when fresh, otherwise fetched under `semaphore`."""
+    key = str(order_id)
+    cached = _order_header_cache.get(key)
+    if cached and time.monotonic() - cached[0] < ORDER_HEADER_TTL:
+        return cached[1], False
+    async with semaphore:
+        header_data = await webflor_fetch(
+            "/WebFlorVenta/API/listarOrdenById",
+            params={"iIdPedido": key},
+        )
+    header = header_data[0] if isinstance(header_data, list) and header_data else {}
+    if header:
+        _order_header_cache[key] = (time.monotonic(), header)
+    return header, True
+
+
 @mcp.tool()
 async def list_recent_orders(
     client_id: int,
@@ -1417,18 +1518,21 @@ async def list_recent_orders(
         # Limit results
         data = data[:int(max_results)]
 
-        # Extract key fields per order — fetch headers for detail
+        # Extract key fields per order — the summary row is enough when it already
+        # carries every header field, otherwise fetch headers concurrently (cached)
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(ORDER_HEADER_CONCURRENCY)
+
+        async def _header_for(order_summary: dict) -> tuple[dict, bool]:
+            if all(field in order_summary for field in _ORDER_HEADER_FIELDS):
+                return order_summary, False
+            return await _get_order_header(order_summary.get("IdPedido"), semaphore)
+
+        headers = await asyncio.gather(*(_header_for(o) for o in data))
         results = []
-        for order_summary in data:
-            order_id = order_summary.get("IdPedido")
-            # Fetch full header for each order
-            header_data = await webflor_fetch(
-                "/WebFlorVenta/API/listarOrdenById",
-                params={"iIdPedido": str(order_id)},
-            )
-            header = header_data[0] if isinstance(header_data, list) and header_data else {}
+        for order_summary, (header, _fetched) in zip(data, headers):
             results.append({
-                "IdPedido": order_id,
+                "IdPedido": order_summary.get("IdPedido"),
                 "PO": header.get("PO", ""),
                 "FechaOrden": header.get("FechaOrden", ""),
                 "FechaEntrega": header.get("FechaEntrega", ""),
@@ -1438,7 +1542,12 @@ async def list_recent_orders(
                 "TotalUnidades": header.get("TotalUnidades"),
                 "Comentario": header.get("Comentario", ""),
             })
-        logger.info(f"[tool] list_recent_orders: {len(results)} orders")
+        fetched = sum(1 for _, was_fetched in headers if was_fetched)
+        logger.info(
+            f"[tool] list_recent_orders: {len(results)} orders "
+            f"({fetched} header fetches, {len(results) - fetched} from summary/cache) "
+            f"in {time.monotonic() - started:.2f}s"
+        )
         return json.dumps(results, indent=2)
     except Exception as e:
         logger.error(f"[tool] list_recent_orders failed: {e}")
@@ -1515,51 +1624,25 @@ async def get_order_with_items(order_id: str) -> str:
 @mcp.tool()
 async def search_clients_csv(query: str) -> str:
     """Search the local clientes.csv for customers matching the query.
-    Searches across all fields: Codigo, IdCliente, NomCliente, NIT, Telefono.
-    Returns matching rows with Codigo, IdCliente (WebFlor ID), NomCliente, NIT, Telefono, Estado.
+    Matches, in priority order: exact Codigo, name contains, any field (IdCliente,
+    NIT and phone numbers match exactly regardless of formatting), then fuzzy name
+    matches for misspelled names (with a similarity _score from 0 to 1).
+    Returns matching rows with Codigo, IdCliente (WebFlor ID), NomCliente, NIT, Telefono, Estado
+    and _match (codigo / name / words / field / partial / fuzzy).
     Use this to find customer info — e.g. map a customer code to a WebFlor IdCliente."""
     logger.info(f"[tool] search_clients_csv: query={query!r}")
-    filepath = os.path.join(DATA_DIR, "clientes.csv")
-    if not os.path.exists(filepath):
-        alt = os.path.join(os.path.dirname(__file__), "clientes.csv")
-        if os.path.exists(alt):
-            filepath = alt
-        else:
-            return "clientes.csv not found."
-    import csv
-    search = query.strip().lower()
-    exact_codigo = []
-    name_matches = []
-    other_matches = []
-    with open(filepath, "r", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            codigo = row.get("Codigo", "")
-            nombre = row.get("NomCliente", "")
-            base = {
-                "Codigo": codigo,
-                "IdCliente": row.get("IdCliente", ""),
-                "NomCliente": nombre,
-                "NIT": row.get("NIT", ""),
-                "Telefono": row.get("Telefono", ""),
-                "Estado": row.get("Estado", ""),
-            }
-            # Priority 1: exact Codigo match
-            if search == codigo.lower():
-                exact_codigo.append(base)
-            # Priority 2: name contains search
-            elif search in nombre.lower():
-                name_matches.append(base)
-            # Priority 3: any field contains search
-            else:
-                searchable = " ".join(str(v) for v in row.values()).lower()
-                if search in searchable:
-                    other_matches.append(base)
-    # Return in priority order
-    matches = exact_codigo + name_matches + other_matches
+    if not reference_data.exists(reference_data.CLIENTES_FILE):
+        return "clientes.csv not found."
+    matches = []
+    for row in reference_data.search_customers(query, 10):
+        base = {k: row.get(k, "") for k in ("Codigo", "IdCliente", "NomCliente", "NIT", "Telefono", "Estado")}
+        base["_match"] = row["_match"]
+        if "_score" in row:
+            base["_score"] = row["_score"]
+        matches.append(base)
     if not matches:
         return f"No clients matching '{query}'."
-    return json.dumps(matches[:10], indent=2)
+    return json.dumps(matches, indent=2)
 
 
 # -- Supabase customer tools --
@@ -1668,24 +1751,12 @@ async def resolve_delivery_date(date_text: str) -> str:
 
 # -- Week lookup --
 
-_SEMANAS_CACHE: list[dict] | None = None
-
 def _load_semanas() -> list[dict]:
-    global _SEMANAS_CACHE
-    if _SEMANAS_CACHE is None:
-        semanas_path = os.path.join(DATA_DIR, "semanas_2026.json")
-        with open(semanas_path, "r") as f:
-            _SEMANAS_CACHE = json.load(f)
-    return _SEMANAS_CACHE
+    return reference_data.load_records("semanas_2026.json")
 
 
-@mcp.tool()
-async def get_week(date_or_week: str) -> str:
-    """Look up the WebFlor week number for a date, or get the date range for a week number.
-    The floral industry operates on week numbers (Semana). Weeks run Monday–Sunday.
-    Input: a date (YYYY-MM-DD) or a week number (e.g. '12').
-    Returns: week number, start date (inicio), end date (fin)."""
-    logger.info(f"[tool] get_week: {date_or_week!r}")
+def _resolve_week(date_or_week: str) -> dict:
+    """Week record for a week number or YYYY-MM-DD date, or {"error": ...}."""
     semanas = _load_semanas()
 
     # Try as week number first
@@ -1693,8 +1764,8 @@ async def get_week(date_or_week: str) -> str:
         week_num = int(date_or_week)
         for s in semanas:
             if s["NumSemana"] == week_num:
-                return json.dumps(s, indent=2)
-        return json.dumps({"error": f"Week {week_num} not found"})
+                return s
+        return {"error": f"Week {week_num} not found"}
     except ValueError:
         pass
 
@@ -1703,21 +1774,44 @@ async def get_week(date_or_week: str) -> str:
     try:
         d = Date.fromisoformat(date_or_week)
     except ValueError:
-        return json.dumps({"error": f"Could not parse '{date_or_week}' as date or week number"})
+        return {"error": f"Could not parse '{date_or_week}' as date or week number"}
 
     for s in semanas:
         inicio = Date.fromisoformat(s["inicio"])
         fin = Date.fromisoformat(s["fin"])
         if inicio <= d <= fin:
-            return json.dumps(s, indent=2)
+            return s
+
+    return {"error": f"Date {date_or_week} not in any known week"}
+
+
+@mcp.tool()
+async def get_week(date_or_week: str) -> str:
+    """Look up the WebFlor week number for a date, or get the date range for a week number.
+    The floral industry operates on week numbers (Semana). Weeks run Monday–Sunday.
+    Input: a date (YYYY-MM-DD) or a week number (e.g. '12').
+    Returns: week number, start date (inicio), end date (fin)."""
+    logger.info(f"[tool] get_week: {date_or_week!r}")
+    week = _resolve_week(date_or_week)
+    return json.dumps(week) if "error" in week else json.dumps(week, indent=2)
 
-    return json.dumps({"error": f"Date {date_or_week} not in any known week"})
+
+@mcp.tool()
+async def get_week_batch(dates_or_weeks: list[str]) -> str:
+    """Batch version of get_week: resolve several dates / week numbers in one call.
+    Returns input → {NumSemana, inicio, fin} (or {"error": ...} for inputs that can't be resolved)."""
+    logger.info(f"[tool] get_week_batch: {len(dates_or_weeks)} inputs")
+    return json.dumps({value: _resolve_week(value) for value in dates_or_weeks}, indent=2)
 
 
 # ─── Main ─────────────────────────────────────────────────────────────────
 
 if __name__ == "__main__":
     import sys as _sys
+    # Parse and index cached reference data before accepting tool calls
+    logger.info(f"Preloaded {reference_data.preload()} reference data files from {DATA_DIR}")
+    # Pick up download_reference_data.py refreshes without a restart
+    reference_data.start_watcher()
     # Ensure session before accepting tool calls
     asyncio.get_event_loop().run_until_complete(ensure_session())
     if "--sse" in _sys.argv:
@@ -0,0 +1,259 @@
+"""
+Local WebFlor stand-in built from recorded traffic.
+
+FakeWebFlor is an httpx transport seeded from a webflor_auth recording
+(WEBFLOR_RECORD_PATH). It keeps order state, so the deterministic enter flow
+runs against it end to end without creating anything in the real ERP:
+
+  - reference orders are seeded from the first (pre-write) GETs of the orders
+    that were copied from them in the recording
+  - copiarPedido_Ajustes clones a seeded order with fresh order/item/container IDs
+  - actualizarOrden / editarOrdenIt / eliminarOrdenItem / editarDatosAdicionalesReceta
+    change that state, and later GETs see the changes
+  - any other request is answered with its recorded response (same method,
+    endpoint and params), or 404
+
+Latency is either sampled from the recorded latencies of the endpoint or a
+fixed value, plus optional jitter; error_rate injects 503s. Calls and writes
+are counted per call_label, a context variable the caller sets per order.
+
+    fake = FakeWebFlor.from_file("tmp/webflor-recording.jsonl", latency="recorded")
+    webflor_auth.set_transport(fake)
+"""
+
+import asyncio
+import copy
+import itertools
+import json
+import logging
+import random
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+import httpx
+
+logger = logging.getLogger("webflor_replay")
+
+# Label the calls made by the current task (and the tasks it gathers) are counted under
+call_label: ContextVar[str] = ContextVar("webflor_replay_label", default="")
+
+# Fresh IDs for copied orders/items/containers — well above real WebFlor IDs
+_FIRST_FAKE_ID = 900_000_000
+
+
+def _endpoint(path: str) -> str:
+    return path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _params_key(params: dict | None) -> str:
+    return json.dumps({k: str(v) for k, v in (params or {}).items()}, sort_keys=True)
+
+
+def _first(data):
+    if isinstance(data, list):
+        return data[0] if data else None
+    return data
+
+
+def load_recording(path: str) -> list[dict]:
+    records = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    return records
+
+
+class FakeWebFlor(httpx.AsyncBaseTransport):
+    def __init__(self, records: list[dict], latency: float | str = "recorded", jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._ids = itertools.count(_FIRST_FAKE_ID)
+
+        # ERP state
+        self.orders: dict[int, dict] = {}
+        self.items: dict[int, dict[int, dict]] = {}
+        self.containers: dict[int, list[dict]] = {}
+        self.datos: dict[tuple[int, int], dict] = {}
+        self._item_order: dict[int, int] = {}
+
+        # Recorded responses
+        self._exact: dict[tuple, tuple[int, str]] = {}
+        self._acks: dict[str, tuple[int, str]] = {}
+        self._latencies: dict[str, list[float]] = defaultdict(list)
+
+        # Per-label accounting
+        self.calls: dict[str, Counter] = defaultdict(Counter)
+        self.writes: dict[str, list[dict]] = defaultdict(list)
+
+        self._load(records)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "FakeWebFlor":
+        return cls(load_recording(path), **kwargs)
+
+    # ─── Seeding ───
+
+    def _load(self, records: list[dict]):
+        copied_from: dict[int, int] = {}  # order created by a recorded copy → its reference order
+        for rec in records:
+            name = _endpoint(rec["path"])
+            self._latencies[name].append(rec.get("latency") or 0.0)
+            if not 200 <= rec["status"] < 300:
+                continue
+            method, params = rec["method"], rec.get("params") or {}
+            self._exact.setdefault((method, name, _params_key(params)), (rec["status"], rec["response"]))
+            if method != "GET":
+                self._acks.setdefault(name, (rec["status"], rec["response"]))
+            try:
+                data = json.loads(rec["response"])
+            except (TypeError, json.JSONDecodeError):
+                continue
+
+            if name == "copiarPedido_Ajustes":
+                created = _first(data) or {}
+                if created.get("IdPedido") and rec.get("body"):
+                    copied_from[int(created["IdPedido"])] = int(rec["body"]["iIdPedido"])
+            elif name == "listarOrdenById" and _first(data):
+                order_id = int(params["iIdPedido"])
+                seed_id = copied_from.get(order_id, order_id)
+                self.orders.setdefault(seed_id, {**_first(data), "IdPedido": seed_id})
+            elif name == "listarDetalleOrdenByIdPedido" and isinstance(data, list):
+                order_id = int(params["iIdPedido"])
+                seed_id = copied_from.get(order_id, order_id)
+                if seed_id not in self.items:
+                    self.items[seed_id] = {it["IdPedidoItem"]: {**it, "IdPedido": seed_id} for it in data}
+                    for item_id in self.items[seed_id]:
+                        self._item_order[item_id] = seed_id
+            elif name == "listarOrdenRecByIdPedidoItem" and isinstance(data, list):
+                self.containers.setdefault(int(params["IdPedidoItem"]), data)
+            elif name == "seleccionarDatosAdicionales" and isinstance(data, dict):
+                key = (int(params["IdPedidoItem"]), int(params.get("IdPedidoItemReceta", 0)))
+                self.datos.setdefault(key, data)
+
+        logger.info(
+            f"Replay seeded from {len(records)} records: {len(self.orders)} orders, "
+            f"{sum(len(v) for v in self.items.values())} items, {len(self.containers)} recipe items"
+        )
+
+    # ─── ERP operations ───
+
+    def _copy_order(self, reference_id: int):
+        if reference_id not in self.orders or reference_id not in self.items:
+            return 500, {"Message": f"Reference order {reference_id} is not in the recording"}
+        new_id = next(self._ids)
+        self.orders[new_id] = {**copy.deepcopy(self.orders[reference_id]), "IdPedido": new_id}
+        self.items[new_id] = {}
+        for old_item_id, item in self.items[reference_id].items():
+            item_id = next(self._ids)
+            self.items[new_id][item_id] = {**copy.deepcopy(item), "IdPedido": new_id, "IdPedidoItem": item_id}
+            self._item_order[item_id] = new_id
+            if (old_item_id, 0) in self.datos:
+                self.datos[(item_id, 0)] = copy.deepcopy(self.datos[(old_item_id, 0)])
+            containers = []
+            for container in self.containers.get(old_item_id, []):
+                container_id = next(self._ids)
+                old_key = (old_item_id, container.get("IdPedidoItemReceta", 0))
+                if old_key in self.datos:
+                    self.datos[(item_id, container_id)] = copy.deepcopy(self.datos[old_key])
+                containers.append({**copy.deepcopy(container), "IdPedidoItem": item_id,
+                                   "IdPedidoItemReceta": container_id})
+            self.containers[item_id] = containers
+        return 200, [{"IdPedido": new_id}]
+
+    def _find_item(self, item_id: int) -> dict | None:
+        return self.items.get(self._item_order.get(item_id), {}).get(item_id)
+
+    def _apply(self, method: str, name: str, params: dict, body: dict | None):
+        """Serve a request from ERP state. Returns (status, data) or None if it isn't modelled."""
+        body = body or {}
+        if name == "copiarPedido_Ajustes":
+            return self._copy_order(int(body["iIdPedido"]))
+        if name == "listarOrdenById":
+            order = self.orders.get(int(params["iIdPedido"]))
+            return (200, [order]) if order else None
+        if name == "listarDetalleOrdenByIdPedido":
+            items = self.items.get(int(params["iIdPedido"]))
+            return (200, list(items.values())) if items is not None else None
+        if name == "listarItemDetalleOrdenByIdPedidoItem":
+            item = self._find_item(int(params["iIdPedidoItem"]))
+            return 200, [item] if item else []
+        if name == "listarOrdenRecByIdPedidoItem":
+            item_id = int(params["IdPedidoItem"])
+            return (200, self.containers[item_id]) if item_id in self.containers else None
+        if name == "seleccionarDatosAdicionales":
+            key = (int(params["IdPedidoItem"]), int(params.get("IdPedidoItemReceta", 0)))
+            return (200, self.datos[key]) if key in self.datos else None
+        if name == "actualizarOrden":
+            order = self.orders.get(int(body.get("IdPedido", 0)))
+            if order is None:
+                return 404, {"Message": "Order not found"}
+            order.update(body)
+            return 200, None
+        if name == "editarOrdenIt":
+            item = self._find_item(int(body.get("IdPedidoItem", 0)))
+            if item is None:
+                return 404, {"Message": "Item not found"}
+            item.update({k: v for k, v in body.items() if k in item})
+            return 200, None
+        if name == "eliminarOrdenItem":
+            order_id = self._item_order.pop(int(body.get("IdPedidoItem", 0)), None)
+            if order_id is None:
+                return 404, {"Message": "Item not found"}
+            self.items[order_id].pop(int(body["IdPedidoItem"]), None)
+            return 200, None
+        if name == "editarDatosAdicionalesReceta":
+            for container in self.containers.get(int(body.get("IdPedidoItem", 0)), []):
+                if container.get("IdPedidoItemReceta") == body.get("IdPedidoItemReceta"):
+                    container.update(body)
+                    return 200, None
+            return 404, {"Message": "Recipe container not found"}
+        return None
+
+    # ─── Transport ───
+
+    def _delay(self, name: str) -> float:
+        if self.latency == "recorded":
+            samples = self._latencies.get(name) or [0.0]
+            base = self._rng.choice(samples)
+        else:
+            base = float(self.latency)
+        return base + self._rng.uniform(0, self.jitter)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        method, name = request.method, _endpoint(request.url.path)
+        params = dict(request.url.params)
+        await request.aread()
+        body = json.loads(request.content) if request.content else None
+
+        label = call_label.get()
+        self.calls[label][f"{method} {name}"] += 1
+        if method != "GET":
+            self.writes[label].append({"method": method, "endpoint": name, "params": params, "body": body})
+
+        await asyncio.sleep(self._delay(name))
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return httpx.Response(503, text="Service Unavailable (injected)")
+
+        served = self._apply(method, name, params, body)
+        if served is not None:
+            status, data = served
+            if data is None:
+                # Successful write — answer with what WebFlor answered in the recording
+                return httpx.Response(status, text=self._acks.get(name, (status, "true"))[1])
+            return httpx.Response(status, json=data)
+
+        recorded = self._exact.get((method, name, _params_key(params)))
+        if recorded is None and method != "GET":
+            recorded = self._acks.get(name)
+        if recorded is None:
+            return httpx.Response(404, text=f"{method} {name} {params} is not in the recording")
+        status, text = recorded
+        return httpx.Response(status, text=text)
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.writes.clear()
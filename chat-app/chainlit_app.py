@@ -32,8 +32,19 @@ if _lf_pub and _lf_sec:
     AnthropicInstrumentor().instrument()
     print(f"[langfuse] Hybrid tracing enabled (Langfuse SDK + AnthropicInstrumentor)")
 
+# webflor_auth and reference_data are shared with the MCP server in browser-agent/;
+# the cached data files still default to chat-app/data
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(_APP_DIR, "..", "browser-agent"))
+os.environ.setdefault("DATA_DIR", os.path.join(_APP_DIR, "data"))
+
 from webflor_auth import ensure_session, webflor_fetch, _order_link
 
+import reference_data
+
+# Pick up refreshed clientes.csv / semanas files without restarting the app
+reference_data.start_watcher()
+
 # ─── Tool definitions for Claude ──────────────────────────────────────────
 
 TOOLS = [
@@ -312,35 +323,10 @@ async def execute_tool(name: str, args: dict) -> str:
         return json.dumps(data, indent=2)
 
     elif name == "search_customers":
-        import csv
-        query = args["query"].lower().strip()
-        query_words = query.split()
-        data_dir = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(__file__), "data")
-        filepath = os.path.join(data_dir, "clientes.csv")
-        scored = []
-        with open(filepath, "r", encoding="utf-8-sig") as f:
-            for row in csv.DictReader(f):
-                searchable = f"{row.get('Codigo', '')} {row.get('IdCliente', '')} {row.get('NomCliente', '')} {row.get('NIT', '')}".lower()
-                # Score: exact match on code/id > all words match > partial
-                codigo = row.get("Codigo", "").lower()
-                id_cliente = row.get("IdCliente", "").lower()
-                if query == codigo or query == id_cliente:
-                    score = 3  # exact code/id match
-                elif all(w in searchable for w in query_words):
-                    score = 2  # all words match
-                elif any(w in searchable for w in query_words):
-                    score = 1  # partial match
-                else:
-                    continue
-                scored.append((score, {
-                    "IdCliente": row.get("IdCliente"),
-                    "NomCliente": row.get("NomCliente"),
-                    "Codigo": row.get("Codigo"),
-                    "NIT": row.get("NIT"),
-                    "Estado": row.get("Estado"),
-                }))
-        scored.sort(key=lambda x: -x[0])
-        matches = [m for _, m in scored[:20]]
+        matches = [
+            {k: row.get(k) for k in ("IdCliente", "NomCliente", "Codigo", "NIT", "Estado", "_match", "_score") if k in row}
+            for row in reference_data.search_customers(args["query"], 20)
+        ]
         return json.dumps(matches, indent=2) if matches else f"No customers matching '{args['query']}'."
 
     elif name == "search_orders":
@@ -459,10 +445,7 @@ async def execute_tool(name: str, args: dict) -> str:
         return json.dumps(data, indent=2)
 
     elif name == "get_week":
-        data_dir = os.getenv("DATA_DIR") or os.path.join(os.path.dirname(__file__), "data")
-        filepath = os.path.join(data_dir, "semanas_2026.json")
-        with open(filepath, "r") as f:
-            semanas = json.load(f)
+        semanas = reference_data.load_records("semanas_2026.json")
         date_or_week = args["date_or_week"]
         # Try as week number first
         try:
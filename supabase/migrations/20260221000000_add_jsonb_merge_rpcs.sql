@@ -0,0 +1,50 @@
+-- Atomic JSONB merges for the orchestrator's status/metadata writes.
+-- Replaces client-side read-modify-write (SELECT tags → merge → UPDATE), which
+-- costs two round-trips and loses updates when two writers race.
+
+-- orders.metadata is written by the orchestrator (ERP export info)
+ALTER TABLE public.orders
+ADD COLUMN IF NOT EXISTS metadata jsonb DEFAULT '{}'::jsonb;
+
+-- Merge patches into a proposal's tags and/or metadata, optionally setting status.
+-- NULL arguments leave the column untouched.
+CREATE OR REPLACE FUNCTION public.merge_proposal_fields(
+    p_proposal_id uuid,
+    p_tags jsonb DEFAULT NULL,
+    p_metadata jsonb DEFAULT NULL,
+    p_status text DEFAULT NULL
+) RETURNS void
+LANGUAGE sql AS $$
+  UPDATE public.order_change_proposals
+  SET tags = CASE WHEN p_tags IS NULL THEN tags ELSE COALESCE(tags, '{}'::jsonb) || p_tags END,
+      metadata = CASE WHEN p_metadata IS NULL THEN metadata ELSE COALESCE(metadata, '{}'::jsonb) || p_metadata END,
+      status = COALESCE(p_status, status)
+  WHERE id = p_proposal_id;
+$$;
+
+ALTER FUNCTION public.merge_proposal_fields(uuid, jsonb, jsonb, text) OWNER TO postgres;
+
+COMMENT ON FUNCTION public.merge_proposal_fields(uuid, jsonb, jsonb, text) IS 'Atomically merge JSONB patches into order_change_proposals.tags/metadata (top-level keys, patch wins) and optionally set status';
+
+-- Set an order's status and merge a patch into its metadata in one statement.
+CREATE OR REPLACE FUNCTION public.update_order_status_merge(
+    p_order_id uuid,
+    p_status text,
+    p_metadata jsonb DEFAULT NULL
+) RETURNS void
+LANGUAGE sql AS $$
+  UPDATE public.orders
+  SET status = p_status::public.order_status,
+      metadata = CASE WHEN p_metadata IS NULL THEN metadata ELSE COALESCE(metadata, '{}'::jsonb) || p_metadata END
+  WHERE id = p_order_id;
+$$;
+
+ALTER FUNCTION public.update_order_status_merge(uuid, text, jsonb) OWNER TO postgres;
+
+COMMENT ON FUNCTION public.update_order_status_merge(uuid, text, jsonb) IS 'Set orders.status and atomically merge a JSONB patch into orders.metadata';
+
+-- Backend-only: called with the service role key
+REVOKE ALL ON FUNCTION public.merge_proposal_fields(uuid, jsonb, jsonb, text) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION public.update_order_status_merge(uuid, text, jsonb) FROM PUBLIC, anon, authenticated;
+GRANT ALL ON FUNCTION public.merge_proposal_fields(uuid, jsonb, jsonb, text) TO service_role;
+GRANT ALL ON FUNCTION public.update_order_status_merge(uuid, text, jsonb) TO service_role;